@@ -0,0 +1,320 @@
+import threading
+import time
+from datetime import date, datetime
+from math import prod
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import config
+from app.core.store_indexes import StoreIndexes
+from app.models.lesson_archive import LESSON_ARCHIVES
+from app.utils.text import normalize_name
+
+LESSON_TYPES = ("individual", "group")
+# Collection -> lesson type; archived lessons count like hot ones
+LESSON_COLLECTIONS = {
+    "IndividualLessons": "individual",
+    "GroupLessons": "group",
+    LESSON_ARCHIVES["IndividualLessons"]: "individual",
+    LESSON_ARCHIVES["GroupLessons"]: "group",
+}
+PROJECTION = {"approved": 1, "teacher_name": 1, "student_name": 1, "student_names": 1, "student_ids": 1,
+              "education_level": 1, "subject": 1, "hours": 1, "date": 1}
+
+CATEGORICAL = ("teacher", "student", "level", "subject")
+DIMENSIONS = CATEGORICAL + ("lesson_type", "month", "month_of_year")
+
+_EPOCH = date(1970, 1, 1)
+_NO_DAY = -(2 ** 62)  # unparseable date: only matched by queries without a date range
+_COLUMNS = (
+    ("day", np.int64),  # days since 1970-01-01
+    ("month", np.int32),  # months since 1970-01 (-1: unknown)
+    ("hours", np.float64),
+    ("teacher", np.int32),
+    ("student", np.int32),
+    ("level", np.int32),
+    ("subject", np.int32),
+    ("lesson_type", np.int8),
+    ("first", np.bool_),  # first row of its lesson
+    ("alive", np.bool_),
+)
+_BINCOUNT_LIMIT = 1 << 22  # larger key spaces are grouped with np.unique instead of a dense bincount
+
+
+def lesson_day(value) -> Optional[date]:
+    """ Calendar date of a stored lesson date (BSON date or ISO string). """
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str):
+        try:
+            return date.fromisoformat(value[:10])
+        except ValueError:
+            return None
+    return None
+
+
+def month_code(month: str) -> int:
+    """ "YYYY-MM" -> months since 1970-01. """
+    year, month = month.split("-")
+    return (int(year) - 1970) * 12 + int(month) - 1
+
+
+class Categories:
+    """ Dictionary encoding of one dimension: value <-> dense int code, plus a display label per value. """
+
+    __slots__ = ("codes", "values", "labels")
+
+    def __init__(self):
+        self.codes: Dict[Any, int] = {}
+        self.values: List[Any] = []
+        self.labels: List[Any] = []
+
+    def encode(self, value, label=None) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+            self.labels.append(value if label is None else label)
+        return code
+
+
+class LessonColumns:
+    """
+    Approved lessons (hot and archived) of one branch as NumPy columns, for the stats endpoints.
+    One row per (lesson, student): group-by-student sums credit every student of a group lesson,
+    and every other grouping only counts each lesson's `first` row. Text dimensions are dictionary
+    encoded (student: directory id, or normalized name before backfill), dates are day numbers.
+    Changed lessons are masked out (`alive`) and re-appended; a rebuild compacts them.
+    """
+
+    def __init__(self):
+        self.categories = {dim: Categories() for dim in CATEGORICAL}
+        self.columns = {name: np.empty(0, dtype) for name, dtype in _COLUMNS}
+        self.size = 0
+        self.rows_by_lesson: Dict[Any, Tuple[int, int]] = {}  # lesson _id -> (first row, row count)
+        self.built_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.rows_by_lesson)
+
+    # ---------- Writes ----------
+
+    def _rows(self, lesson: dict, lesson_type: str) -> List[tuple]:
+        day = lesson_day(lesson.get("date"))
+        if day is None:
+            day_number, month = _NO_DAY, -1
+        else:
+            day_number, month = (day - _EPOCH).days, (day.year - 1970) * 12 + day.month - 1
+        hours = float(lesson.get("hours") or 0)
+        teacher = self.categories["teacher"].encode(lesson.get("teacher_name"))
+        level = self.categories["level"].encode(lesson.get("education_level"))
+        subject = self.categories["subject"].encode(lesson.get("subject"))
+        kind = LESSON_TYPES.index(lesson_type)
+
+        if lesson_type == "individual":
+            names = [lesson.get("student_name") or "Unknown Student"]
+        else:
+            names = lesson.get("student_names") or [None]
+        ids = lesson.get("student_ids") or []
+        if len(ids) != len(names):
+            ids = [None] * len(names)
+
+        rows = []
+        for student_id, name in zip(ids, names):
+            if name is None:
+                student = self.categories["student"].encode(student_id)  # group lesson without students: None
+            else:
+                student = self.categories["student"].encode(student_id or normalize_name(name), " ".join(name.split()))
+            rows.append((day_number, month, hours, teacher, student, level, subject, kind, not rows, True))
+        return rows
+
+    def _append(self, lesson_id, rows: List[tuple]) -> None:
+        needed = self.size + len(rows)
+        capacity = len(self.columns["day"])
+        if needed > capacity:
+            capacity = max(1024, 2 * needed)
+            for name, dtype in _COLUMNS:
+                grown = np.empty(capacity, dtype)
+                grown[:self.size] = self.columns[name][:self.size]
+                self.columns[name] = grown
+        for position, (name, _) in enumerate(_COLUMNS):
+            self.columns[name][self.size:needed] = [row[position] for row in rows]
+        self.rows_by_lesson[lesson_id] = (self.size, len(rows))
+        self.size = needed
+
+    def _remove(self, lesson_id) -> None:
+        span = self.rows_by_lesson.pop(lesson_id, None)
+        if span is not None:
+            self.columns["alive"][span[0]:span[0] + span[1]] = False
+
+    def load(self, lessons: Iterable[Tuple[dict, str]]) -> None:
+        """ Bulk load (lesson, lesson_type) pairs: rows are gathered in lists and converted once. """
+        gathered = []
+        spans = {}
+        size = self.size
+        for lesson, lesson_type in lessons:
+            # A lesson caught mid-archiving can be read from both collections
+            if not lesson.get("approved") or lesson["_id"] in spans or lesson["_id"] in self.rows_by_lesson:
+                continue
+            rows = self._rows(lesson, lesson_type)
+            spans[lesson["_id"]] = (size, len(rows))
+            size += len(rows)
+            gathered.extend(rows)
+        if not gathered:
+            return
+        with self._lock:
+            for (name, dtype), values in zip(_COLUMNS, zip(*gathered)):
+                self.columns[name] = np.concatenate([self.columns[name][:self.size], np.array(values, dtype)])
+            self.rows_by_lesson.update(spans)
+            self.size = size
+
+    def upsert(self, lesson: dict, lesson_type: str) -> None:
+        """ Apply a written lesson (PROJECTION fields): replaces its rows, or drops them if not approved. """
+        with self._lock:
+            self._remove(lesson["_id"])
+            if lesson.get("approved"):
+                self._append(lesson["_id"], self._rows(lesson, lesson_type))
+
+    def remove(self, lesson_id) -> None:
+        with self._lock:
+            self._remove(lesson_id)
+
+    def merge_student(self, source_id, target_id) -> None:
+        """ Re-point a merged duplicate's rows at the surviving student. """
+        with self._lock:
+            students = self.categories["student"]
+            source = students.codes.get(source_id)
+            if source is None:
+                return
+            target = students.encode(target_id, students.labels[source])
+            column = self.columns["student"][:self.size]
+            column[column == source] = target
+
+    # ---------- Queries ----------
+
+    def _column(self, dim: str, n: int) -> np.ndarray:
+        if dim == "month_of_year":
+            month = self.columns["month"][:n]
+            return np.where(month >= 0, month % 12 + 1, 0)
+        return self.columns[dim][:n]
+
+    def _code(self, dim: str, value) -> Optional[int]:
+        if dim in CATEGORICAL:
+            return self.categories[dim].codes.get(value)
+        if dim == "lesson_type":
+            return LESSON_TYPES.index(value) if value in LESSON_TYPES else None
+        if dim == "month":
+            return month_code(value)
+        return int(value)
+
+    def _decoder(self, dim: str) -> Callable[[int], Any]:
+        if dim in CATEGORICAL:
+            return self.categories[dim].values.__getitem__
+        if dim == "lesson_type":
+            return LESSON_TYPES.__getitem__
+        if dim == "month":
+            return lambda code: f"{1970 + code // 12:04d}-{code % 12 + 1:02d}" if code >= 0 else None
+        return lambda code: code or None
+
+    def _select(self, by: Sequence[str], start: Optional[date], end: Optional[date], where: Dict[str, Any],
+                credit_students: bool) -> Tuple[np.ndarray, int]:
+        """ Row mask of the query (caller holds the lock). """
+        n = self.size
+        mask = self.columns["alive"][:n].copy()
+        if not credit_students:
+            mask &= self.columns["first"][:n]
+        if start is not None or end is not None:
+            day = self.columns["day"][:n]
+            mask &= day != _NO_DAY
+            if start is not None:
+                mask &= day >= (lesson_day(start) - _EPOCH).days
+            if end is not None:
+                mask &= day < (lesson_day(end) - _EPOCH).days
+        for dim, value in where.items():
+            code = self._code(dim, value)
+            if code is None:
+                mask[:] = False
+                break
+            mask &= self._column(dim, n) == code
+        return mask, n
+
+    def group_sum(self, by: Sequence[str] = (), metric: str = "hours", start: Optional[date] = None,
+                  end: Optional[date] = None, **where) -> Dict[tuple, float]:
+        """
+        Sum `metric` ("hours" or "lessons") over lessons dated start <= date < end, grouped by the `by`
+        dimensions (DIMENSIONS). `where` keeps rows equal to a dimension value: teacher="x",
+        lesson_type="group", month="2025-03", month_of_year=3. Returns {(value, ...): total}.
+        """
+        with self._lock:
+            mask, n = self._select(by, start, end, where, credit_students="student" in by)
+            weights = self.columns["hours"][:n][mask] if metric == "hours" else None
+            keys = [self._column(dim, n)[mask] for dim in by]
+            decoders = [self._decoder(dim) for dim in by]
+
+        if not by:
+            return {(): float(weights.sum()) if weights is not None else int(np.count_nonzero(mask))}
+        if not len(keys[0]):
+            return {}
+
+        # One int64 key per row: mixed-radix code of the dimension codes
+        offsets = [int(column.min()) for column in keys]
+        sizes = [int(column.max()) - offset + 1 for column, offset in zip(keys, offsets)]
+        linear = np.zeros(len(keys[0]), np.int64)
+        for column, offset, size in zip(keys, offsets, sizes):
+            linear = linear * size + (column - offset)
+
+        if prod(sizes) <= _BINCOUNT_LIMIT:
+            counts = np.bincount(linear, minlength=prod(sizes))
+            present = np.flatnonzero(counts)
+            totals = np.bincount(linear, weights=weights)[present] if weights is not None else counts[present]
+        else:
+            present, inverse = np.unique(linear, return_inverse=True)
+            totals = np.bincount(inverse, weights=weights)
+
+        result = {}
+        for code, total in zip(present.tolist(), totals.tolist()):
+            key = []
+            for offset, size, decode in zip(reversed(offsets), reversed(sizes), reversed(decoders)):
+                code, part = divmod(code, size)
+                key.append(decode(part + offset))
+            result[tuple(reversed(key))] = total
+        return result
+
+    def first_values(self, dim: str, of: str, start: Optional[date] = None, end: Optional[date] = None,
+                     **where) -> Dict[Any, Any]:
+        """ For each `dim` value in the range, the `of` value of its earliest loaded row (e.g. a student's level). """
+        with self._lock:
+            mask, n = self._select((dim,), start, end, where, credit_students=dim == "student")
+            keys = self._column(dim, n)[mask]
+            values = self._column(of, n)[mask]
+            decode_key, decode_value = self._decoder(dim), self._decoder(of)
+        unique, first = np.unique(keys, return_index=True)
+        return {decode_key(key): decode_value(value) for key, value in zip(unique.tolist(), values[first].tolist())}
+
+    def label(self, dim: str, value) -> Any:
+        """ Display label of a categorical value (a student's name as first written). """
+        categories = self.categories[dim]
+        code = categories.codes.get(value)
+        return categories.labels[code] if code is not None else value
+
+
+def build_snapshot(store, batch_size: int = 50_000) -> LessonColumns:
+    """ Full scan of the approved lessons of one branch store, paged by `_id`. """
+    snapshot = LessonColumns()
+    for collection, lesson_type in LESSON_COLLECTIONS.items():
+        query = {"approved": True}
+        while True:
+            batch = store[collection].find(query, PROJECTION, sort="_id", limit=batch_size)
+            if not batch:
+                break
+            snapshot.load((lesson, lesson_type) for lesson in batch)
+            query = {"approved": True, "_id": {"$gt": batch[-1]["_id"]}}
+    return snapshot
+
+
+lesson_snapshots = StoreIndexes(build_snapshot, config.ANALYTICS_MAX_AGE_SECONDS, "lesson_snapshot",
+                                hard_max_age=config.ANALYTICS_HARD_MAX_AGE_SECONDS)
@@ -1,7 +1,22 @@
 import os
-from dotenv import load_dotenv
 
-load_dotenv()
+# Local development reads a .env file; deployed containers get real environment variables,
+# so python-dotenv is only imported (and the file only parsed) when the file exists.
+ENV_FILE = os.getenv("ENV_FILE", ".env")
+if os.path.isfile(ENV_FILE):
+    from dotenv import load_dotenv
+
+    load_dotenv(ENV_FILE)
+
+
+def _parse_branches(value: str) -> dict:
+    """ Parse "north:maram_north,south:maram_south" into {"north": "maram_north", ...}. """
+    branches = {}
+    for item in (value or "").split(","):
+        if ":" in item:
+            branch, database = item.split(":", 1)
+            branches[branch.strip().lower()] = database.strip()
+    return branches
 
 
 class Config:
@@ -12,16 +27,98 @@ class Config:
     EMAIL_USER = os.getenv("EMAIL_USER")
     EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
     VERIFICATION_EXPIRE_HOURS = 2
+    RESET_TOKEN_EXPIRE_MINUTES = 60
     EMAIL_TO = os.getenv("EMAIL_TO")
 
+    # Locale:
+    TIMEZONE = "Asia/Jerusalem"
+
     # Mongo:
     MONGO_CLUSTER_URL = os.getenv("MONGO_CLUSTER_URL")
     MONGO_DATABASE = os.getenv("MONGO_DATABASE")
+    LIVE_EVENTS_ENABLED = os.getenv("LIVE_EVENTS_ENABLED", "true").lower() == "true"
+    # "mongo", or "memory" to run routes against in-process repositories (local tests/benchmarks):
+    REPOSITORY_BACKEND = os.getenv("REPOSITORY_BACKEND", "mongo").lower()
+
+    # Branches (one database per institute branch, sharing one client pool):
+    DEFAULT_BRANCH = os.getenv("DEFAULT_BRANCH", "main").lower()
+    BRANCH_DATABASES = {DEFAULT_BRANCH: MONGO_DATABASE, **_parse_branches(os.getenv("BRANCH_DATABASES"))}
+
+    # Reporting reads go to secondaries no staler than this (Mongo's minimum is 90; -1 = no limit):
+    REPORTING_MAX_STALENESS_SECONDS = int(os.getenv("REPORTING_MAX_STALENESS_SECONDS", "90"))
+
+    # In-process search index (GET /search): full rebuild in the background once older than this,
+    # so writes served by other workers show up; writes in this worker apply immediately:
+    SEARCH_INDEX_MAX_AGE_SECONDS = int(os.getenv("SEARCH_INDEX_MAX_AGE_SECONDS", "300"))
+    # ...and never served older than this (a request rebuilds it first, e.g. after an idle period):
+    SEARCH_INDEX_HARD_MAX_AGE_SECONDS = int(os.getenv("SEARCH_INDEX_HARD_MAX_AGE_SECONDS", "900"))
+    # Columnar lesson snapshot behind the stats endpoints: same scheme, rebuilt once older than this:
+    ANALYTICS_MAX_AGE_SECONDS = int(os.getenv("ANALYTICS_MAX_AGE_SECONDS", "120"))
+    # ...and never served older than this (a request rebuilds it first, e.g. after an idle period):
+    ANALYTICS_HARD_MAX_AGE_SECONDS = int(os.getenv("ANALYTICS_HARD_MAX_AGE_SECONDS", "300"))
+
+    # Retried submits/bookings: responses stored per Idempotency-Key for this long; requests
+    # without a key are deduplicated by body hash within the (short) content window, 0 = off:
+    IDEMPOTENCY_KEY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24"))
+    IDEMPOTENCY_CONTENT_WINDOW_SECONDS = int(os.getenv("IDEMPOTENCY_CONTENT_WINDOW_SECONDS", "120"))
+    IDEMPOTENCY_LOCK_SECONDS = 60
+
+    # Lesson archive: approved lessons dated before the last ARCHIVE_HOT_MONTHS months (current one
+    # included) move nightly, in batches, to the IndividualLessonsArchive/GroupLessonsArchive collections:
+    ARCHIVE_HOT_MONTHS = int(os.getenv("ARCHIVE_HOT_MONTHS", "2"))
+    ARCHIVE_BATCH_SIZE = 500
+
+    # PDF reports: rendered in REPORT_WORKERS processes (off the API workers) and cached by content
+    # hash for REPORT_CACHE_DAYS. REPORT_FONT_PATH must be a TTF with Arabic glyphs (Noto Naskh Arabic, Amiri):
+    REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))
+    REPORT_CACHE_DAYS = int(os.getenv("REPORT_CACHE_DAYS", "30"))
+    REPORT_FONT_PATH = os.getenv("REPORT_FONT_PATH", "/usr/share/fonts/truetype/noto/NotoNaskhArabic-Regular.ttf")
+    REPORT_RENDER_TIMEOUT_SECONDS = 120
+
+    # Report jobs (POST /reports/jobs): REPORT_JOB_WORKERS threads per process run queued jobs of every
+    # branch (0 = this process only enqueues). A job whose worker stops renewing its lease is retried:
+    REPORT_JOB_WORKERS = int(os.getenv("REPORT_JOB_WORKERS", "2"))
+    REPORT_JOB_LEASE_SECONDS = 120
+    REPORT_JOB_MAX_ATTEMPTS = 3
+    REPORT_JOB_RESULT_HOURS = int(os.getenv("REPORT_JOB_RESULT_HOURS", "24"))
+    REPORT_JOB_POLL_SECONDS = 2
+
+    # Incremental sync (GET /sync): changes per page; how far back a caught-up token points (covers
+    # writes that commit late); how long delete tombstones are kept (older tokens get a full sync):
+    SYNC_PAGE_SIZE = int(os.getenv("SYNC_PAGE_SIZE", "500"))
+    SYNC_SAFETY_SECONDS = 5
+    SYNC_TOMBSTONE_DAYS = int(os.getenv("SYNC_TOMBSTONE_DAYS", "90"))
+
+    # POST /batch: most GET requests one batch may carry
+    BATCH_MAX_REQUESTS = 20
+
+    # Bulk reads (admin lesson listings, lessons export job, daily report) decode raw BSON row by row
+    # straight into the JSON/CSV output instead of building dicts and response models (app.utils.raw_bson):
+    RAW_BSON_READS = os.getenv("RAW_BSON_READS", "false").lower() == "true"
+
+    # Request profiling (app.core.profiling): admins get one request profiled with `X-Profile: 1` or
+    # `?profile=1` (kept PROFILE_KEEP_HOURS); PROFILE_SAMPLE_EVERY=N also profiles 1 in N requests per
+    # route into a per-process hot-function aggregate (0 = off); stacks are sampled every PROFILE_INTERVAL_MS:
+    PROFILE_SAMPLE_EVERY = int(os.getenv("PROFILE_SAMPLE_EVERY", "0"))
+    PROFILE_INTERVAL_MS = int(os.getenv("PROFILE_INTERVAL_MS", "2"))
+    PROFILE_KEEP_HOURS = 72
 
     # jwt:
     JWT_SECRET_KEY = os.getenv("SECRET_KEY")
     ALGORITHM = os.getenv("ALGO_HASH")
     ACCESS_TOKEN_EXPIRE_MINUTES = 3000
     JWT_RESET_SECRET_KEY = os.getenv("JWT_RESET_SECRET_KEY")
+    USER_CACHE_TTL_SECONDS = 30
+
+    # Login throttling ("memory" per worker, or "mongo" shared across workers):
+    LOGIN_THROTTLE_BACKEND = os.getenv("LOGIN_THROTTLE_BACKEND", "memory")
+    LOGIN_USER_BURST = 5
+    LOGIN_USER_PER_MINUTE = 5
+    LOGIN_IP_BURST = 20
+    LOGIN_IP_PER_MINUTE = 30
+    LOGIN_FREE_FAILURES = 3
+    LOGIN_LOCKOUT_BASE_SECONDS = 2
+    LOGIN_LOCKOUT_MAX_SECONDS = 900
+    TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "1"))
 
 config = Config()
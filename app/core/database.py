@@ -1,36 +1,170 @@
+import threading
+
 from pymongo import MongoClient
+from pymongo.errors import CollectionInvalid, OperationFailure
+from pymongo.read_preferences import SecondaryPreferred
 
 from app.core.config import config
+from app.models.lesson_archive import LESSON_ARCHIVES
+from app.repositories.base import UNIQUE_KEYS
 
 
 class MongoDatabase:
     """
     Handles MongoDB connections and collections.
+    One MongoClient (and so one connection pool) serves every branch database;
+    the collection attributes below point at the default branch.
+    The client is created on first use, so importing the app never touches the network.
     """
 
     def __init__(self):
-        self.client = self.check_mongo_connection()
-        self.db = self.client[config.MONGO_DATABASE]
-        self.users_collection = self.db["Users"]
-        self.individual_lesso1ns_collection = self.db["IndividualLessons"]
-        self.group_lessons_collection = self.db["GroupLessons"]
-        self.student_payments_collection = self.db["StudentPayments"]
-        self.student_bookings_collection = self.db["StudentBookings"]
-    def check_mongo_connection(self):
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> MongoClient:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self.create_client()
+        return self._client
+
+    @property
+    def db(self):
+        return self.client[config.BRANCH_DATABASES[config.DEFAULT_BRANCH]]
+
+    @property
+    def users_collection(self):
+        return self.db["Users"]
+
+    @property
+    def individual_lesso1ns_collection(self):
+        return self.db["IndividualLessons"]
+
+    @property
+    def group_lessons_collection(self):
+        return self.db["GroupLessons"]
+
+    @property
+    def student_payments_collection(self):
+        return self.db["StudentPayments"]
+
+    @property
+    def student_bookings_collection(self):
+        return self.db["StudentBookings"]
+
+    @property
+    def auth_tokens_collection(self):
+        return self.db["AuthTokens"]
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    def get_branch_db(self, branch: str):
+        """
+        Returns the database of a branch (KeyError for unknown branches).
+        """
+        return self.client[config.BRANCH_DATABASES[branch]]
+
+    def branch_databases(self):
+        """
+        Yields (branch, database) for every configured branch.
+        """
+        for branch in config.BRANCH_DATABASES:
+            yield branch, self.get_branch_db(branch)
+
+    @staticmethod
+    def reporting(db):
+        """
+        Returns a view of `db` that reads from secondaries (falling back to the primary),
+        for reporting queries that tolerate REPORTING_MAX_STALENESS_SECONDS of lag.
+        Writes through this view still go to the primary.
+        """
+        return db.with_options(
+            read_preference=SecondaryPreferred(max_staleness=config.REPORTING_MAX_STALENESS_SECONDS)
+        )
+
+    @staticmethod
+    def ensure_indexes(db):
         """
-        Checks the MongoDB connection using the configured URI.
+        Creates the indexes the hot queries rely on in one branch database (idempotent).
+        """
+        # PayrollDrafts of earlier releases had a non-unique index and may hold duplicates: drafts are a
+        # cache, so drop them and let open months recompute
+        legacy_drafts_index = db["PayrollDrafts"].index_information().get("month_1_teacher_name_1")
+        if legacy_drafts_index is not None and not legacy_drafts_index.get("unique"):
+            db["PayrollDrafts"].drop_index("month_1_teacher_name_1")
+            db["PayrollDrafts"].delete_many({})
+            db["PayrollState"].update_many({"closed": {"$ne": True}}, {"$set": {"computed": False}})
+        # Unique keys first: write paths depend on them for correctness, not just speed
+        for collection, unique_keys in UNIQUE_KEYS.items():
+            for key in unique_keys:
+                options = {"partialFilterExpression": key.partial} if key.partial else {}
+                db[collection].create_index([(field, 1) for field in key.fields], unique=True, **options)
+        db["Users"].create_index([("role", 1), ("birthday_md", 1)])
+        # Token `_id` is the token hash, so lookups already hit the unique _id index
+        db["AuthTokens"].create_index([("user_id", 1), ("purpose", 1)])
+        # The TTL trails `expires_at` so expired tokens are still reported as expired for a while
+        try:
+            db["AuthTokens"].drop_index("expires_at_1")  # the TTL index of earlier releases
+        except OperationFailure:
+            pass
+        db["AuthTokens"].create_index("purge_at", expireAfterSeconds=0)
+        db["LoginThrottle"].create_index("expires_at", expireAfterSeconds=0)
+        db["IdempotencyKeys"].create_index("expires_at", expireAfterSeconds=0)
+        db["RenderedReports"].create_index("expires_at", expireAfterSeconds=0)
+        db["ReportJobs"].create_index("expires_at", expireAfterSeconds=0)
+        db["ReportJobs"].create_index([("status", 1), ("created_at", 1)])
+        db["ReportJobs"].create_index([("status", 1), ("lease_until", 1)])
+        db["ReportArtifacts"].create_index("expires_at", expireAfterSeconds=0)
+        for collection in ("IndividualLessons", "GroupLessons"):
+            # Overlap lookup per teacher and day (exact duplicates: the content_hash unique key)
+            db[collection].create_index([("teacher_name", 1), ("date", 1)])
+        # GET /sync: a teacher's changes in (updated_at, _id) order
+        for collection in ("IndividualLessons", "GroupLessons", "Tombstones"):
+            db[collection].create_index([("teacher_name", 1), ("updated_at", 1), ("_id", 1)])
+        db["Tombstones"].create_index("expires_at", expireAfterSeconds=0)
+        db["Profiles"].create_index("expires_at", expireAfterSeconds=0)
+        db["Profiles"].create_index("created_at")
+        # Archives are write-once and rarely read: zstd block compression trades a little CPU for disk/cache
+        existing = set(db.list_collection_names())
+        for archive in LESSON_ARCHIVES.values():
+            if archive not in existing:
+                try:
+                    db.create_collection(archive, storageEngine={"wiredTiger": {"configString": "block_compressor=zstd"}})
+                except CollectionInvalid:
+                    pass  # created concurrently by another worker
+                except OperationFailure:
+                    db.create_collection(archive)  # storage engine without per-collection options
+        for lessons in (*LESSON_ARCHIVES, *LESSON_ARCHIVES.values()):
+            db[lessons].create_index([("approved", 1), ("date", 1)])
+            db[lessons].create_index([("teacher_name", 1), ("approved", 1)])
+            db[lessons].create_index([("student_ids", 1), ("date", 1)])
+        for collection in ("StudentBookings", "StudentPayments"):
+            db[collection].create_index("student_ids")
+
+    @staticmethod
+    def create_client() -> MongoClient:
+        """
+        Creates the client without waiting for the cluster (pymongo connects in the background).
         """
         if not config.MONGO_CLUSTER_URL:
             raise KeyError("MongoDB URI is not set/loaded correctly.")
+        return MongoClient(config.MONGO_CLUSTER_URL)
 
+    def check_mongo_connection(self):
+        """
+        Pings the cluster; raises if it is unreachable.
+        """
         try:
-            client = MongoClient(config.MONGO_CLUSTER_URL)
-            client.admin.command('ping')
+            self.client.admin.command('ping')
             print("Connected to MongoDB successfully!")
-            return client
+            return self.client
         except Exception as e:
             print(f"MongoDB connection failed: {str(e)}")
             raise Exception(f"MongoDB connection failed: {str(e)}")
 
 
-mongo_db = MongoDatabase()
\ No newline at end of file
+mongo_db = MongoDatabase()
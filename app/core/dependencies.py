@@ -1,28 +1,92 @@
-from fastapi import Depends, HTTPException
+from fastapi import Depends, HTTPException, Request
 from app.core.database import mongo_db
-from app.core.security import get_current_user
+from app.core.security import verify_token
+from app.core.tenancy import get_branch
+from app.core.user_cache import get_user_profile, session_is_current
+from app.repositories import get_branch_store
 
 
-def get_database():
-    """ Dependency to get the database connection instance. """
-    return mongo_db.db
+def get_database(branch: str = Depends(get_branch)):
+    """
+    Dependency to get the pymongo database of the request's branch (shared connection pool).
+    Only for MongoDB-specific work (aggregations, bulk writes); routes otherwise use repositories.
+    """
+    return mongo_db.get_branch_db(branch)
+
+
+def get_store(branch: str = Depends(get_branch)):
+    """ Dependency to get the repository store of the request's branch. """
+    return get_branch_store(branch)
+
+
+def get_reporting_store(branch: str = Depends(get_branch)):
+    """ Dependency for read-only reporting: secondaryPreferred with bounded staleness. """
+    return get_branch_store(branch, reporting=True)
+
+
+def get_repository(collection_name: str, reporting: bool = False):
+    """
+    Generic function to get the repository of any collection.
+    `reporting=True` reads from secondaries; use it only for routes that never need to
+    read their own (or a just-made) write.
+    """
 
+    def _get_repository(store=Depends(get_reporting_store if reporting else get_store)):
+        return store[collection_name]
 
-def get_collection(collection_name: str):
-    """ Generic function to get any MongoDB collection. """
+    return _get_repository
 
-    def _get_collection(db=Depends(get_database)):
-        return db[collection_name]
 
-    return _get_collection
+def get_causal_session():
+    """
+    Dependency yielding a causally consistent session, for flows that write and then read
+    (possibly from a secondary) within one request: pass `session=` to every operation.
+    """
+    with mongo_db.client.start_session(causal_consistency=True) as session:
+        yield session
+
+
+# Optimized Repository Dependencies
+get_users_repository = get_repository("Users")
+get_individual_lessons_repository = get_repository("IndividualLessons")
+get_group_lessons_repository = get_repository("GroupLessons")
+get_student_payments_repository = get_repository("StudentPayments")
+get_student_bookings_repository = get_repository("StudentBookings")
+get_auth_tokens_repository = get_repository("AuthTokens")
+get_students_repository = get_repository("Students")
+
+# Reporting (secondaryPreferred) variants
+get_reporting_individual_lessons_repository = get_repository("IndividualLessons", reporting=True)
+get_reporting_group_lessons_repository = get_repository("GroupLessons", reporting=True)
+get_reporting_student_bookings_repository = get_repository("StudentBookings", reporting=True)
+
+def get_current_user(
+        request: Request,
+        token: str,
+        branch: str = Depends(get_branch),
+        users=Depends(get_users_repository)
+) -> dict:
+    """
+    Resolves the JWT subject against the (cached) Users profile, so role changes, deleted
+    accounts and password resets take effect without waiting for the token to expire.
+    Items of a POST /batch reuse the user the batch authenticated.
+    """
+    batch_user = getattr(request.state, "batch_user", None)
+    if batch_user is not None:
+        return batch_user
+
+    payload = verify_token(token)
+    profile = get_user_profile(branch, payload["username"], users)
+    if not profile:
+        raise HTTPException(status_code=401, detail="User no longer exists")
+    if not session_is_current(payload, profile):
+        raise HTTPException(status_code=401, detail="Session expired, please sign in again")
 
+    return {
+        "username": profile["username"],
+        "role": profile["role"]
+    }
 
-# Optimized Collection Dependencies
-get_users_collection = get_collection("Users")
-get_individual_lessons_collection = get_collection("IndividualLessons")
-get_group_lessons_collection = get_collection("GroupLessons")
-get_student_payments_collection = get_collection("StudentPayments")
-get_student_bookings_collection = get_collection("StudentBookings")
 
 def get_current_authenticated_user(user: dict = Depends(get_current_user)):
     """ Dependency to ensure the user is authenticated. """
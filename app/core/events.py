@@ -0,0 +1,167 @@
+import asyncio
+import threading
+from typing import Optional
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.core.config import config
+from app.core.metrics import metrics
+from app.models.sync import TOMBSTONES
+
+# Collections whose changes are pushed to dashboards
+WATCHED_COLLECTIONS = ["IndividualLessons", "GroupLessons", "StudentBookings"]
+LESSON_COLLECTIONS = {"IndividualLessons", "GroupLessons"}
+
+
+class Subscription:
+    """ One connected dashboard: a bounded queue plus who it belongs to. """
+
+    def __init__(self, user: dict, branch: str, loop: asyncio.AbstractEventLoop, max_queue: int = 1000):
+        self.user = user
+        self.branch = branch
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.overflowed = False
+
+    def wants(self, event: dict) -> bool:
+        """ Admins see everything in their branch; teachers only their own lessons. """
+        if event["branch"] != self.branch:
+            return False
+        if self.user["role"] == "admin":
+            return True
+        return event["collection"] in LESSON_COLLECTIONS and event.get("teacher_name") == self.user["username"]
+
+    def _put(self, event: dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow client: drop and tell it to refetch once it catches up
+            if not self.overflowed:
+                self.overflowed = True
+                metrics.incr("events_dropped")
+
+
+class EventBus:
+    """ Thread-safe fan-out from the change-stream thread to per-connection asyncio queues. """
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, user: dict, branch: str = config.DEFAULT_BRANCH) -> Subscription:
+        subscription = Subscription(user, branch, asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event: dict) -> None:
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        metrics.incr("events_published", collection=event["collection"])
+        for subscription in subscriptions:
+            if subscription.wants(event):
+                subscription.loop.call_soon_threadsafe(subscription._put, event)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscriptions)
+
+
+_BRANCH_BY_DATABASE = {database: branch for branch, database in config.BRANCH_DATABASES.items()}
+
+
+def change_to_event(change: dict) -> dict:
+    """
+    Reduce a change-stream document to the delta a dashboard needs.
+    Delete changes carry no document, so lesson deletes are sent from their tombstone (which names the
+    teacher); the lesson collections' own deletes are the archive moving lessons, which stay listed.
+    """
+    operation = change["operationType"]
+    document = change.get("fullDocument") or {}
+    if change["ns"]["coll"] == TOMBSTONES:
+        return {"branch": _BRANCH_BY_DATABASE.get(change["ns"]["db"]), "collection": document["collection"],
+                "operation": "delete", "id": str(document["doc_id"]), "teacher_name": document.get("teacher_name")}
+    event = {
+        "branch": _BRANCH_BY_DATABASE.get(change["ns"]["db"]),
+        "collection": change["ns"]["coll"],
+        "operation": operation,
+        "id": str(change["documentKey"]["_id"]),
+        "teacher_name": document.get("teacher_name"),
+    }
+
+    if operation in ("insert", "replace"):
+        event["document"] = document
+    elif operation == "update":
+        description = change.get("updateDescription", {})
+        event["updated_fields"] = description.get("updatedFields", {})
+        event["removed_fields"] = description.get("removedFields", [])
+
+    return event
+
+
+class ChangeStreamWatcher:
+    """
+    Background thread tailing one cluster-level change stream over WATCHED_COLLECTIONS
+    of every branch database. Resumes from the last seen token after transient errors.
+    Change streams need a replica set (Atlas, or the local harness in dev/replset).
+    """
+
+    def __init__(self, client, bus: EventBus):
+        self.client = client
+        self.bus = bus
+        self._resume_token = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="change-stream-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        lessons = sorted(LESSON_COLLECTIONS)
+        others = [collection for collection in WATCHED_COLLECTIONS if collection not in LESSON_COLLECTIONS]
+        pipeline = [{"$match": {
+            "ns.db": {"$in": list(_BRANCH_BY_DATABASE)},
+            "$or": [
+                {"ns.coll": {"$in": others}, "operationType": {"$in": ["insert", "update", "replace", "delete"]}},
+                {"ns.coll": {"$in": lessons}, "operationType": {"$in": ["insert", "update", "replace"]}},
+                {"ns.coll": TOMBSTONES, "operationType": "insert", "fullDocument.collection": {"$in": lessons}},
+            ],
+        }}]
+        backoff = 1
+
+        while not self._stop.is_set():
+            try:
+                with self.client.watch(pipeline, full_document="updateLookup",
+                                   resume_after=self._resume_token, max_await_time_ms=1000) as stream:
+                    backoff = 1
+                    while not self._stop.is_set() and stream.alive:
+                        change = stream.try_next()
+                        if change is None:
+                            continue
+                        self._resume_token = stream.resume_token
+                        self.bus.publish(change_to_event(change))
+            except OperationFailure as e:
+                if e.code == 40573:  # "The $changeStream stage is only supported on replica sets"
+                    print("⚠️ Change streams unavailable (not a replica set); live events disabled")
+                    return
+                print(f"❌ Change stream error: {str(e)}")
+                self._resume_token = None if e.code == 286 else self._resume_token  # ChangeStreamHistoryLost
+            except PyMongoError as e:
+                print(f"❌ Change stream error: {str(e)}")
+
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, 30)
+
+
+event_bus = EventBus()
@@ -0,0 +1,113 @@
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from fastapi import Depends, Header, HTTPException, Request, Response
+from pymongo.errors import DuplicateKeyError
+
+from app.core.config import config
+from app.core.dependencies import get_repository
+from app.core.metrics import metrics
+
+COLLECTION = "IdempotencyKeys"
+
+
+def body_hash(body: bytes) -> str:
+    """ sha256 of the JSON body with sorted keys, so a re-serialized retry hashes the same. """
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode()
+    except ValueError:
+        pass
+    return hashlib.sha256(body).hexdigest()
+
+
+class IdempotentRequest:
+    """
+    Runs a POST handler at most once per Idempotency-Key and replays the stored response on retries.
+    Without a key, identical bodies from the same caller within IDEMPOTENCY_CONTENT_WINDOW_SECONDS
+    count as one request. Claims live in IdempotencyKeys under a deterministic `_id` (so the
+    primary key is the unique index) and expire through a TTL index on `expires_at`.
+    """
+
+    def __init__(self, repository, scope: str, key: Optional[str], request_hash: str, response: Response):
+        self.repository = repository
+        self.scope = scope
+        self.key = key
+        self.request_hash = request_hash
+        self.response = response
+
+    def run(self, handler: Callable[[], dict], caller: str = "") -> dict:
+        if self.key is None and not config.IDEMPOTENCY_CONTENT_WINDOW_SECONDS:
+            return handler()
+
+        claim_id = f"{self.scope}:{caller}:" + (f"key:{self.key}" if self.key else f"body:{self.request_hash}")
+        existing = self._claim(claim_id)
+        if existing is not None:
+            return self._replay(existing)
+
+        try:
+            result = handler()
+        except BaseException:
+            # Failed requests are not remembered: the client may fix the cause and retry with the same key
+            self.repository.delete_one({"_id": claim_id, "status": "pending"})
+            raise
+
+        if self.key:
+            keep = timedelta(hours=config.IDEMPOTENCY_KEY_TTL_HOURS)
+        else:
+            keep = timedelta(seconds=config.IDEMPOTENCY_CONTENT_WINDOW_SECONDS)
+        self.repository.update_one(
+            {"_id": claim_id},
+            {"$set": {"status": "done", "response": result, "expires_at": datetime.utcnow() + keep}}
+        )
+        return result
+
+    def _claim(self, claim_id: str) -> Optional[dict]:
+        """ Insert a pending claim. Returns the live claim already holding the id instead, if any. """
+        for _ in range(3):
+            now = datetime.utcnow()
+            try:
+                self.repository.insert_one({
+                    "_id": claim_id,
+                    "status": "pending",
+                    "request_hash": self.request_hash,
+                    "created_at": now,
+                    "expires_at": now + timedelta(seconds=config.IDEMPOTENCY_LOCK_SECONDS),
+                })
+                return None
+            except DuplicateKeyError:
+                existing = self.repository.find_one({"_id": claim_id})
+            if existing is None:
+                continue
+            if existing["expires_at"] > now:
+                return existing
+            # Expired but not yet removed by the TTL monitor, or left pending by a crashed worker
+            self.repository.delete_one({"_id": claim_id, "expires_at": existing["expires_at"]})
+        raise HTTPException(status_code=409, detail="Request is already being processed, retry shortly")
+
+    def _replay(self, existing: dict) -> dict:
+        if existing["request_hash"] != self.request_hash:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+        if existing["status"] != "done":
+            raise HTTPException(status_code=409, detail="Request is already being processed, retry shortly")
+        metrics.incr("idempotent_replays", scope=self.scope)
+        self.response.headers["Idempotent-Replayed"] = "true"
+        return existing["response"]
+
+
+def idempotent(scope: str):
+    """
+    Dependency factory for retry-safe POST routes:
+        return idempotency.run(lambda: create(...), caller=current_user["username"])
+    """
+
+    async def _idempotent(
+            request: Request,
+            response: Response,
+            idempotency_key: Optional[str] = Header(None, min_length=8, max_length=200),
+            repository=Depends(get_repository(COLLECTION))
+    ) -> IdempotentRequest:
+        return IdempotentRequest(repository, scope, idempotency_key, body_hash(await request.body()), response)
+
+    return _idempotent
@@ -0,0 +1,45 @@
+import threading
+from collections import defaultdict
+from typing import Callable, Dict
+
+
+class Metrics:
+    """
+    Minimal in-process metrics registry.
+    Counters are keyed by name plus sorted labels, e.g. `login_attempts{outcome="failed"}`.
+    Gauges are callables evaluated on snapshot (handy for cache stats).
+    """
+
+    def __init__(self):
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._gauges: Dict[str, Callable[[], object]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> str:
+        if not labels:
+            return name
+        rendered = ",".join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+        return f"{name}{{{rendered}}}"
+
+    def incr(self, name: str, amount: float = 1, **labels) -> None:
+        """ Increment a counter. """
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] += amount
+
+    def register_gauge(self, name: str, fn: Callable[[], object]) -> None:
+        """ Register a callable whose value is reported on every snapshot. """
+        self._gauges[name] = fn
+
+    def snapshot(self) -> dict:
+        """ Return a copy of every counter and the current gauge values. """
+        with self._lock:
+            counters = dict(self._counters)
+        return {
+            "counters": counters,
+            "gauges": {name: fn() for name, fn in self._gauges.items()},
+        }
+
+
+metrics = Metrics()
@@ -0,0 +1,298 @@
+import asyncio
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from functools import lru_cache, wraps
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+
+from fastapi import HTTPException, Request
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+from starlette.routing import Match
+
+from app.core.config import config
+from app.core.metrics import metrics
+
+PROFILES = "Profiles"
+MAX_STACK_DEPTH = 80
+MAX_STORED_STACKS = 2000  # per stored profile, most frequent first
+MAX_AGGREGATED_STACKS = 10000  # per route in the sampled aggregate
+HOT_FUNCTIONS = 30
+
+_current: ContextVar[Optional["RequestProfile"]] = ContextVar("request_profile", default=None)
+
+
+@lru_cache(maxsize=8192)
+def _label(code) -> str:
+    filename = "/".join(code.co_filename.replace("\\", "/").split("/")[-2:])
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+def fold(frame) -> Optional[str]:
+    """ A thread's stack as one folded line, root first ("a (f.py:1);b (g.py:9)"). None while it only waits for I/O. """
+    if frame.f_code.co_filename.endswith("selectors.py"):
+        return None  # the event loop polling: nothing of this request is running on it
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_label(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+def hot_functions(stacks: Counter, top: int = HOT_FUNCTIONS) -> List[dict]:
+    """ Functions by samples spent in them (self) and under them (total). """
+    total_samples = sum(stacks.values()) or 1
+    own, inclusive = Counter(), Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")
+        own[frames[-1]] += count
+        for function in set(frames):
+            inclusive[function] += count
+    ranked = sorted(inclusive, key=lambda function: (own[function], inclusive[function]), reverse=True)[:top]
+    return [{"function": function, "self": own[function], "total": inclusive[function],
+             "self_pct": round(100 * own[function] / total_samples, 1),
+             "total_pct": round(100 * inclusive[function] / total_samples, 1)} for function in ranked]
+
+
+def folded(stacks: Counter) -> str:
+    """ Folded stacks, the input of flamegraph.pl, speedscope and inferno. """
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+class RequestProfile:
+    """
+    Sampling profiler for one request: a thread reads the stacks of the threads serving it (the event
+    loop, and the threadpool worker running a sync endpoint) every `interval` seconds.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.threads = {threading.get_ident()}
+        self.stacks = Counter()
+        self.samples = 0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, name="request-profiler", daemon=True)
+        self._started = 0.0
+
+    def start(self) -> None:
+        self._started = time.perf_counter()
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._sampler.join()
+        self.duration = time.perf_counter() - self._started
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            self.samples += 1
+            for ident in tuple(self.threads):
+                frame = frames.get(ident)
+                stack = fold(frame) if frame is not None else None
+                if stack:
+                    self.stacks[stack] += 1
+
+    @contextmanager
+    def on_thread(self):
+        ident = threading.get_ident()
+        self.threads.add(ident)
+        try:
+            yield
+        finally:
+            self.threads.discard(ident)
+
+
+class HotPaths:
+    """ Per-route aggregate of the sampled profiles of this process (PROFILE_SAMPLE_EVERY). """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seen = Counter()
+        self._stacks: Dict[str, Counter] = defaultdict(Counter)
+        self._requests = Counter()
+        self._seconds = Counter()
+
+    def should_sample(self, route: str) -> bool:
+        with self._lock:
+            self._seen[route] += 1
+            return self._seen[route] % config.PROFILE_SAMPLE_EVERY == 0
+
+    def add(self, route: str, profile: RequestProfile) -> None:
+        with self._lock:
+            stacks = self._stacks[route]
+            stacks.update(profile.stacks)
+            if len(stacks) > MAX_AGGREGATED_STACKS:
+                self._stacks[route] = Counter(dict(stacks.most_common(MAX_AGGREGATED_STACKS // 2)))
+            self._requests[route] += 1
+            self._seconds[route] += profile.duration
+
+    def snapshot(self, top: int = HOT_FUNCTIONS) -> dict:
+        with self._lock:
+            routes = {route: Counter(stacks) for route, stacks in self._stacks.items()}
+            requests, seconds, seen = dict(self._requests), dict(self._seconds), dict(self._seen)
+        return {route: {"requests": seen.get(route, 0), "profiled": requests[route],
+                        "avg_ms": round(1000 * seconds[route] / requests[route], 1),
+                        "samples": sum(stacks.values()), "hot_functions": hot_functions(stacks, top)}
+                for route, stacks in sorted(routes.items())}
+
+    def folded(self, route: str) -> Optional[str]:
+        with self._lock:
+            stacks = self._stacks.get(route)
+            return folded(stacks) if stacks is not None else None
+
+    def reset(self) -> None:
+        with self._lock:
+            self._seen.clear()
+            self._stacks.clear()
+            self._requests.clear()
+            self._seconds.clear()
+
+
+hot_paths = HotPaths()
+
+
+# ---------- Wiring ----------
+
+def _follow(call):
+    @wraps(call)
+    def run(*args, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return call(*args, **kwargs)
+        with profile.on_thread():
+            return call(*args, **kwargs)
+
+    return run
+
+
+def instrument(app) -> None:
+    """
+    Let the profiler follow sync endpoints into the threadpool (the profile reaches the worker
+    through the copied context). Call once, after every route is added.
+    """
+    for route in app.routes:
+        if isinstance(route, APIRoute) and not asyncio.iscoroutinefunction(route.dependant.call):
+            route.dependant.call = _follow(route.dependant.call)
+
+
+def _requested(scope) -> bool:
+    """ `X-Profile: 1` header or `?profile=1`. """
+    if b"profile=" in scope["query_string"]:
+        value = parse_qs(scope["query_string"].decode("latin-1")).get("profile", [""])[-1]
+        if value.lower() in ("1", "true", "yes"):
+            return True
+    for name, value in scope["headers"]:
+        if name == b"x-profile":
+            return value.lower() in (b"1", b"true", b"yes")
+    return False
+
+
+def _admin(scope) -> Optional[dict]:
+    """ The caller, if an admin (same checks as role_required("admin")). """
+    from app.core.security import verify_token
+    from app.core.tenancy import get_branch
+    from app.core.user_cache import get_user_profile, session_is_current
+    from app.repositories import get_branch_store
+
+    request = Request(scope)
+    token = request.query_params.get("token") or request.headers.get("authorization")
+    if not token:
+        return None
+    try:
+        payload = verify_token(token)
+        branch = get_branch(request)
+    except HTTPException:
+        return None
+    user = get_user_profile(branch, payload["username"], get_branch_store(branch)["Users"])
+    if not user or user["role"] != "admin" or not session_is_current(payload, user):
+        return None
+    return {"username": user["username"], "branch": branch}
+
+
+def _route(scope) -> Optional[str]:
+    app = scope.get("app")
+    for route in getattr(app, "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return f"{scope['method']} {route.path}"
+    return None
+
+
+def _save(branch: str, document: dict) -> None:
+    from app.repositories import get_branch_store
+
+    try:
+        get_branch_store(branch)[PROFILES].insert_one(document)
+    except Exception as e:
+        print(f"❌ Could not save profile {document['_id']}: {str(e)}")
+
+
+class ProfilingMiddleware:
+    """
+    Opt-in request profiling.
+    On demand: an admin adds `X-Profile: 1` (or `?profile=1`); the response carries `X-Profile-Id` and
+    the stacks are kept PROFILE_KEEP_HOURS in Profiles (GET /admin/profiles/{id}, .../folded).
+    Sampled: with PROFILE_SAMPLE_EVERY=N, 1 in N requests of every route is profiled and aggregated in
+    this process (GET /admin/profiles/hot).
+    Pure ASGI, so a request that is not profiled only pays a header scan.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _current.get() is not None:  # batch items run inside the batch's profile
+            return await self.app(scope, receive, send)
+
+        caller = await run_in_threadpool(_admin, scope) if _requested(scope) else None
+        route = None
+        if caller is None and config.PROFILE_SAMPLE_EVERY > 0:
+            route = _route(scope)
+            if route is None or not hot_paths.should_sample(route):
+                route = None
+        if caller is None and route is None:
+            return await self.app(scope, receive, send)
+
+        profile_id = uuid.uuid4().hex if caller else None
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if profile_id:
+                    message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]}
+            await send(message)
+
+        profile = RequestProfile(config.PROFILE_INTERVAL_MS / 1000)
+        token = _current.set(profile)
+        profile.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profile.stop()
+            _current.reset(token)
+            if route:
+                hot_paths.add(route, profile)
+                metrics.incr("profiled_requests", mode="sampled")
+            if caller:
+                metrics.incr("profiled_requests", mode="on_demand")
+                now = datetime.utcnow()
+                await run_in_threadpool(_save, caller["branch"], {
+                    "_id": profile_id, "method": scope["method"], "path": scope["path"],
+                    "route": _route(scope), "status": status, "duration_ms": round(profile.duration * 1000, 1),
+                    "interval_ms": config.PROFILE_INTERVAL_MS, "samples": profile.samples,
+                    "hot_functions": hot_functions(profile.stacks),
+                    "stacks": [{"stack": stack, "count": count}
+                               for stack, count in profile.stacks.most_common(MAX_STORED_STACKS)],
+                    "requested_by": caller["username"], "created_at": now,
+                    "expires_at": now + timedelta(hours=config.PROFILE_KEEP_HOURS),
+                })
@@ -0,0 +1,271 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, Request
+from pymongo import ReturnDocument
+
+from app.core.config import config
+from app.core.metrics import metrics
+
+
+class RateLimitBackend(ABC):
+    """
+    Storage for token buckets and failure counters.
+    Implement these methods to plug in a shared store (the Mongo backend below is one).
+    """
+
+    @abstractmethod
+    def take(self, key: str, capacity: float, refill_per_second: float) -> Tuple[bool, float]:
+        """ Try to take one token. Returns (allowed, seconds until the next token). """
+
+    @abstractmethod
+    def locked_for(self, key: str) -> float:
+        """ Seconds left on the key's failure lockout (0 if not locked). """
+
+    @abstractmethod
+    def record_failure(self, key: str, free_failures: int, base_seconds: float, max_seconds: float) -> int:
+        """ Count a failure and apply an exponential lockout. Returns the failure count. """
+
+    @abstractmethod
+    def reset(self, key: str) -> None:
+        """ Clear failures (e.g. after a successful login). """
+
+
+def _lockout_seconds(failures: int, free_failures: int, base_seconds: float, max_seconds: float) -> float:
+    if failures <= free_failures:
+        return 0
+    return min(base_seconds * 2 ** (failures - free_failures - 1), max_seconds)
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """
+    Per-process backend. Each worker keeps its own buckets.
+    Like the Mongo backend's TTL, a key unused for `idle_ttl` (and past its lockout) is forgotten,
+    failures included. Past `max_keys` keys, idle ones are dropped: a key is idle once forgotten, or
+    once its bucket has refilled and it has no failures, so dropping it changes nothing. If too few are
+    idle the limit is exceeded rather than handing a client a fresh bucket.
+    """
+
+    def __init__(self, max_keys: int = 50_000, idle_ttl: timedelta = timedelta(hours=1)):
+        self.max_keys = max_keys
+        self.idle_ttl = idle_ttl.total_seconds()
+        self._prune_at = max_keys
+        self._state = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, key: str) -> dict:
+        now = time.monotonic()
+        entry = self._live(key, now)
+        if entry is None:
+            if len(self._state) >= self._prune_at:
+                self._prune()
+            # tokens None: a full bucket (its capacity is only known to `take`)
+            entry = {"tokens": None, "capacity": 0, "rate": 0, "updated": now, "failures": 0,
+                     "locked_until": 0.0}
+            self._state[key] = entry
+        entry["expires"] = max(now + self.idle_ttl, entry["locked_until"])
+        return entry
+
+    def _live(self, key: str, now: float) -> Optional[dict]:
+        entry = self._state.get(key)
+        if entry is not None and entry["expires"] <= now:
+            del self._state[key]
+            return None
+        return entry
+
+    @staticmethod
+    def _idle(entry: dict, now: float) -> bool:
+        if entry["expires"] <= now:
+            return True
+        if entry["failures"] or entry["locked_until"] > now:
+            return False
+        return entry["tokens"] is None or \
+            entry["tokens"] + (now - entry["updated"]) * entry["rate"] >= entry["capacity"]
+
+    def _prune(self):
+        now = time.monotonic()
+        for key in [key for key, entry in self._state.items() if self._idle(entry, now)]:
+            del self._state[key]
+        # Scan again only after as many new keys as survived, so a full table costs O(1) per key
+        self._prune_at = max(self.max_keys, 2 * len(self._state))
+
+    def take(self, key, capacity, refill_per_second):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entry(key)
+            tokens = capacity if entry["tokens"] is None else entry["tokens"]
+            entry.update(tokens=min(capacity, tokens + (now - entry["updated"]) * refill_per_second),
+                         capacity=capacity, rate=refill_per_second, updated=now)
+            if entry["tokens"] >= 1:
+                entry["tokens"] -= 1
+                return True, 0
+            return False, (1 - entry["tokens"]) / refill_per_second
+
+    def locked_for(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._live(key, now)
+            return max(entry["locked_until"] - now, 0) if entry else 0
+
+    def record_failure(self, key, free_failures, base_seconds, max_seconds):
+        with self._lock:
+            entry = self._entry(key)
+            entry["failures"] += 1
+            lockout = _lockout_seconds(entry["failures"], free_failures, base_seconds, max_seconds)
+            if lockout:
+                entry["locked_until"] = time.monotonic() + lockout
+                entry["expires"] = max(entry["expires"], entry["locked_until"])
+            return entry["failures"]
+
+    def reset(self, key):
+        with self._lock:
+            entry = self._live(key, time.monotonic())
+            if entry:
+                entry["failures"] = 0
+                entry["locked_until"] = 0.0
+
+
+class MongoRateLimitBackend(RateLimitBackend):
+    """
+    Shared backend so every worker/instance sees the same counters.
+    Each key is one document updated atomically with a pipeline update; a TTL index on
+    `expires_at` drops idle keys.
+    """
+
+    def __init__(self, collection, idle_ttl: timedelta = timedelta(hours=1)):
+        self.collection = collection
+        self.idle_ttl = idle_ttl
+
+    def take(self, key, capacity, refill_per_second):
+        now = datetime.utcnow()
+        elapsed = {"$divide": [{"$subtract": [now, {"$ifNull": ["$updated", now]}]}, 1000]}
+        doc = self.collection.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {
+                    "tokens": {"$min": [capacity, {"$add": [{"$ifNull": ["$tokens", capacity]},
+                                                             {"$multiply": [elapsed, refill_per_second]}]}]},
+                    "updated": now,
+                    "expires_at": now + self.idle_ttl,
+                }},
+                {"$set": {"allowed": {"$gte": ["$tokens", 1]}}},
+                {"$set": {"tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", 1]}, "$tokens"]}}},
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc["allowed"]:
+            return True, 0
+        return False, (1 - doc["tokens"]) / refill_per_second
+
+    def locked_for(self, key):
+        doc = self.collection.find_one({"_id": key}, {"locked_until": 1})
+        if not doc or not doc.get("locked_until"):
+            return 0
+        return max((doc["locked_until"] - datetime.utcnow()).total_seconds(), 0)
+
+    def record_failure(self, key, free_failures, base_seconds, max_seconds):
+        now = datetime.utcnow()
+        doc = self.collection.find_one_and_update(
+            {"_id": key},
+            {"$inc": {"failures": 1}, "$set": {"expires_at": now + self.idle_ttl}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        lockout = _lockout_seconds(doc["failures"], free_failures, base_seconds, max_seconds)
+        if lockout:
+            self.collection.update_one(
+                {"_id": key},
+                {"$set": {"locked_until": now + timedelta(seconds=lockout),
+                          "expires_at": now + max(self.idle_ttl, timedelta(seconds=lockout))}}
+            )
+        return doc["failures"]
+
+    def reset(self, key):
+        self.collection.update_one({"_id": key}, {"$set": {"failures": 0, "locked_until": None}})
+
+
+class LoginThrottle:
+    """
+    Brute-force guard for /user/signin.
+    Every attempt takes a token from a per-username and a per-IP bucket; failed attempts
+    additionally lock the username/IP out for an exponentially growing period.
+    `check` must run before any DB or bcrypt work.
+    """
+
+    def __init__(self, backend: RateLimitBackend):
+        self.backend = backend
+
+    @staticmethod
+    def _keys(username: str, ip: Optional[str]):
+        keys = [f"user:{username.strip().lower()}"]
+        if ip:
+            keys.append(f"ip:{ip}")
+        return keys
+
+    def check(self, username: str, ip: Optional[str]) -> None:
+        """ Raise 429 if the username or IP is locked out or out of tokens. """
+        keys = self._keys(username, ip)
+
+        for key in keys:
+            locked_for = self.backend.locked_for(key)
+            if locked_for:
+                metrics.incr("login_throttle", result="locked", scope=key.split(":")[0])
+                raise HTTPException(status_code=429, detail="Too many failed login attempts. Try again later.",
+                                    headers={"Retry-After": str(int(locked_for) + 1)})
+
+        for key, (capacity, rate) in zip(keys, [
+            (config.LOGIN_USER_BURST, config.LOGIN_USER_PER_MINUTE / 60),
+            (config.LOGIN_IP_BURST, config.LOGIN_IP_PER_MINUTE / 60),
+        ]):
+            allowed, retry_after = self.backend.take(key, capacity, rate)
+            if not allowed:
+                metrics.incr("login_throttle", result="rate_limited", scope=key.split(":")[0])
+                raise HTTPException(status_code=429, detail="Too many login attempts. Try again later.",
+                                    headers={"Retry-After": str(int(retry_after) + 1)})
+
+        metrics.incr("login_throttle", result="allowed")
+
+    def record_failure(self, username: str, ip: Optional[str]) -> None:
+        metrics.incr("login_attempts", outcome="failed")
+        for key in self._keys(username, ip):
+            self.backend.record_failure(key, config.LOGIN_FREE_FAILURES,
+                                        config.LOGIN_LOCKOUT_BASE_SECONDS, config.LOGIN_LOCKOUT_MAX_SECONDS)
+
+    def record_success(self, username: str, ip: Optional[str]) -> None:
+        metrics.incr("login_attempts", outcome="success")
+        # Only the username is cleared: one good login must not unlock an IP spraying other accounts
+        self.backend.reset(self._keys(username, None)[0])
+
+
+def client_ip(request: Request) -> Optional[str]:
+    """
+    Client address, honouring X-Forwarded-For from `config.TRUSTED_PROXY_HOPS` trusted proxies.
+    Entries further left are client-controlled, so the n-th from the right is used.
+    """
+    hops = config.TRUSTED_PROXY_HOPS
+    forwarded = request.headers.get("x-forwarded-for")
+    if hops and forwarded:
+        addresses = [a.strip() for a in forwarded.split(",") if a.strip()]
+        if addresses:
+            return addresses[-min(hops, len(addresses))]
+    return request.client.host if request.client else None
+
+
+_login_throttle: Optional[LoginThrottle] = None
+
+
+def get_login_throttle() -> LoginThrottle:
+    """ Dependency returning the process-wide login throttle (backend chosen by config). """
+    global _login_throttle
+    if _login_throttle is None:
+        if config.LOGIN_THROTTLE_BACKEND == "mongo":
+            from app.core.database import mongo_db
+            backend = MongoRateLimitBackend(mongo_db.db["LoginThrottle"])
+        else:
+            backend = InMemoryRateLimitBackend()
+        _login_throttle = LoginThrottle(backend)
+    return _login_throttle
@@ -0,0 +1,53 @@
+import threading
+import time
+from typing import Dict, Optional
+
+
+class Readiness:
+    """
+    Startup checks reported by GET /ready.
+    Each check is "pending", "ok" or "failed"; the app is ready once every required check is ok
+    and Mongo still answers a ping (cached for `ping_ttl` seconds so probes stay cheap).
+    """
+
+    def __init__(self, required=("mongo", "indexes"), ping_ttl: float = 5.0):
+        self.required = tuple(required)
+        self.ping_ttl = ping_ttl
+        self._checks: Dict[str, dict] = {name: {"status": "pending"} for name in self.required}
+        self._last_ping = (0.0, False)
+        self._lock = threading.Lock()
+
+    def mark(self, name: str, ok: bool, error: Optional[str] = None) -> None:
+        check = {"status": "ok" if ok else "failed"}
+        if error:
+            check["error"] = error
+        with self._lock:
+            self._checks[name] = check
+
+    def pending(self, name: str) -> None:
+        with self._lock:
+            self._checks[name] = {"status": "pending"}
+
+    def _ping(self, client) -> bool:
+        checked_at, ok = self._last_ping
+        if time.monotonic() - checked_at < self.ping_ttl:
+            return ok
+        try:
+            client.admin.command("ping")
+            ok = True
+        except Exception:
+            ok = False
+        self._last_ping = (time.monotonic(), ok)
+        return ok
+
+    def snapshot(self, client=None) -> dict:
+        with self._lock:
+            checks = {name: dict(check) for name, check in self._checks.items()}
+        ready = all(checks.get(name, {}).get("status") == "ok" for name in self.required)
+        if ready and client is not None and not self._ping(client):
+            checks["mongo"] = {"status": "failed", "error": "ping failed"}
+            ready = False
+        return {"ready": ready, "checks": checks}
+
+
+readiness = Readiness()
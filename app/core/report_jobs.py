@@ -0,0 +1,275 @@
+import io
+import threading
+import uuid
+import zipfile
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from fastapi import HTTPException
+
+from app.core.analytics import PROJECTION, lesson_day, lesson_snapshots
+from app.core.config import config
+from app.core.metrics import metrics
+from app.core.readiness import readiness
+from app.core.reports import report_renderer
+from app.models.lesson_archive import LessonArchive
+from app.models.lesson_conflicts import LessonConflicts
+from app.models.report_jobs import ReportJobs
+from app.models.statements import Statements
+from app.models.trends import MAX_TREND_MONTHS, TREND_DIMENSIONS, TREND_METRICS, Trends
+from app.utils.date_utils import add_months, date_range_filter, month_bounds, parse_month
+from app.utils.send_email_with_attachments import export_to_csv_memory
+
+Progress = Callable[[int, Optional[int], str], None]
+
+
+class JobOutput(NamedTuple):
+    result: Optional[dict] = None
+    artifact: Optional[bytes] = None
+    media_type: str = "application/octet-stream"
+    filename: str = ""
+
+
+class JobType(NamedTuple):
+    validate: Callable[[dict], dict]  # normalized params (HTTPException 400 on bad input)
+    run: Callable[[Any, dict, Progress], JobOutput]  # (store, params, progress)
+    # Months the result reads (None: any); a finished job is only reused while their payroll is closed
+    months: Callable[[dict], Optional[List[str]]] = lambda params: None
+
+    def final(self, store, params: dict) -> bool:
+        """ Whether a finished job for `params` can no longer go out of date. """
+        months = self.months(params)
+        if not months:
+            return False
+        return store["PayrollState"].count({"_id": {"$in": sorted(set(months))}, "closed": True}) == len(set(months))
+
+
+class LeaseLost(Exception):
+    """ Another worker took the job over (this worker's lease lapsed). """
+
+
+class LeaseHeartbeat:
+    """
+    Renews a running job's lease from a side thread, so a handler that runs longer than
+    REPORT_JOB_LEASE_SECONDS between progress updates (a full sweep, a snapshot build) keeps its job.
+    """
+
+    def __init__(self, store, job_id: str, worker: str):
+        self.store = store
+        self.job_id = job_id
+        self.worker = worker
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._beat, name=f"report-job-lease-{job_id[:8]}", daemon=True)
+
+    def __enter__(self) -> "LeaseHeartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _beat(self) -> None:
+        while not self._stop.wait(config.REPORT_JOB_LEASE_SECONDS / 3):
+            try:
+                if not ReportJobs.renew(self.store, self.job_id, self.worker):
+                    self.lost = True
+                    return
+            except Exception as e:
+                print(f"❌ Report job {self.job_id} lease renewal failed: {str(e)}")  # retried at the next beat
+
+
+# ---------- Job types ----------
+
+def _validate_trends(params: dict) -> dict:
+    months = Trends.month_range(params.get("from"), params.get("to"))
+    if not months or len(months) > MAX_TREND_MONTHS:
+        raise HTTPException(status_code=400, detail=f"'from'..'to' must span 1 to {MAX_TREND_MONTHS} months")
+    dimension, metric = params.get("dimension", "teacher"), params.get("metric", "hours")
+    if dimension not in TREND_DIMENSIONS or metric not in TREND_METRICS:
+        raise HTTPException(status_code=400, detail=f"dimension: {', '.join(TREND_DIMENSIONS)}; "
+                                                    f"metric: {', '.join(TREND_METRICS)}")
+    return {"from": months[0], "to": months[-1], "dimension": dimension, "metric": metric,
+            "yoy": bool(params.get("yoy", True))}
+
+
+def _trend_months(params: dict) -> List[str]:
+    months = Trends.month_range(params["from"], params["to"])
+    if params["yoy"]:
+        months += [f"{int(month[:4]) - 1}{month[4:]}" for month in months]
+    return months
+
+
+def _run_trends(store, params: dict, progress: Progress) -> JobOutput:
+    progress(0, 1, "Loading lesson snapshot")
+    snapshot = lesson_snapshots.get(store)
+    months = Trends.month_range(params["from"], params["to"])
+    result = Trends.series(store, snapshot, months, params["dimension"], params["metric"], params["yoy"])
+    progress(1, 1, "Done")
+    return JobOutput(result=result)
+
+
+def _validate_month(params: dict) -> dict:
+    return {"month": parse_month(params.get("month")).strftime("%Y-%m")}
+
+
+def _run_teacher_statements(store, params: dict, progress: Progress) -> JobOutput:
+    month = params["month"]
+    documents = Statements.teacher_months(store, month)
+    names = list(documents)
+    archive = io.BytesIO()
+    chunk = max(1, 2 * config.REPORT_WORKERS)  # keeps every render process busy between progress updates
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_STORED) as bundle:
+        for start in range(0, len(names), chunk):
+            progress(start, len(names), "Rendering statements")
+            batch = names[start:start + chunk]
+            for name, (_, pdf) in zip(batch, report_renderer.render_many(store, [documents[n] for n in batch])):
+                bundle.writestr(f"{name}_{month}.pdf", pdf)
+    progress(len(names), len(names), "Done")
+    return JobOutput(result={"statements": len(names)}, artifact=archive.getvalue(), media_type="application/zip",
+                     filename=f"teacher_statements_{month}.zip")
+
+
+EXPORT_HEADERS = ["date", "lesson_type", "teacher_name", "students", "education_level", "subject", "hours"]
+
+
+def _validate_export(params: dict) -> dict:
+    first = parse_month(params.get("from"))
+    last = parse_month(params.get("to", params.get("from")))
+    if last < first:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    return {"from": first.strftime("%Y-%m"), "to": last.strftime("%Y-%m")}
+
+
+def _export_months(params: dict) -> List[str]:
+    month, last = parse_month(params["from"]), parse_month(params["to"])
+    months = []
+    while month <= last:
+        months.append(month.strftime("%Y-%m"))
+        month = add_months(month, 1)
+    return months
+
+
+def _run_lessons_export(store, params: dict, progress: Progress) -> JobOutput:
+    start, end = month_bounds(params["from"])[0], month_bounds(params["to"])[1]
+    rows = []
+    for step, (collection, lesson_type) in enumerate((("IndividualLessons", "individual"), ("GroupLessons", "group"))):
+        progress(step, 2, f"Reading {collection}")
+        query = {"approved": True, **date_range_filter(start, end)}
+        find = LessonArchive.find_rows if config.RAW_BSON_READS else LessonArchive.find
+        for lesson in find(store[collection], query, PROJECTION, since=start):
+            day = lesson_day(lesson.get("date"))
+            students = [lesson.get("student_name")] if lesson_type == "individual" else lesson.get("student_names")
+            rows.append({
+                "date": day.isoformat() if day else "", "lesson_type": lesson_type,
+                "teacher_name": lesson.get("teacher_name", ""), "students": "; ".join(filter(None, students or [])),
+                "education_level": lesson.get("education_level", ""), "subject": lesson.get("subject", ""),
+                "hours": lesson.get("hours", ""),
+            })
+    rows.sort(key=lambda row: (row["date"], row["teacher_name"]))
+    progress(2, 2, "Done")
+    # BOM so spreadsheet apps read the Arabic names as UTF-8
+    csv = export_to_csv_memory(rows, EXPORT_HEADERS).encode("utf-8-sig")
+    return JobOutput(result={"lessons": len(rows)}, artifact=csv, media_type="text/csv",
+                     filename=f"lessons_{params['from']}_{params['to']}.csv")
+
+
+def _validate_conflicts(params: dict) -> dict:
+    return {"teacher_name": params.get("teacher_name") or None}
+
+
+def _run_lesson_conflicts(store, params: dict, progress: Progress) -> JobOutput:
+    progress(0, 1, "Sweeping lessons")
+    result = LessonConflicts.sweep(store, params["teacher_name"])
+    progress(1, 1, "Done")
+    return JobOutput(result=result)
+
+
+JOB_TYPES: Dict[str, JobType] = {
+    "trends": JobType(_validate_trends, _run_trends, _trend_months),
+    "teacher_statements": JobType(_validate_month, _run_teacher_statements, lambda params: [params["month"]]),
+    "lessons_export": JobType(_validate_export, _run_lessons_export, _export_months),
+    "lesson_conflicts": JobType(_validate_conflicts, _run_lesson_conflicts),
+}
+
+
+# ---------- Workers ----------
+
+class JobWorkers:
+    """
+    Threads that run queued report jobs of every branch. CPU-heavy steps already leave the thread
+    (PDF layout runs on the report process pool, stats on the NumPy snapshot), so threads suffice.
+    Every process may run workers: jobs are claimed atomically, and a job left behind by a stopped
+    process is picked up again when its lease lapses.
+    """
+
+    def __init__(self, count: int):
+        self.count = count
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._threads = []
+
+    def start(self) -> None:
+        self._stop.clear()
+        for i in range(self.count):
+            thread = threading.Thread(target=self._loop, args=(f"{uuid.uuid4().hex[:8]}-{i}",),
+                                      name=f"report-job-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        self._threads = []
+
+    def wake(self) -> None:
+        """ A job was queued in this process: look now instead of at the next poll. """
+        self._wake.set()
+
+    def _loop(self, worker: str) -> None:
+        from app.repositories import get_branch_store
+
+        while not self._stop.is_set():
+            ran = False
+            if not readiness.snapshot()["ready"]:  # Mongo not reached or indexes not built yet
+                self._stop.wait(config.REPORT_JOB_POLL_SECONDS)
+                continue
+            for branch in config.BRANCH_DATABASES:
+                try:
+                    store = get_branch_store(branch)
+                    job = ReportJobs.claim(store, worker)
+                except Exception as e:
+                    print(f"❌ Report job claim failed for branch {branch}: {str(e)}")
+                    continue
+                if job is not None:
+                    self.run(store, job, worker)
+                    ran = True
+            if not ran:
+                self._wake.wait(config.REPORT_JOB_POLL_SECONDS)
+                self._wake.clear()
+
+    @staticmethod
+    def run(store, job: dict, worker: str) -> None:
+        heartbeat = LeaseHeartbeat(store, job["_id"], worker)
+
+        def progress(done: int, total: Optional[int], message: str = "") -> None:
+            if heartbeat.lost or not ReportJobs.progress(store, job["_id"], worker, done, total, message):
+                raise LeaseLost()
+
+        print(f"🧾 Running report job {job['type']} {job['_id']} (attempt {job['attempts']})")
+        try:
+            with heartbeat:
+                output = JOB_TYPES[job["type"]].run(store, job["params"], progress)
+            if heartbeat.lost or not ReportJobs.complete(store, job["_id"], worker, output.result, output.artifact,
+                                                         output.media_type, output.filename):
+                raise LeaseLost()
+            metrics.incr("report_jobs", type=job["type"], outcome="done")
+        except LeaseLost:
+            print(f"⚠️ Report job {job['_id']} was taken over by another worker")
+        except Exception as e:
+            print(f"❌ Report job {job['type']} {job['_id']} failed: {str(e)}")
+            ReportJobs.fail(store, job["_id"], worker, str(e))
+            metrics.incr("report_jobs", type=job["type"], outcome="failed")
+
+
+job_workers = JobWorkers(config.REPORT_JOB_WORKERS)
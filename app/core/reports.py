@@ -0,0 +1,73 @@
+import hashlib
+import json
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from app.core.config import config
+from app.core.metrics import metrics
+from app.utils.pdf import render_pdf
+
+RENDERER_VERSION = 1  # bump when the layout changes, so cached PDFs are not reused
+
+
+class ReportRenderer:
+    """
+    Renders report documents (app.utils.pdf) to PDF in a pool of worker processes, so layout and
+    shaping never hold the GIL of an API worker.
+    PDFs are cached in RenderedReports under the hash of the document, the font and RENDERER_VERSION:
+    an unchanged statement is served from the cache, and the hash doubles as its ETag.
+    The pool starts on first use with the "spawn" start method (forking a process that already runs
+    scheduler and watcher threads is unsafe).
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    @staticmethod
+    def content_hash(document: dict) -> str:
+        payload = json.dumps([RENDERER_VERSION, config.REPORT_FONT_PATH, document], sort_keys=True,
+                             ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def render_many(self, store, documents: List[dict]) -> List[Tuple[str, bytes]]:
+        """ (hash, PDF) per document: cached ones from the store, the others rendered in parallel. """
+        hashes = [self.content_hash(document) for document in documents]
+        cache = store["RenderedReports"]
+        cached = {doc["_id"]: doc["pdf"] for doc in cache.find({"_id": {"$in": list(set(hashes))}}, {"pdf": 1})}
+        metrics.incr("report_cache_hits", sum(1 for digest in hashes if digest in cached))
+
+        pending = {}
+        for digest, document in zip(hashes, documents):
+            if digest not in cached and digest not in pending:
+                pending[digest] = self.pool().submit(render_pdf, document, config.REPORT_FONT_PATH)
+        now = datetime.utcnow()
+        for digest, future in pending.items():
+            cached[digest] = future.result(timeout=config.REPORT_RENDER_TIMEOUT_SECONDS)
+            cache.update_one({"_id": digest}, {"$set": {
+                "pdf": cached[digest], "created_at": now, "expires_at": now + timedelta(days=config.REPORT_CACHE_DAYS),
+            }}, upsert=True)
+        metrics.incr("reports_rendered", len(pending))
+        return [(digest, cached[digest]) for digest in hashes]
+
+    def render(self, store, document: dict) -> Tuple[str, bytes]:
+        return self.render_many(store, [document])[0]
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+report_renderer = ReportRenderer(config.REPORT_WORKERS)
@@ -0,0 +1,204 @@
+import math
+import threading
+import time
+from collections import Counter
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Set
+
+from app.core.config import config
+from app.core.store_indexes import StoreIndexes
+from app.utils.text import normalize_name, normalize_phone
+
+SEARCH_KINDS = ("student", "teacher", "contact")
+
+# Share of the query's grams a record must contain to count as a (typo-tolerant) match
+MIN_SIMILARITY = 0.5
+# Records ranked per result tier; larger tiers are cut before ranking
+RANK_WINDOW = 500
+
+_EMPTY = frozenset()
+
+
+def _grams(text: str) -> Set[str]:
+    """
+    Grams indexed for a normalized text: trigrams inside each word, plus " x" and " xy"
+    word-start grams so one- and two-letter queries work as prefix searches.
+    """
+    grams = set()
+    for word in text.split():
+        grams.add(" " + word[:1])
+        grams.add(" " + word[:2])
+        for i in range(len(word) - 2):
+            grams.add(word[i:i + 3])
+    return grams
+
+
+def _query_grams(text: str) -> Set[str]:
+    """ Trigrams of the longer query words; short words become word-start grams. """
+    grams = set()
+    for word in text.split():
+        if len(word) < 3:
+            grams.add(" " + word)
+        else:
+            grams.update(word[i:i + 3] for i in range(len(word) - 2))
+    return grams
+
+
+def normalize_query(query: str) -> str:
+    text = normalize_name(query)
+    digits = normalize_phone(query)
+    if digits and not any(ch.isalpha() for ch in text):
+        return digits  # a phone number, whatever its formatting
+    return text
+
+
+class _Entry:
+    __slots__ = ("kind", "key", "label", "text", "grams", "detail")
+
+    def __init__(self, kind: str, key: str, label: str, text: str, grams: Set[str], detail: Optional[dict]):
+        self.kind = kind
+        self.key = key
+        self.label = label
+        self.text = text
+        self.grams = grams
+        self.detail = detail
+
+
+class SearchIndex:
+    """
+    Gram index over one branch's students (name + aliases), teachers (username) and
+    booking contacts (parent name + phone).
+    Records are addressed by (kind, key); upserting a record replaces its previous grams.
+    """
+
+    def __init__(self):
+        self._ids: Dict[tuple, int] = {}
+        self._entries: Dict[int, _Entry] = {}
+        self._postings: Dict[str, Set[int]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def upsert(self, kind: str, key: str, label: str, terms: Iterable[str], detail: Optional[dict] = None):
+        text = " ".join(term for term in terms if term)
+        grams = _grams(text)
+        with self._lock:
+            self._remove((kind, key))
+            if not grams:
+                return
+            entry_id = self._next_id
+            self._next_id += 1
+            self._ids[(kind, key)] = entry_id
+            self._entries[entry_id] = _Entry(kind, key, label, text, grams, detail)
+            for gram in grams:
+                self._postings.setdefault(gram, set()).add(entry_id)
+
+    def remove(self, kind: str, key: str):
+        with self._lock:
+            self._remove((kind, key))
+
+    def _remove(self, ident: tuple):
+        entry_id = self._ids.pop(ident, None)
+        if entry_id is None:
+            return
+        entry = self._entries.pop(entry_id)
+        for gram in entry.grams:
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(entry_id)
+                if not posting:
+                    del self._postings[gram]
+
+    def detail(self, kind: str, key: str) -> Optional[dict]:
+        with self._lock:
+            entry_id = self._ids.get((kind, key))
+            return self._entries[entry_id].detail if entry_id is not None else None
+
+    def search(self, query: str, limit: int = 20, kinds: Optional[Iterable[str]] = None) -> List[dict]:
+        """
+        Records containing every query gram come first (word-prefix matches ahead of
+        substring matches), then records sharing at least MIN_SIMILARITY of the grams.
+        Within a tier shorter records rank first; only RANK_WINDOW records per tier are
+        ranked, which keeps one-letter queries as cheap as full names.
+        """
+        text = normalize_query(query)
+        query_grams = _query_grams(text)
+        if not query_grams:
+            return []
+        kinds = set(kinds) if kinds else None
+
+        with self._lock:
+            postings = [self._postings.get(gram, _EMPTY) for gram in query_grams]
+            postings.sort(key=len)
+            exact = postings[0].intersection(*postings[1:]) if postings[0] else _EMPTY
+            word_start = self._postings.get(" " + text[:2], _EMPTY) if len(text) >= 2 else exact
+            tiers = [(len(query_grams), exact & word_start), (len(query_grams), exact - word_start)]
+
+            if len(exact) < limit and len(postings) > 1:
+                # Typo tolerance: count grams per record (Counter.update runs in C)
+                counts = Counter()
+                for posting in postings:
+                    counts.update(posting)
+                needed = max(1, math.ceil(len(query_grams) * MIN_SIMILARITY))
+                by_matched: Dict[int, list] = {}
+                for entry_id, matched in counts.items():
+                    if needed <= matched < len(query_grams):
+                        by_matched.setdefault(matched, []).append(entry_id)
+                tiers += sorted(by_matched.items(), reverse=True)
+
+            results = []
+            for matched, entry_ids in tiers:
+                entries = (self._entries[entry_id] for entry_id in entry_ids)
+                if kinds:
+                    entries = (entry for entry in entries if entry.kind in kinds)
+                window = sorted(islice(entries, RANK_WINDOW), key=lambda entry: len(entry.text))
+                for entry in window[:limit - len(results)]:
+                    result = {"type": entry.kind, "id": entry.key, "label": entry.label,
+                              "score": round(matched / len(query_grams), 2)}
+                    if entry.detail:
+                        result.update(entry.detail)
+                    results.append(result)
+                if len(results) >= limit:
+                    break
+        return results
+
+    # ---------- Record builders ----------
+
+    def upsert_student(self, student: dict):
+        self.upsert("student", str(student["_id"]), student["name"], student.get("keys", []))
+
+    def upsert_teacher(self, username: str):
+        self.upsert("teacher", username, username, [normalize_name(username)])
+
+    def add_booking_contact(self, booking: dict):
+        """ One contact per phone number (or parent name); students of all its bookings accumulate. """
+        phone = normalize_phone(booking.get("phone"))
+        parent = booking.get("parentName") or ""
+        key = phone or normalize_name(parent)
+        if not key:
+            return
+        previous = self.detail("contact", key) or {}
+        students = list(dict.fromkeys([*previous.get("students", []), *booking.get("students", [])]))[:10]
+        label = parent.strip() or previous.get("parentName") or booking.get("phone")
+        self.upsert("contact", key, label, [normalize_name(label), phone],
+                    {"phone": booking.get("phone") or previous.get("phone"), "parentName": label,
+                     "students": students})
+
+
+def build_index(store) -> SearchIndex:
+    """ Full scan of the indexed fields of one branch store. """
+    index = SearchIndex()
+    for student in store["Students"].find({}, {"name": 1, "keys": 1}):
+        index.upsert_student(student)
+    for user in store["Users"].find({"role": "teacher"}, {"username": 1}):
+        index.upsert_teacher(user["username"])
+    for booking in store["StudentBookings"].find({}, {"parentName": 1, "phone": 1, "students": 1}, sort="_id"):
+        index.add_booking_contact(booking)
+    return index
+
+
+search_indexes = StoreIndexes(build_index, config.SEARCH_INDEX_MAX_AGE_SECONDS, "search_index",
+                              hard_max_age=config.SEARCH_INDEX_HARD_MAX_AGE_SECONDS)
@@ -1,8 +1,8 @@
-from fastapi import Depends, HTTPException
+from fastapi import HTTPException
 from jose import JWTError, jwt
 from datetime import datetime, timezone, timedelta
 from app.core.config import config
-import random
+import secrets
 import string
 
 
@@ -39,30 +39,6 @@ def verify_token(token: str) -> dict:
         raise HTTPException(status_code=401, detail="Invalid token")
 
 
-def get_current_user(token: dict = Depends(verify_token)) -> dict:
-    """ Extracts and returns user information from JWT token. """
-    return {
-        "username": token["username"],
-        "role": token["role"]
-    }
-
-
-def create_reset_token(email: str):
-    """ Generate a password reset token with a short expiration. """
-    expire = datetime.utcnow() + timedelta(minutes=config.ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode = {"sub": email, "exp": expire}
-    return jwt.encode(to_encode, config.JWT_RESET_SECRET_KEY, algorithm=config.ALGORITHM)
-
-
-def verify_reset_token(token: str):
-    """ Verify a password reset token and return the email if valid. """
-    try:
-        payload = jwt.decode(token, config.JWT_RESET_SECRET_KEY, algorithms=[config.ALGORITHM])
-        return payload["sub"]
-    except JWTError:
-        return None
-
-
 def generate_token(length: int = 40) -> str:
     """ Generate a secure random token. """
-    return ''.join(random.choices(string.ascii_letters + string.digits, k=length))
+    return ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(length))
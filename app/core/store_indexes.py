@@ -0,0 +1,100 @@
+import threading
+import time
+from typing import Callable, Dict, Generic, Optional, TypeVar
+
+from app.core.metrics import metrics
+
+Index = TypeVar("Index")
+
+
+class StoreIndexes(Generic[Index]):
+    """
+    One lazily built in-process index per branch store (search index, analytics snapshot).
+    Write paths call `apply(store, change)`; changes go straight into a built index (and are
+    replayed onto a rebuild in flight). Indexes older than `max_age` seconds are rebuilt in a
+    background thread while the old one keeps serving, which picks up other workers' writes;
+    one older than `hard_max_age`, if set (e.g. after an idle period), is not served: `get` rebuilds it,
+    or waits for the rebuild in flight.
+    Indexes expose `built_at` (time.monotonic(), taken before the build reads) and `__len__`.
+    """
+
+    def __init__(self, build: Callable[..., Index], max_age: int, name: str, hard_max_age: Optional[int] = None):
+        self.build = build
+        self.max_age = max_age
+        self.hard_max_age = max(hard_max_age, max_age) if hard_max_age is not None else float("inf")
+        self.name = name
+        self._indexes: Dict[str, Index] = {}
+        self._rebuilding: Dict[str, list] = {}  # store -> changes to replay onto the rebuild
+        self._rebuilt: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def get(self, store) -> Index:
+        index = self._indexes.get(store.name)
+        if index is None:
+            with self._lock:
+                index = self._indexes.get(store.name)
+                if index is None:
+                    started = time.perf_counter()
+                    index = self._indexes[store.name] = self.build(store)
+                    print(f"🔎 {self.name} for {store.name}: {len(index)} records "
+                          f"in {time.perf_counter() - started:.2f}s")
+            return index
+
+        age = time.monotonic() - index.built_at
+        if age > self.hard_max_age:
+            return self._refresh(store)
+        if age > self.max_age and self._claim(store):
+            threading.Thread(target=self._rebuild_logged, args=(store,), name=f"{self.name}-{store.name}",
+                             daemon=True).start()
+        return index
+
+    def apply(self, store, change: Callable[[Index], None]) -> None:
+        with self._lock:
+            index = self._indexes.get(store.name)
+            if store.name in self._rebuilding:
+                self._rebuilding[store.name].append(change)
+        if index is not None:
+            change(index)
+
+    def _claim(self, store) -> bool:
+        """ Start tracking a rebuild of the store's index. False if one is already running. """
+        with self._lock:
+            if store.name in self._rebuilding:
+                return False
+            self._rebuilding[store.name] = []
+            self._rebuilt[store.name] = threading.Event()
+            return True
+
+    def _rebuild(self, store) -> None:
+        """ Rebuild a claimed index. Raises the build's error. """
+        try:
+            index = self.build(store)
+            with self._lock:
+                for change in self._rebuilding[store.name]:
+                    change(index)
+                self._indexes[store.name] = index
+            metrics.incr(f"{self.name}_rebuilds")
+        finally:
+            with self._lock:
+                self._rebuilding.pop(store.name, None)
+                self._rebuilt.pop(store.name).set()
+
+    def _rebuild_logged(self, store) -> None:
+        try:
+            self._rebuild(store)
+        except Exception as e:
+            print(f"❌ {self.name} rebuild failed for {store.name}: {str(e)}")
+
+    def _refresh(self, store) -> Index:
+        """ A rebuilt index: waits for the rebuild in flight, or rebuilds in this thread. """
+        while True:
+            with self._lock:
+                index = self._indexes[store.name]
+                if time.monotonic() - index.built_at <= self.hard_max_age:
+                    return index
+                rebuilt = self._rebuilt.get(store.name)
+            if rebuilt is not None:
+                rebuilt.wait()  # if it failed, the next pass rebuilds here
+            elif self._claim(store):
+                metrics.incr(f"{self.name}_blocking_rebuilds")
+                self._rebuild(store)
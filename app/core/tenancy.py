@@ -0,0 +1,58 @@
+from typing import Optional
+
+from fastapi import HTTPException, Request
+from jose import JWTError, jwt
+
+from app.core.config import config
+from app.core.metrics import metrics
+
+
+def _token_branch(request: Request) -> Optional[str]:
+    """
+    Branch of the request's JWT (query `token` or Authorization header), None without a valid one.
+    Tokens issued before branches carry no claim and belong to DEFAULT_BRANCH.
+    """
+    token = request.query_params.get("token") or request.headers.get("authorization")
+    if not token:
+        return None
+    if token.startswith("Bearer "):
+        token = token.split("Bearer ")[1]
+    try:
+        payload = jwt.decode(token, config.JWT_SECRET_KEY, algorithms=[config.ALGORITHM])
+    except JWTError:
+        return None  # verify_token will reject it with a proper 401
+    return payload.get("branch") or config.DEFAULT_BRANCH
+
+
+def _host_branch(request: Request) -> Optional[str]:
+    """ First label of the Host header, e.g. "north" for north.al-maram.com. """
+    host = request.headers.get("host", "").split(":")[0]
+    return host.split(".")[0].lower() if host else None
+
+
+def get_branch(request: Request) -> str:
+    """
+    Dependency resolving the institute branch of a request.
+    A valid JWT decides (users belong to one branch; tokens without a claim belong to DEFAULT_BRANCH),
+    so `branch` and Host can never move a session to another branch's users. Only requests without
+    one use an explicit `branch` query parameter (emailed links), then the Host header.
+    Resolved once per request.
+    """
+    branch = getattr(request.state, "branch", None)
+    if branch:
+        return branch
+
+    branch = _token_branch(request)
+    if branch is None:
+        for candidate in (request.query_params.get("branch"), _host_branch(request)):
+            if candidate in config.BRANCH_DATABASES:
+                branch = candidate
+                break
+        else:
+            branch = config.DEFAULT_BRANCH
+    elif branch not in config.BRANCH_DATABASES:
+        raise HTTPException(status_code=401, detail="Token branch is not served here")
+
+    request.state.branch = branch
+    metrics.incr("branch_requests", branch=branch)
+    return branch
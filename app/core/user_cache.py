@@ -0,0 +1,35 @@
+from typing import Optional
+
+from app.core.config import config
+from app.core.metrics import metrics
+from app.utils.cache import TTLCache
+
+# (branch, username) -> {"username", "role", "token_version"}; short TTL so changes made directly in the DB
+# (and by other workers) still propagate quickly
+user_profile_cache = TTLCache(ttl=config.USER_CACHE_TTL_SECONDS)
+metrics.register_gauge("user_profile_cache", user_profile_cache.stats)
+
+_NOT_FOUND = {}
+
+
+def get_user_profile(branch: str, username: str, users) -> Optional[dict]:
+    """ Return the current authorization state of a user, reading Users only on a cache miss. """
+    profile = user_profile_cache.get((branch, username))
+    if profile is None:
+        profile = users.find_one({"username": username},
+                                 {"_id": 0, "username": 1, "role": 1, "token_version": 1}) or _NOT_FOUND
+        user_profile_cache.set((branch, username), profile)
+    return profile or None
+
+
+def session_is_current(payload: dict, profile: dict) -> bool:
+    """
+    Whether a JWT was issued after the user's last password reset: sign-in copies the user's
+    `token_version` into the token and a reset increments it (both 0 for tokens from before versioning).
+    """
+    return payload.get("token_version", 0) == profile.get("token_version", 0)
+
+
+def invalidate_user_profile(branch: str, username: str) -> None:
+    """ Call after changing a user's role or password, or deleting the user. """
+    user_profile_cache.invalidate((branch, username))
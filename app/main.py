@@ -1,12 +1,94 @@
+import threading
+import time
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import user,teacher,group_lessons,admin,student_payments,booking
+from fastapi.responses import ORJSONResponse
+from app.core.config import config
+from app.core.database import mongo_db
+from app.core.profiling import ProfilingMiddleware, instrument
+from app.core.events import ChangeStreamWatcher, event_bus
+from app.core.readiness import readiness
+from app.core.report_jobs import job_workers
+from app.core.reports import report_renderer
+from app.models.auth_token import AuthToken
+from app.models.base_user import User
+from app.models.student import Student
+from app.repositories import get_branch_store, uses_mongo
+from app.routes import user,teacher,group_lessons,admin,student_payments,booking,events,payroll,students,search,reports,sync,batch
+
+def prepare_databases():
+    """
+    Connect, create indexes and run data migrations in every branch database.
+    Runs off the event loop so the server starts immediately; /ready flips as the checks pass.
+    """
+    if not uses_mongo():
+        readiness.mark("mongo", True)
+        readiness.mark("indexes", True)
+        return
+
+    backoff = 1
+    while True:
+        try:
+            mongo_db.check_mongo_connection()
+            readiness.mark("mongo", True)
+            break
+        except Exception as e:
+            readiness.mark("mongo", False, str(e))
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+    try:
+        for branch, db in mongo_db.branch_databases():
+            mongo_db.ensure_indexes(db)
+        readiness.mark("indexes", True)
+    except Exception as e:
+        print(f"❌ Index creation failed: {str(e)}")
+        readiness.mark("indexes", False, str(e))
+        return
+
+    # Migrations are idempotent and the app works without them, so they don't gate readiness
+    readiness.pending("migrations")
+    try:
+        for branch, db in mongo_db.branch_databases():
+            User.backfill_birthday_md(db["Users"])
+            AuthToken.migrate_legacy_verification_tokens(db["Users"], db["AuthTokens"])
+            AuthToken.backfill_purge_at(db["AuthTokens"])
+            Student.backfill(get_branch_store(branch))
+        readiness.mark("migrations", True)
+    except Exception as e:
+        print(f"❌ Startup migrations failed: {str(e)}")
+        readiness.mark("migrations", False, str(e))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    threading.Thread(target=prepare_databases, name="prepare-databases", daemon=True).start()
+    scheduler = booking.start_scheduler()
+    watcher = None
+    if config.LIVE_EVENTS_ENABLED and uses_mongo():
+        watcher = ChangeStreamWatcher(mongo_db.client, event_bus)
+        watcher.start()
+    job_workers.start()
+
+    yield
+
+    job_workers.stop()
+    scheduler.shutdown(wait=False)
+    report_renderer.shutdown()
+    if watcher:
+        watcher.stop()
+    mongo_db.close()
+
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Teacher Management System",
     description="An application to manage teacher and admin workflows for your institute.",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
 # Middleware
@@ -17,6 +99,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(ProfilingMiddleware)
 
 app.include_router(admin.router, prefix="/admin", tags=["admin"])
 app.include_router(user.router, prefix="/user", tags=["user"])
@@ -24,13 +107,25 @@ app.include_router(teacher.router, prefix="/teacher", tags=["teacher"])
 app.include_router(group_lessons.router, prefix="/group_lessons", tags=["group_lessons"])
 app.include_router(student_payments.router, prefix="/student_payments", tags=["student_payments"])
 app.include_router(booking.router, prefix="/booking", tags=["booking"])
+app.include_router(events.router, prefix="/events", tags=["events"])
+app.include_router(payroll.router, prefix="/payroll", tags=["payroll"])
+app.include_router(students.router, prefix="/students", tags=["students"])
+app.include_router(search.router, prefix="/search", tags=["search"])
+app.include_router(reports.router, prefix="/reports", tags=["reports"])
+app.include_router(sync.router, prefix="/sync", tags=["sync"])
+app.include_router(batch.router, prefix="/batch", tags=["batch"])
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to the Teacher Management System!"}
 
 
-@app.on_event("startup")
-def startup_event():
-    """Run when FastAPI starts"""
-    booking.start_scheduler()
\ No newline at end of file
+@app.get("/ready")
+def ready():
+    """Readiness probe: 503 until Mongo is reachable and indexes exist."""
+    state = readiness.snapshot(mongo_db.client if uses_mongo() else None)
+    return ORJSONResponse(state, status_code=200 if state["ready"] else 503)
+
+
+# After every route: lets on-demand and sampled profiles follow sync endpoints into the threadpool
+instrument(app)
@@ -0,0 +1,110 @@
+import hashlib
+from datetime import datetime, timedelta
+from typing import Optional, Tuple, Literal
+
+from app.core.security import generate_token
+
+TokenPurpose = Literal["verify", "reset"]
+TokenStatus = Literal["ok", "used", "expired", "invalid"]
+
+# Consumed tokens are kept this long so a second click can be told apart from a bogus token,
+# and expired ones this long after expiry so a late click is told "expired" rather than "invalid".
+USED_TOKEN_RETENTION = timedelta(days=30)
+EXPIRED_TOKEN_RETENTION = timedelta(days=30)
+
+
+class AuthToken:
+    """
+    One-time email tokens (verification / password reset).
+    Only a SHA-256 hash of the token is stored, as `_id`, so lookups are a unique-index hit.
+    `expires_at` decides validity; Mongo purges tokens on its own through the TTL index on `purge_at`,
+    which trails it by EXPIRED_TOKEN_RETENTION (USED_TOKEN_RETENTION after use).
+    """
+
+    @staticmethod
+    def hash_token(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def issue(user_id, purpose: TokenPurpose, expires_in: timedelta, tokens) -> str:
+        """ Create a new token for the user, revoking any unused one with the same purpose. """
+        token = generate_token()
+        now = datetime.utcnow()
+        tokens.delete_many({"user_id": user_id, "purpose": purpose, "used_at": None})
+        tokens.insert_one({
+            "_id": AuthToken.hash_token(token),
+            "user_id": user_id,
+            "purpose": purpose,
+            "created_at": now,
+            "expires_at": now + expires_in,
+            "purge_at": now + expires_in + EXPIRED_TOKEN_RETENTION,
+            "used_at": None,
+        })
+        return token
+
+    @staticmethod
+    def consume(token: str, purpose: TokenPurpose, tokens) -> Tuple[TokenStatus, Optional[dict]]:
+        """
+        Atomically mark a token as used.
+        Returns ("ok", doc) on success, otherwise the reason and the stored doc (if any).
+        """
+        token_hash = AuthToken.hash_token(token)
+        now = datetime.utcnow()
+
+        doc = tokens.find_one_and_update(
+            {"_id": token_hash, "purpose": purpose, "used_at": None, "expires_at": {"$gt": now}},
+            {"$set": {"used_at": now, "purge_at": now + USED_TOKEN_RETENTION}}
+        )
+        if doc:
+            return "ok", doc
+
+        # Slow path only on failure: one more indexed _id lookup to explain why
+        doc = tokens.find_one({"_id": token_hash, "purpose": purpose})
+        if not doc:
+            return "invalid", None
+        if doc.get("used_at"):
+            return "used", doc
+        return "expired", doc
+
+    @staticmethod
+    def migrate_legacy_verification_tokens(users_collection, tokens_collection) -> int:
+        """ Move plain-text `verificationToken` fields from Users into the hashed token store. """
+        migrated = 0
+        legacy_users = users_collection.find(
+            {"verificationToken": {"$exists": True}},
+            {"_id": 1, "verificationToken": 1, "verificationExpiry": 1, "verified": 1}
+        )
+        for user in legacy_users:
+            token = user.get("verificationToken")
+            if token and not user.get("verified"):
+                expires_at = user.get("verificationExpiry") or datetime.utcnow()
+                tokens_collection.update_one(
+                    {"_id": AuthToken.hash_token(token)},
+                    {"$setOnInsert": {
+                        "user_id": user["_id"],
+                        "purpose": "verify",
+                        "created_at": datetime.utcnow(),
+                        "expires_at": expires_at,
+                        "purge_at": expires_at + EXPIRED_TOKEN_RETENTION,
+                        "used_at": None,
+                    }},
+                    upsert=True
+                )
+                migrated += 1
+            users_collection.update_one(
+                {"_id": user["_id"]},
+                {"$unset": {"verificationToken": "", "verificationExpiry": ""}}
+            )
+        return migrated
+
+    @staticmethod
+    def backfill_purge_at(tokens_collection) -> int:
+        """ Give tokens stored before `purge_at` existed their purge date (MongoDB: pipeline update). """
+        used = int(USED_TOKEN_RETENTION.total_seconds() * 1000)
+        expired = int(EXPIRED_TOKEN_RETENTION.total_seconds() * 1000)
+        result = tokens_collection.update_many({"purge_at": {"$exists": False}}, [{"$set": {"purge_at": {"$cond": [
+            {"$ifNull": ["$used_at", False]},
+            {"$add": ["$used_at", used]},
+            {"$add": [{"$ifNull": ["$expires_at", "$$NOW"]}, expired]},
+        ]}}}])
+        return result.modified_count
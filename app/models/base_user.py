@@ -35,7 +35,40 @@ class User:
         self.verification_token = verification_token
         self.verification_expiry = verification_expiry
 
-    def save(self, users_collection):
+    @staticmethod
+    def birthday_month_day(birthday) -> Optional[str]:
+        """ Derive the indexed "MM-DD" key from a date or a "YYYY-MM-DD" string. """
+        if not birthday:
+            return None
+        if isinstance(birthday, str):
+            try:
+                birthday = datetime.strptime(birthday, "%Y-%m-%d").date()
+            except ValueError:
+                return None
+        return birthday.strftime("%m-%d")
+
+    @staticmethod
+    def backfill_birthday_md(users_collection, batch_size: int = 500):
+        """ Populate `birthday_md` for users saved before the field existed. """
+        from pymongo import UpdateOne
+
+        updated = 0
+        batch = []
+        cursor = users_collection.find(
+            {"birthday": {"$nin": [None, ""]}, "birthday_md": {"$exists": False}},
+            {"_id": 1, "birthday": 1}
+        )
+        for user in cursor:
+            batch.append(UpdateOne({"_id": user["_id"]},
+                                   {"$set": {"birthday_md": User.birthday_month_day(user["birthday"])}}))
+            if len(batch) >= batch_size:
+                updated += users_collection.bulk_write(batch, ordered=False).modified_count
+                batch = []
+        if batch:
+            updated += users_collection.bulk_write(batch, ordered=False).modified_count
+        return updated
+
+    def save(self, users):
         """ Save user data to MongoDB and return the inserted ID """
         user_data = {
             "_id": ObjectId(),
@@ -44,10 +77,9 @@ class User:
             "password": self.password,
             "role": self.role.value,
             "birthday": self.birthday.isoformat() if self.birthday else None,
-            "verified": self.verified,
-            "verificationToken": self.verification_token,
-            "verificationExpiry": self.verification_expiry
+            "birthday_md": self.birthday_month_day(self.birthday),
+            "verified": self.verified
         }
 
-        result = users_collection.insert_one(user_data)
-        return {"message": "User saved successfully", "userId": str(result.inserted_id)}
+        inserted_id = users.insert_one(user_data)
+        return {"message": "User saved successfully", "userId": str(inserted_id)}
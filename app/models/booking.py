@@ -2,6 +2,9 @@
 from datetime import datetime
 from typing import Optional, List, Literal, Dict, Any
 
+from app.core.search import search_indexes
+from app.models.sync import Sync
+
 LessonStatus = Literal["pending", "approved", "completed", "cancelled"]
 LessonType = Literal["individual", "group"]
 
@@ -79,9 +82,9 @@ class Booking:
     # ---------- CRUD helpers (ADD THESE BACK) ----------
 
     @staticmethod
-    def create_booking(booking_data: dict, student_bookings_collection):
+    def create_booking(booking_data: dict, student_bookings_repository, students_repository=None):
         """
-        Insert a new booking into MongoDB.
+        Insert a new booking.
         Expects: phone, subject, ageLevel, lessonDate, lessonTime, hours,
                  lessonType, students (frontend must provide),
                  optional: parentName, notes, status
@@ -93,28 +96,35 @@ class Booking:
         # Instantiate (will validate students vs lessonType)
         booking = Booking(**booking_data)
 
+        document = booking.to_dict()
+        if students_repository is not None:
+            from app.models.student import Student
+            document["student_ids"] = Student.ids_for(booking.students, students_repository)
+        document["updated_at"] = Sync.now()
+        search_indexes.apply(student_bookings_repository.store, lambda index: index.add_booking_contact(document))
+
         # Insert
-        result = student_bookings_collection.insert_one(booking.to_dict())
+        booking_id = student_bookings_repository.insert_one(document)
         return {
             "message": "Booking created successfully",
-            "bookingId": str(result.inserted_id),
+            "bookingId": str(booking_id),
         }
 
     @staticmethod
-    def get_all(student_bookings_collection, status: Optional[LessonStatus] = None, lessonType: Optional[LessonType] = None):
+    def get_all(student_bookings_repository, status: Optional[LessonStatus] = None, lessonType: Optional[LessonType] = None):
         query: Dict[str, Any] = {}
         if status:
             query["status"] = status
         if lessonType:
             query["lessonType"] = lessonType
 
-        bookings = list(student_bookings_collection.find(query).sort([("lessonDate", 1), ("lessonTime", 1)]))
+        bookings = student_bookings_repository.find(query, sort=[("lessonDate", 1), ("lessonTime", 1)])
         for b in bookings:
             b["_id"] = str(b["_id"])
         return bookings
 
     @staticmethod
-    def update_status(booking_id: str, new_status: LessonStatus, student_bookings_collection):
+    def update_status(booking_id: str, new_status: LessonStatus, student_bookings_repository):
         from bson import ObjectId
-        student_bookings_collection.update_one({"_id": ObjectId(booking_id)}, {"$set": {"status": new_status}})
+        student_bookings_repository.update_one({"_id": ObjectId(booking_id)}, Sync.touch({"$set": {"status": new_status}}))
         return {"message": "Status updated", "bookingId": booking_id, "status": new_status}
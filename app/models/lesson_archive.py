@@ -0,0 +1,169 @@
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from app.core.config import config
+from app.utils.date_utils import add_months, date_range_filter
+from app.utils.raw_bson import rows
+
+# Hot collection -> archive collection
+LESSON_ARCHIVES = {
+    "IndividualLessons": "IndividualLessonsArchive",
+    "GroupLessons": "GroupLessonsArchive",
+}
+STATE_ID = "lessons"
+
+
+class LessonArchive:
+    """
+    Hot/cold tiering of lessons.
+    Approved lessons dated before a cutoff move to the archive collections; ArchiveState records the
+    cutoff (`archived_before`), so a read only touches the archive when its range starts before it.
+    The cutoff is saved before any document moves, so readers never miss a lesson mid-run (they may
+    see one in both places, which `find` de-duplicates).
+    `store` is a repository store (app.repositories).
+    """
+
+    @staticmethod
+    def archived_before(store) -> Optional[datetime]:
+        """ Every archived lesson is dated before this (None: nothing archived yet). """
+        state = store["ArchiveState"].find_one({"_id": STATE_ID})
+        return state["archived_before"] if state else None
+
+    @staticmethod
+    def find(lessons_repository, filter: dict, projection: Optional[dict] = None,
+             since: Optional[datetime] = None) -> List[dict]:
+        """
+        `lessons_repository.find` over hot and archived lessons.
+        `since` is the earliest lesson date the filter can match (None: unbounded); ranges that
+        start at or after the archive cutoff are answered from the hot collection alone.
+        """
+        lessons = lessons_repository.find(filter, projection)
+        cutoff = LessonArchive.archived_before(lessons_repository.store)
+        if cutoff is None or (since is not None and since >= cutoff):
+            return lessons
+
+        archive = lessons_repository.store[LESSON_ARCHIVES[lessons_repository.name]]
+        seen = {lesson["_id"] for lesson in lessons}
+        return lessons + [lesson for lesson in archive.find(filter, projection) if lesson["_id"] not in seen]
+
+    @staticmethod
+    def find_rows(lessons_repository, filter: dict, projection: Optional[dict] = None,
+                  since: Optional[datetime] = None) -> Iterator[dict]:
+        """ `find` on the raw-BSON path (RAW_BSON_READS): lessons are decoded one at a time as they are consumed. """
+        cutoff = LessonArchive.archived_before(lessons_repository.store)
+        if cutoff is None or (since is not None and since >= cutoff):
+            yield from rows(lessons_repository.find_raw(filter, projection))
+            return
+
+        seen = set()
+        for lesson in rows(lessons_repository.find_raw(filter, projection)):
+            seen.add(lesson["_id"])
+            yield lesson
+        archive = lessons_repository.store[LESSON_ARCHIVES[lessons_repository.name]]
+        for lesson in rows(archive.find_raw(filter, projection)):
+            if lesson["_id"] not in seen:
+                yield lesson
+
+    @staticmethod
+    def restore(lessons_repository, lesson_id) -> bool:
+        """ Move one archived lesson back to its hot collection (before editing it). False if not archived. """
+        archive = lessons_repository.store[LESSON_ARCHIVES[lessons_repository.name]]
+        lesson = archive.find_one({"_id": lesson_id})
+        if lesson is None:
+            return False
+        try:
+            lessons_repository.insert_one(lesson)
+        except DuplicateKeyError:
+            if lessons_repository.find_one({"_id": lesson_id}, {"_id": 1}) is None:
+                # Same content as a newer lesson (unique content_hash): keep it, the conflicts sweep reports it
+                lesson.pop("content_hash", None)
+                lessons_repository.insert_one(lesson)
+        archive.delete_one({"_id": lesson_id})
+        return True
+
+    @staticmethod
+    def cutoff_for(now: datetime) -> datetime:
+        """ First day of the oldest month that stays hot. """
+        return add_months(datetime(now.year, now.month, 1), -(config.ARCHIVE_HOT_MONTHS - 1))
+
+    @staticmethod
+    def _unchanged(lesson: dict) -> dict:
+        """ Match `lesson` only as copied: every write bumps `version` or stamps `updated_at` (None matches missing). """
+        return {"_id": lesson["_id"], "version": lesson.get("version"), "updated_at": lesson.get("updated_at")}
+
+    @staticmethod
+    def _replace_stale_copy(archive, lesson: dict) -> None:
+        if archive.find_one(LessonArchive._unchanged(lesson), {"_id": 1}) is not None:
+            return
+        archive.delete_one({"_id": lesson["_id"]})
+        try:
+            archive.insert_one(lesson)
+        except DuplicateKeyError:
+            pass  # a concurrent run copied it again
+
+    @staticmethod
+    def _changed_since_copy(store, collection: str, lesson_id) -> bool:
+        """
+        Whether a lesson the archive run could not delete was edited (still hot) or deleted (tombstoned)
+        after it was copied. Otherwise a concurrent run moved it, and the archived copy stays.
+        """
+        from app.models.sync import TOMBSTONES
+        return store[collection].find_one({"_id": lesson_id}, {"_id": 1}) is not None or \
+            store[TOMBSTONES].find_one({"collection": collection, "doc_id": lesson_id}, {"_id": 1}) is not None
+
+    @staticmethod
+    def run(store, now: Optional[datetime] = None, batch_size: Optional[int] = None) -> Dict[str, object]:
+        """
+        Move approved lessons dated before the cutoff to the archive collections, `batch_size` at a time.
+        Safe to re-run after an interruption and to run concurrently (copies are keyed by `_id`); a lesson
+        is only deleted from its hot collection as it was copied.
+        """
+        cutoff = LessonArchive.cutoff_for(now or datetime.utcnow())
+        batch_size = batch_size or config.ARCHIVE_BATCH_SIZE
+        previous = LessonArchive.archived_before(store)
+        if previous is None or cutoff > previous:
+            store["ArchiveState"].update_one(
+                {"_id": STATE_ID}, {"$set": {"archived_before": cutoff, "updated_at": datetime.utcnow()}}, upsert=True
+            )
+        else:
+            cutoff = previous  # the cutoff never moves back: newer lessons may already be archived
+
+        moved = {}
+        query = {"approved": True, **date_range_filter(None, cutoff)}
+        for collection, archive_name in LESSON_ARCHIVES.items():
+            hot, archive = store[collection], store[archive_name]
+            moved[collection] = 0
+            while True:
+                batch = hot.find(query, limit=batch_size)
+                if not batch:
+                    break
+                try:
+                    archive.insert_many(batch, ordered=False)
+                except BulkWriteError as e:
+                    errors = e.details.get("writeErrors", [])
+                    if any(error.get("code") != 11000 for error in errors):
+                        raise
+                    # Copies left by an interrupted or concurrent run: replace the ones of an older version
+                    for error in errors:
+                        LessonArchive._replace_stale_copy(archive, batch[error["index"]])
+                for lesson in batch:
+                    if hot.delete_one({**query, **LessonArchive._unchanged(lesson)}):
+                        moved[collection] += 1
+                    elif LessonArchive._changed_since_copy(store, collection, lesson["_id"]):
+                        # Edited (e.g. rejected) or deleted between the copy and the delete: drop the stale copy
+                        archive.delete_one(LessonArchive._unchanged(lesson))
+
+        print(f"🗄️ Archived lessons before {cutoff.date()} in {store.name}: {moved}")
+        return {"archived_before": cutoff, "moved": moved}
+
+    @staticmethod
+    def run_all_branches() -> None:
+        """ Scheduled job: archive every branch. """
+        from app.repositories import get_branch_store
+        for branch in config.BRANCH_DATABASES:
+            try:
+                LessonArchive.run(get_branch_store(branch))
+            except Exception as e:
+                print(f"❌ Lesson archiving failed for branch {branch}: {str(e)}")
@@ -0,0 +1,136 @@
+import hashlib
+import json
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from app.models.lesson_archive import LessonArchive
+from app.utils.text import normalize_name
+
+LESSON_TYPES = {"IndividualLessons": "individual", "GroupLessons": "group"}
+CONFLICT_PROJECTION = {"teacher_name": 1, "date": 1, "hours": 1, "student_name": 1, "student_names": 1,
+                       "subject": 1, "education_level": 1, "approved": 1}
+# Fields that make up a lesson's content hash
+CONTENT_FIELDS = ("date", "hours", "student_name", "student_names", "subject", "education_level")
+# How far back the overlap lookup starts: a lesson begun this long before can still be running
+MAX_LESSON_HOURS = 12
+
+
+class LessonConflicts:
+    """
+    Double-booking and duplicate detection for a teacher's lessons.
+    A lesson occupies [date, date + hours). A date at exactly midnight carries no time of day (date-only
+    submissions), so such lessons are only checked for exact duplicates.
+    Exact duplicates share `content_hash` (type, teacher, date, hours, students, subject, level), stored on
+    new lessons under a unique index; overlaps are looked up per teacher and day through the
+    (teacher_name, date) index of both lesson collections.
+    `store` is a repository store (app.repositories).
+    """
+
+    @staticmethod
+    def start(lesson: dict) -> Optional[datetime]:
+        """ Lesson date as a naive UTC datetime (edits and older lessons may store ISO strings). """
+        value = lesson.get("date")
+        if isinstance(value, str):
+            try:
+                value = datetime.fromisoformat(value)
+            except ValueError:
+                return None
+        if not isinstance(value, datetime):
+            return None
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)  # Stored dates are naive UTC
+        return value
+
+    @staticmethod
+    def interval(lesson: dict) -> Optional[Tuple[datetime, datetime]]:
+        start, hours = LessonConflicts.start(lesson), lesson.get("hours")
+        if start is None or start.time() == time(0):
+            return None
+        if not isinstance(hours, (int, float)) or hours <= 0:
+            return None
+        return start, start + timedelta(hours=hours)
+
+    @staticmethod
+    def content_hash(lesson_type: str, lesson: dict) -> str:
+        students = lesson.get("student_names") if lesson_type == "group" else [lesson.get("student_name")]
+        start = LessonConflicts.start(lesson)
+        payload = json.dumps([
+            lesson_type, lesson.get("teacher_name") or "",
+            start.isoformat() if start else str(lesson.get("date") or ""),
+            f"{float(lesson.get('hours') or 0):g}",
+            sorted(normalize_name(student) for student in students or [] if student),
+            normalize_name(lesson.get("subject") or ""), normalize_name(lesson.get("education_level") or ""),
+        ], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def summary(lesson: dict, lesson_type: str) -> dict:
+        students = lesson.get("student_names") if lesson_type == "group" else [lesson.get("student_name")]
+        date = lesson.get("date")
+        return {"id": str(lesson["_id"]), "lesson_type": lesson_type,
+                "date": date.isoformat() if isinstance(date, datetime) else date,
+                "hours": lesson.get("hours"), "students": [s for s in students or [] if s],
+                "approved": lesson.get("approved", False)}
+
+    @staticmethod
+    def find(store, lesson_type: str, lesson: dict, exclude_id=None) -> Dict[str, List[dict]]:
+        """
+        Lessons a new or edited lesson would conflict with, in the hot collections:
+        {"duplicates": [...], "overlaps": [...]} (both empty when it is fine).
+        """
+        collection = {value: key for key, value in LESSON_TYPES.items()}[lesson_type]
+        not_self = {"_id": {"$ne": exclude_id}} if exclude_id is not None else {}
+        duplicates = [LessonConflicts.summary(found, lesson_type) for found in store[collection].find(
+            {"content_hash": LessonConflicts.content_hash(lesson_type, lesson), **not_self}, CONFLICT_PROJECTION)]
+
+        overlaps = []
+        span = LessonConflicts.interval(lesson)
+        if span is not None:
+            start, end = span
+            for other_collection, other_type in LESSON_TYPES.items():
+                query = {"teacher_name": lesson.get("teacher_name"), **not_self,
+                         "date": {"$gt": start - timedelta(hours=MAX_LESSON_HOURS), "$lt": end}}
+                for other in store[other_collection].find(query, CONFLICT_PROJECTION, sort=[("date", 1)]):
+                    other_span = LessonConflicts.interval(other)
+                    if other_span is not None and other_span[1] > start:
+                        overlaps.append(LessonConflicts.summary(other, other_type))
+        duplicate_ids = {found["id"] for found in duplicates}
+        return {"duplicates": duplicates, "overlaps": [o for o in overlaps if o["id"] not in duplicate_ids]}
+
+    @staticmethod
+    def sweep(store, teacher_name: Optional[str] = None) -> dict:
+        """
+        Conflicts already stored, archived lessons included: per teacher, exact duplicates grouped by
+        content hash, and overlapping pairs from one sweep over the teacher's lessons sorted by start.
+        """
+        by_teacher = defaultdict(list)
+        for collection, lesson_type in LESSON_TYPES.items():
+            query = {"teacher_name": teacher_name} if teacher_name else {}
+            for lesson in LessonArchive.find(store[collection], query, CONFLICT_PROJECTION):
+                by_teacher[lesson.get("teacher_name") or ""].append((lesson_type, lesson))
+
+        duplicates, overlaps, total = [], [], 0
+        for teacher, lessons in sorted(by_teacher.items()):
+            total += len(lessons)
+            by_hash = defaultdict(list)
+            timed = []
+            for lesson_type, lesson in lessons:
+                digest = LessonConflicts.content_hash(lesson_type, lesson)
+                summary = LessonConflicts.summary(lesson, lesson_type)
+                by_hash[digest].append(summary)
+                span = LessonConflicts.interval(lesson)
+                if span is not None:
+                    timed.append((span[0], span[1], digest, summary))
+            duplicates += [{"teacher_name": teacher, "lessons": group} for group in by_hash.values() if len(group) > 1]
+
+            timed.sort(key=lambda entry: (entry[0], entry[3]["id"]))
+            running = []  # lessons still in progress at the current start
+            for start, end, digest, summary in timed:
+                running = [entry for entry in running if entry[0] > start]
+                for _, other_digest, other in running:
+                    if other_digest != digest:  # exact duplicates are reported above
+                        overlaps.append({"teacher_name": teacher, "lessons": [other, summary]})
+                running.append((end, digest, summary))
+
+        return {"teachers": len(by_teacher), "lessons": total, "duplicates": duplicates, "overlaps": overlaps}
@@ -0,0 +1,236 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from app.models.lesson_archive import LessonArchive
+from app.utils.date_utils import month_bounds, month_filter, month_of
+
+RATE_DIMENSIONS = ("teacher_name", "lesson_type", "education_level", "subject")
+WILDCARD = "*"
+
+
+class Payroll:
+    """
+    Teacher payroll.
+    - PayRates: hourly rates per (teacher_name, lesson_type, education_level, subject); "*" matches anything
+      and the most specific matching rate wins.
+    - PayrollDrafts: current computation of open months, one document per (month, teacher).
+    - PayrollState: per month, which teachers have changed lessons since the last computation.
+    - Payslips: immutable copies written when a month is closed.
+    `db` is a repository store (app.repositories).
+    """
+
+    # ---------- Rates ----------
+
+    @staticmethod
+    def set_rate(db, rate: float, **dimensions) -> dict:
+        key = {dim: (dimensions.get(dim) or WILDCARD) for dim in RATE_DIMENSIONS}
+        db["PayRates"].update_one(key, {"$set": {"rate": float(rate), "updated_at": datetime.utcnow()}}, upsert=True)
+        # Every open month has to be recomputed with the new rate table
+        db["PayrollState"].update_many({"closed": {"$ne": True}}, {"$set": {"computed": False}})
+        return {**key, "rate": float(rate)}
+
+    @staticmethod
+    def delete_rate(db, **dimensions) -> bool:
+        key = {dim: (dimensions.get(dim) or WILDCARD) for dim in RATE_DIMENSIONS}
+        deleted = db["PayRates"].delete_one(key) > 0
+        if deleted:
+            db["PayrollState"].update_many({"closed": {"$ne": True}}, {"$set": {"computed": False}})
+        return deleted
+
+    @staticmethod
+    def get_rates(db) -> List[dict]:
+        return list(db["PayRates"].find({}, {"_id": 0}))
+
+    @staticmethod
+    def _rate_lookup(rates: List[dict]):
+        """ Build a resolver returning the most specific rate for a group key (None if unrated). """
+        weights = {"teacher_name": 8, "lesson_type": 4, "education_level": 2, "subject": 1}
+        ranked = sorted(
+            rates,
+            key=lambda r: sum(weight for dim, weight in weights.items() if r.get(dim, WILDCARD) != WILDCARD),
+            reverse=True,
+        )
+
+        def resolve(group: dict) -> Optional[float]:
+            for rate in ranked:
+                if all(rate.get(dim, WILDCARD) in (WILDCARD, group.get(dim)) for dim in RATE_DIMENSIONS):
+                    return rate["rate"]
+            return None
+
+        return resolve
+
+    @staticmethod
+    def month_rates(db, month: str, closed: Optional[bool] = None, rates: Optional[List[dict]] = None):
+        """
+        Resolver of the rates that apply to a month: a closed month keeps the rates on its payslips
+        (keys without a payslip line fall back to the current table), an open month uses the current table.
+        """
+        current = Payroll._rate_lookup(rates if rates is not None else Payroll.get_rates(db))
+        if closed is None:
+            closed = bool((db["PayrollState"].find_one({"_id": month}) or {}).get("closed"))
+        if not closed:
+            return current
+
+        frozen = {}
+        for payslip in db["Payslips"].find({"month": month}, {"teacher_name": 1, "lines": 1}):
+            for line in payslip.get("lines", []):
+                frozen[(payslip["teacher_name"], line.get("lesson_type"), line.get("education_level"),
+                        line.get("subject"))] = line.get("rate")
+
+        def resolve(group: dict) -> Optional[float]:
+            key = (group.get("teacher_name") or "Unknown Teacher", group.get("lesson_type"),
+                   group.get("education_level"), group.get("subject"))
+            return frozen[key] if key in frozen else current(group)
+
+        return resolve
+
+    # ---------- Computation ----------
+
+    @staticmethod
+    def _aggregate_hours(db, month: str, teachers: Optional[List[str]] = None) -> List[dict]:
+        """
+        Hours and lesson counts per rate key over approved individual and group lessons of the month
+        (archived ones included). One projected read per collection through the repositories, grouped
+        here, so every backend computes payroll (a month of lessons is small).
+        """
+        match = {"approved": True, **month_filter(month)}
+        if teachers is not None:
+            match["teacher_name"] = {"$in": teachers}
+        projection = {"teacher_name": 1, "education_level": 1, "subject": 1, "hours": 1}
+        since = month_bounds(month)[0]
+
+        groups: Dict[tuple, dict] = {}
+        for collection, lesson_type in (("IndividualLessons", "individual"), ("GroupLessons", "group")):
+            for lesson in LessonArchive.find(db[collection], match, projection, since=since):
+                key = {dim: lesson.get(dim) for dim in RATE_DIMENSIONS if dim != "lesson_type"}
+                key["lesson_type"] = lesson_type
+                group = groups.setdefault(tuple(key[dim] for dim in RATE_DIMENSIONS),
+                                          {"_id": key, "hours": 0, "lessons": 0})
+                hours = lesson.get("hours")
+                if isinstance(hours, (int, float)) and not isinstance(hours, bool):
+                    group["hours"] += hours  # like $sum: missing or non-numeric hours count as 0
+                group["lessons"] += 1
+        return list(groups.values())
+
+    @staticmethod
+    def _build_payslips(month: str, groups: List[dict], resolve_rate) -> Dict[str, dict]:
+        payslips: Dict[str, dict] = {}
+        for group in groups:
+            key = group["_id"]
+            teacher_name = key.get("teacher_name") or "Unknown Teacher"
+            rate = resolve_rate(key)
+            amount = round(group["hours"] * rate, 2) if rate is not None else None
+
+            payslip = payslips.setdefault(teacher_name, {
+                "month": month,
+                "teacher_name": teacher_name,
+                "lines": [],
+                "total_hours": 0,
+                "total_amount": 0,
+                "unrated_hours": 0,
+            })
+            payslip["lines"].append({
+                "lesson_type": key.get("lesson_type"),
+                "education_level": key.get("education_level"),
+                "subject": key.get("subject"),
+                "hours": group["hours"],
+                "lessons": group["lessons"],
+                "rate": rate,
+                "amount": amount,
+            })
+            payslip["total_hours"] += group["hours"]
+            if amount is None:
+                payslip["unrated_hours"] += group["hours"]
+            else:
+                payslip["total_amount"] = round(payslip["total_amount"] + amount, 2)
+
+        for payslip in payslips.values():
+            payslip["lines"].sort(key=lambda line: (line["lesson_type"] or "", line["education_level"] or "",
+                                                    line["subject"] or ""))
+        return payslips
+
+    @staticmethod
+    def mark_dirty(db, teacher_name: Optional[str], lesson_date) -> None:
+        """ Record that a teacher's approved lessons changed in the month of `lesson_date`. """
+        month = month_of(lesson_date)
+        if teacher_name and month:
+            db["PayrollState"].update_one({"_id": month}, {"$addToSet": {"dirty": teacher_name}}, upsert=True)
+
+    @staticmethod
+    def _save_drafts(drafts, month: str, payslips: Dict[str, dict], teachers: Optional[List[str]] = None) -> None:
+        """
+        Upsert each teacher's draft (unique per month and teacher, so concurrent computations can't
+        duplicate one), then drop the drafts of `teachers` (None: everyone) left without lessons.
+        """
+        for teacher_name, payslip in payslips.items():
+            key = {"month": month, "teacher_name": teacher_name}
+            try:
+                drafts.update_one(key, {"$set": payslip}, upsert=True)
+            except DuplicateKeyError:
+                drafts.update_one(key, {"$set": payslip})  # a concurrent upsert inserted it first
+        stale = {"month": month, "teacher_name": {"$nin": list(payslips)}}
+        if teachers is not None:
+            stale["teacher_name"]["$in"] = teachers
+        drafts.delete_many(stale)
+
+    @staticmethod
+    def compute_month(db, month: str) -> dict:
+        """
+        Return the payroll of a month.
+        Closed months come from Payslips. Open months recompute only teachers marked dirty since the
+        last run (everyone on the first run or after a rate change).
+        """
+        state = db["PayrollState"].find_one({"_id": month}) or {}
+
+        if state.get("closed"):
+            payslips = db["Payslips"].find({"month": month}, {"_id": 0}, sort="teacher_name")
+            return {"month": month, "closed": True, "payslips": payslips}
+
+        resolve_rate = Payroll._rate_lookup(Payroll.get_rates(db))
+        drafts = db["PayrollDrafts"]
+        dirty = state.get("dirty", [])
+
+        if not state.get("computed"):
+            payslips = Payroll._build_payslips(month, Payroll._aggregate_hours(db, month), resolve_rate)
+            Payroll._save_drafts(drafts, month, payslips)
+            db["PayrollState"].update_one(
+                {"_id": month}, {"$set": {"computed": True, "computed_at": datetime.utcnow()},
+                                 "$pullAll": {"dirty": dirty}}, upsert=True)
+        elif dirty:
+            payslips = Payroll._build_payslips(month, Payroll._aggregate_hours(db, month, dirty), resolve_rate)
+            Payroll._save_drafts(drafts, month, payslips, dirty)
+            # $pullAll only what was processed, so marks added meanwhile survive
+            db["PayrollState"].update_one({"_id": month}, {"$pullAll": {"dirty": dirty},
+                                                          "$set": {"computed_at": datetime.utcnow()}})
+
+        payslips = drafts.find({"month": month}, {"_id": 0}, sort="teacher_name")
+        return {"month": month, "closed": False, "payslips": payslips}
+
+    @staticmethod
+    def close_month(db, month: str) -> dict:
+        """ Freeze a month: copy its payroll into immutable Payslips. """
+        result = Payroll.compute_month(db, month)
+        if result["closed"]:
+            return result
+
+        now = datetime.utcnow()
+        payslips = [{**payslip, "closed_at": now} for payslip in result["payslips"]]
+        if payslips:
+            try:
+                db["Payslips"].insert_many(payslips, ordered=False)
+            except BulkWriteError:
+                pass  # A concurrent close already wrote them; the unique index keeps one copy
+        db["PayrollState"].update_one({"_id": month}, {"$set": {"closed": True, "closed_at": now}}, upsert=True)
+        db["PayrollDrafts"].delete_many({"month": month})
+        return Payroll.compute_month(db, month)
+
+    @staticmethod
+    def get_payslip(db, month: str, teacher_name: str) -> Optional[dict]:
+        """ A closed payslip, or the teacher's draft for an open month. """
+        payslip = db["Payslips"].find_one({"month": month, "teacher_name": teacher_name}, {"_id": 0})
+        if payslip:
+            return payslip
+        result = Payroll.compute_month(db, month)
+        return next((p for p in result["payslips"] if p["teacher_name"] == teacher_name), None)
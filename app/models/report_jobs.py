@@ -0,0 +1,138 @@
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+from app.core.config import config
+
+JOBS = "ReportJobs"
+ARTIFACTS = "ReportArtifacts"
+JOB_STATUSES = ("queued", "running", "done", "failed")
+
+
+class ReportJobs:
+    """
+    Persistent queue of report jobs (one collection per branch).
+    A job's `_id` is the hash of its type and normalized params, so an identical request joins the
+    queued, running or finished job instead of adding one; failed jobs, finished ones past `expires_at`
+    and finished ones the caller says are out of date are re-queued under the same id.
+    Workers claim a job with a lease (`lease_until`) that they renew while the job runs. A job whose
+    worker died is claimed again once the lease lapses, up to REPORT_JOB_MAX_ATTEMPTS times.
+    Results are stored on the job; files (CSV, ZIP) go to ReportArtifacts. Both expire through TTL indexes.
+    `store` is a repository store (app.repositories).
+    """
+
+    @staticmethod
+    def job_id(job_type: str, params: dict) -> str:
+        payload = json.dumps([job_type, params], sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+    @staticmethod
+    def enqueue(store, job_type: str, params: dict, requested_by: str, reuse_done: bool = True) -> Tuple[dict, bool]:
+        """
+        Returns (job, created); created is False when an identical job already covers the request.
+        With `reuse_done` False (data the report reads may still change), a finished job is run again.
+        """
+        jobs = store[JOBS]
+        job_id = ReportJobs.job_id(job_type, params)
+        now = datetime.utcnow()
+        queued = {"status": "queued", "progress": {"done": 0, "total": None}, "attempts": 0, "created_at": now,
+                  "requested_by": [requested_by]}
+        for _ in range(3):
+            try:
+                jobs.insert_one({"_id": job_id, "type": job_type, "params": params, **queued})
+                return jobs.find_one({"_id": job_id}), True
+            except DuplicateKeyError:
+                existing = jobs.find_one({"_id": job_id})
+            if existing is None:
+                continue  # removed by the TTL monitor meanwhile
+            stale = existing["status"] == "failed" or (existing["status"] == "done" and (
+                not reuse_done or (existing.get("expires_at") and existing["expires_at"] <= now)))
+            if not stale:
+                jobs.update_one({"_id": job_id}, {"$addToSet": {"requested_by": requested_by}})
+                return existing, False
+            # Compare-and-set on the state we read, so concurrent submitters re-queue it once
+            result = jobs.update_one(
+                {"_id": job_id, "status": existing["status"], "finished_at": existing.get("finished_at")},
+                {"$set": queued, "$unset": {"result": "", "artifact": "", "error": "", "expires_at": "",
+                                            "finished_at": "", "worker": "", "lease_until": ""}})
+            if result.modified:
+                store[ARTIFACTS].delete_one({"_id": job_id})
+                return jobs.find_one({"_id": job_id}), True
+        return jobs.find_one({"_id": job_id}), False
+
+    @staticmethod
+    def get(store, job_id: str) -> Optional[dict]:
+        return store[JOBS].find_one({"_id": job_id})
+
+    @staticmethod
+    def claim(store, worker: str) -> Optional[dict]:
+        """ Take the oldest queued job, or a running one whose worker stopped renewing its lease. """
+        jobs = store[JOBS]
+        now = datetime.utcnow()
+        candidates = jobs.find({"status": "queued"}, {"status": 1, "attempts": 1}, sort=[("created_at", 1)], limit=5)
+        candidates += jobs.find({"status": "running", "lease_until": {"$lt": now}}, {"status": 1, "attempts": 1},
+                                limit=5)
+        for candidate in candidates:
+            if candidate["attempts"] >= config.REPORT_JOB_MAX_ATTEMPTS:
+                ReportJobs.fail(store, candidate["_id"], None, "Worker stopped during every attempt")
+                continue
+            condition = {"_id": candidate["_id"], "status": candidate["status"], "attempts": candidate["attempts"]}
+            job = jobs.find_one_and_update(condition, {
+                "$set": {"status": "running", "worker": worker, "started_at": now,
+                         "lease_until": now + timedelta(seconds=config.REPORT_JOB_LEASE_SECONDS)},
+                "$inc": {"attempts": 1},
+            }, return_new=True)
+            if job is not None:
+                return job
+        return None
+
+    @staticmethod
+    def progress(store, job_id: str, worker: str, done: int, total: Optional[int], message: str = "") -> bool:
+        """ Record progress and renew the lease. False if another worker has taken the job over. """
+        now = datetime.utcnow()
+        result = store[JOBS].update_one({"_id": job_id, "status": "running", "worker": worker}, {"$set": {
+            "progress": {"done": done, "total": total, "message": message},
+            "lease_until": now + timedelta(seconds=config.REPORT_JOB_LEASE_SECONDS),
+        }})
+        return result.matched > 0
+
+    @staticmethod
+    def renew(store, job_id: str, worker: str) -> bool:
+        """ Extend the lease of a running job. False if another worker has taken the job over. """
+        lease_until = datetime.utcnow() + timedelta(seconds=config.REPORT_JOB_LEASE_SECONDS)
+        result = store[JOBS].update_one({"_id": job_id, "status": "running", "worker": worker},
+                                        {"$set": {"lease_until": lease_until}})
+        return result.matched > 0
+
+    @staticmethod
+    def complete(store, job_id: str, worker: str, result: Optional[dict] = None, artifact: Optional[bytes] = None,
+                 media_type: str = "application/octet-stream", filename: str = "") -> bool:
+        now = datetime.utcnow()
+        expires_at = now + timedelta(hours=config.REPORT_JOB_RESULT_HOURS)
+        update = {"status": "done", "result": result, "finished_at": now, "expires_at": expires_at}
+        if artifact is not None:
+            store[ARTIFACTS].update_one({"_id": job_id}, {"$set": {
+                "data": artifact, "media_type": media_type, "filename": filename, "expires_at": expires_at,
+            }}, upsert=True)
+            update["artifact"] = {"media_type": media_type, "filename": filename, "size": len(artifact)}
+        written = store[JOBS].update_one({"_id": job_id, "status": "running", "worker": worker},
+                                         {"$set": update, "$unset": {"lease_until": ""}})
+        return written.matched > 0  # False: another worker has taken the job over
+
+    @staticmethod
+    def fail(store, job_id: str, worker: Optional[str], error: str) -> None:
+        now = datetime.utcnow()
+        condition = {"_id": job_id, "status": "running", "worker": worker}
+        if worker is None:
+            condition = {"_id": job_id, "status": {"$in": ["queued", "running"]}}
+        store[JOBS].update_one(condition, {"$set": {
+            "status": "failed", "error": error, "finished_at": now,
+            "expires_at": now + timedelta(hours=config.REPORT_JOB_RESULT_HOURS),
+        }, "$unset": {"lease_until": ""}})
+
+    @staticmethod
+    def artifact(store, job_id: str) -> Optional[dict]:
+        return store[ARTIFACTS].find_one({"_id": job_id})
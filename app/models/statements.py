@@ -0,0 +1,139 @@
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from bson import ObjectId
+
+from app.core.analytics import PROJECTION, lesson_day
+from app.models.lesson_archive import LessonArchive
+from app.models.payroll import Payroll
+from app.utils.date_utils import month_bounds, month_filter
+
+LESSON_TYPE_LABELS = {"individual": "فردي", "group": "جماعي"}
+
+
+def _number(value) -> str:
+    return f"{value:g}" if isinstance(value, (int, float)) else "-"
+
+
+def _money(value) -> str:
+    return f"{value:,.2f}" if isinstance(value, (int, float)) else "-"
+
+
+class Statements:
+    """
+    Report documents (see app.utils.pdf) for teacher and student monthly statements and payment receipts.
+    Documents hold display strings only, and nothing time-dependent, so an unchanged statement hashes to
+    its cached PDF (app.core.reports).
+    `store` is a repository store (app.repositories).
+    """
+
+    @staticmethod
+    def _month_lessons(store, month: str, filter: dict) -> List[dict]:
+        """ Approved individual and group lessons of a month (archived ones included), oldest first. """
+        lessons = []
+        for collection, lesson_type in (("IndividualLessons", "individual"), ("GroupLessons", "group")):
+            query = {"approved": True, **filter, **month_filter(month)}
+            for lesson in LessonArchive.find(store[collection], query, PROJECTION, since=month_bounds(month)[0]):
+                lesson["lesson_type"] = lesson_type
+                lessons.append(lesson)
+
+        def sort_key(lesson):
+            day = lesson_day(lesson.get("date"))
+            return day.isoformat() if day else "", str(lesson["_id"])
+
+        return sorted(lessons, key=sort_key)
+
+    @staticmethod
+    def _students(lesson: dict) -> str:
+        if lesson["lesson_type"] == "individual":
+            return lesson.get("student_name") or ""
+        return "، ".join(lesson.get("student_names") or [])
+
+    @staticmethod
+    def _teacher_document(month: str, teacher_name: str, lessons: List[dict], resolve_rate) -> dict:
+        rows, total_hours, total_amount, unrated_hours = [], 0, 0, 0
+        for lesson in lessons:
+            hours = lesson.get("hours") or 0
+            rate = resolve_rate({"teacher_name": teacher_name, "lesson_type": lesson["lesson_type"],
+                                 "education_level": lesson.get("education_level"), "subject": lesson.get("subject")})
+            amount = round(hours * rate, 2) if rate is not None else None
+            total_hours += hours
+            if amount is None:
+                unrated_hours += hours
+            else:
+                total_amount = round(total_amount + amount, 2)
+            day = lesson_day(lesson.get("date"))
+            rows.append([day.isoformat() if day else "", LESSON_TYPE_LABELS[lesson["lesson_type"]],
+                         Statements._students(lesson), lesson.get("education_level") or "", lesson.get("subject") or "",
+                         _number(hours), _money(rate), _money(amount)])
+
+        totals = [["مجموع الساعات", _number(total_hours)], ["المبلغ المستحق", _money(total_amount)]]
+        if unrated_hours:
+            totals.append(["ساعات بدون تسعيرة", _number(unrated_hours)])
+        return {
+            "title": "كشف حساب شهري للمعلم",
+            "subtitle": f"{teacher_name} - {month}",
+            "fields": [["المعلم", teacher_name], ["الشهر", month], ["عدد الدروس", len(lessons)]],
+            "columns": ["التاريخ", "النوع", "الطلاب", "المرحلة", "الموضوع", "الساعات", "السعر", "المبلغ"],
+            "rows": rows,
+            "totals": totals,
+        }
+
+    @staticmethod
+    def teacher_month(store, month: str, teacher_name: str) -> dict:
+        lessons = Statements._month_lessons(store, month, {"teacher_name": teacher_name})
+        return Statements._teacher_document(month, teacher_name, lessons, Payroll.month_rates(store, month))
+
+    @staticmethod
+    def teacher_months(store, month: str) -> Dict[str, dict]:
+        """ Statement of every teacher with approved lessons in the month, from one read of the month. """
+        by_teacher = defaultdict(list)
+        for lesson in Statements._month_lessons(store, month, {}):
+            by_teacher[lesson.get("teacher_name") or "Unknown Teacher"].append(lesson)
+        resolve_rate = Payroll.month_rates(store, month)
+        return {teacher_name: Statements._teacher_document(month, teacher_name, lessons, resolve_rate)
+                for teacher_name, lessons in sorted(by_teacher.items())}
+
+    @staticmethod
+    def student_month(store, month: str, student_id: ObjectId) -> Optional[dict]:
+        """ A student's lessons and payments in a month (None if the student does not exist). """
+        student = store["Students"].find_one({"_id": student_id}, {"name": 1})
+        if student is None:
+            return None
+
+        lessons = Statements._month_lessons(store, month, {"student_ids": student_id})
+        rows, total_hours = [], 0
+        for lesson in lessons:
+            hours = lesson.get("hours") or 0
+            total_hours += hours
+            day = lesson_day(lesson.get("date"))
+            rows.append([day.isoformat() if day else "", lesson.get("teacher_name") or "",
+                         LESSON_TYPE_LABELS[lesson["lesson_type"]], lesson.get("education_level") or "",
+                         lesson.get("subject") or "", _number(hours)])
+
+        start, end = month_bounds(month)
+        payments = store["StudentPayments"].find({"student_ids": student_id, "date": {
+            "$gte": start.strftime("%Y-%m-%d"), "$lt": end.strftime("%Y-%m-%d")}}, {"cost": 1, "date": 1}, sort="date")
+        totals = [["مجموع الساعات", _number(total_hours)]]
+        totals += [[f"دفعة {payment.get('date', '')}", _money(payment.get("cost"))] for payment in payments]
+        totals.append(["مجموع الدفعات", _money(sum(payment.get("cost") or 0 for payment in payments))])
+        return {
+            "title": "كشف ساعات الطالب الشهري",
+            "subtitle": f"{student['name']} - {month}",
+            "fields": [["الطالب", student["name"]], ["الشهر", month], ["عدد الدروس", len(lessons)]],
+            "columns": ["التاريخ", "المعلم", "النوع", "المرحلة", "الموضوع", "الساعات"],
+            "rows": rows,
+            "totals": totals,
+        }
+
+    @staticmethod
+    def payment_receipt(store, payment_id: ObjectId) -> Optional[dict]:
+        payment = store["StudentPayments"].find_one({"_id": payment_id})
+        if payment is None:
+            return None
+        return {
+            "title": "إيصال دفع",
+            "fields": [["رقم الإيصال", str(payment["_id"])], ["الطالب", payment.get("name", "")],
+                       ["التاريخ", payment.get("date", "")]],
+            "totals": [["المبلغ", _money(payment.get("cost"))]],
+        }
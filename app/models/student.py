@@ -0,0 +1,207 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from app.core.analytics import lesson_snapshots
+from app.core.search import search_indexes
+from app.models.lesson_archive import LESSON_ARCHIVES, LessonArchive
+from app.models.sync import Sync
+from app.utils.text import normalize_name
+
+# Collection -> field holding free-text student name(s); each document also gets `student_ids`
+STUDENT_NAME_FIELDS = {
+    "IndividualLessons": "student_name",
+    "GroupLessons": "student_names",
+    "StudentBookings": "students",
+    "StudentPayments": "name",
+}
+
+
+class Student:
+    """
+    Student directory.
+    A student document holds a display `name` and `keys`: the normalized name plus any aliases.
+    `keys` has a unique multikey index, so a normalized name resolves to exactly one student.
+    """
+
+    @staticmethod
+    def resolve_ids(names: Iterable[str], students_repository, create: bool = True) -> List[Optional[ObjectId]]:
+        """
+        Map names to student ids in one batched lookup (same order; None for blank names).
+        Unknown names become new students when `create` is set.
+        """
+        names = list(names)
+        keys = [normalize_name(name) for name in names]
+        wanted = {key for key in keys if key}
+
+        found: Dict[str, ObjectId] = {}
+        if wanted:
+            for student in students_repository.find({"keys": {"$in": list(wanted)}}, {"keys": 1}):
+                for key in student["keys"]:
+                    found[key] = student["_id"]
+
+        if create:
+            for name, key in zip(names, keys):
+                if key and key not in found:
+                    found[key] = Student._create(name, key, students_repository)
+
+        return [found.get(key) if key else None for key in keys]
+
+    @staticmethod
+    def _create(name: str, key: str, students_repository) -> ObjectId:
+        try:
+            student = {"name": " ".join(name.split()), "keys": [key], "created_at": datetime.utcnow()}
+            result = students_repository.update_one({"keys": key}, {"$setOnInsert": student}, upsert=True)
+            if result.upserted_id is not None:
+                student["_id"] = result.upserted_id
+                search_indexes.apply(students_repository.store, lambda index: index.upsert_student(student))
+                return result.upserted_id
+        except DuplicateKeyError:
+            pass  # Created concurrently by another request
+        return students_repository.find_one({"keys": key}, {"_id": 1})["_id"]
+
+    @staticmethod
+    def ids_for(doc_names, students_repository) -> List[ObjectId]:
+        """ `student_ids` value for a lesson/booking/payment given its name field (str or list). """
+        names = doc_names if isinstance(doc_names, list) else [doc_names]
+        return [sid for sid in Student.resolve_ids(names, students_repository) if sid is not None]
+
+    @staticmethod
+    def add_alias(student_id: ObjectId, alias: str, students_repository) -> dict:
+        """ Attach an alias; fails if it already resolves to another student (merge instead). """
+        key = normalize_name(alias)
+        if not key:
+            return {"error": "Alias is empty"}
+        owner = students_repository.find_one({"keys": key}, {"_id": 1})
+        if owner and owner["_id"] != student_id:
+            return {"error": "Alias belongs to another student", "studentId": str(owner["_id"])}
+        try:
+            student = students_repository.find_one_and_update(
+                {"_id": student_id}, {"$addToSet": {"keys": key}}, return_new=True)
+        except DuplicateKeyError:
+            # Taken concurrently (unique `keys`)
+            owner = students_repository.find_one({"keys": key}, {"_id": 1})
+            return {"error": "Alias belongs to another student", "studentId": str(owner["_id"]) if owner else None}
+        if not student:
+            return {"error": "Student not found"}
+        search_indexes.apply(students_repository.store, lambda index: index.upsert_student(student))
+        return {"message": "Alias added", "studentId": str(student_id), "alias": key}
+
+    @staticmethod
+    def merge(source_id: ObjectId, target_id: ObjectId, store) -> dict:
+        """
+        Fold a duplicate student into another: keys move over and references are rewritten.
+        `keys` is unique, so the source is deleted before its keys reach the target; a student a
+        concurrent submit recreates for one of those keys meanwhile is folded in as well.
+        """
+        students = store["Students"]
+        if not students.find_one({"_id": target_id}, {"_id": 1}):
+            return {"error": "Student not found"}
+        source = students.find_one_and_delete({"_id": source_id})
+        if not source:
+            return {"error": "Student not found"}
+
+        folded, keys = [source], list(source["keys"])
+        while True:
+            try:
+                target = students.find_one_and_update(
+                    {"_id": target_id}, {"$addToSet": {"keys": {"$each": keys}}}, return_new=True)
+                break
+            except DuplicateKeyError:
+                for student in students.find({"keys": {"$in": keys}, "_id": {"$ne": target_id}}, {"_id": 1}):
+                    recreated = students.find_one_and_delete({"_id": student["_id"]})
+                    if recreated:
+                        folded.append(recreated)
+                        keys += [key for key in recreated["keys"] if key not in keys]
+        if not target:
+            Student._restore(folded, students)  # Target deleted meanwhile
+            return {"error": "Student not found"}
+
+        folded_ids = [student["_id"] for student in folded]
+
+        def reindex(index):
+            for student_id in folded_ids:
+                index.remove("student", str(student_id))
+            index.upsert_student(target)
+        search_indexes.apply(store, reindex)
+        for student_id in folded_ids:
+            lesson_snapshots.apply(store, lambda snapshot, folded=student_id: snapshot.merge_student(folded, target_id))
+
+        for collection in [*STUDENT_NAME_FIELDS, *LESSON_ARCHIVES.values()]:
+            # Add first, then remove: every matched reference moves, and lessons listing both keep one target.
+            # Stamped, so sync clients pick the rewritten lessons up.
+            references = store[collection]
+            matched = {"student_ids": {"$in": folded_ids}}
+            references.update_many(matched, Sync.touch({"$addToSet": {"student_ids": target_id}}))
+            references.update_many(matched, Sync.touch({"$pull": {"student_ids": {"$in": folded_ids}}}))
+        return {"message": "Students merged", "studentId": str(target_id)}
+
+    @staticmethod
+    def _restore(students: List[dict], students_repository) -> None:
+        """ Put back students a merge took out, minus any key a submit has recreated since. """
+        for student in students:
+            taken = {key for owner in students_repository.find({"keys": {"$in": student["keys"]}}, {"keys": 1})
+                     for key in owner["keys"]}
+            keys = [key for key in student["keys"] if key not in taken]
+            students_repository.insert_one({**student, "keys": keys})
+
+    @staticmethod
+    def backfill(store, batch_size: int = 500) -> Dict[str, int]:
+        """
+        Resolve `student_ids` for documents written before the directory existed.
+        Works in `_id` order: one name-resolution lookup per batch, and one write per distinct
+        `student_ids` value in it. `store` is a repository store (app.repositories).
+        """
+        updated = {}
+        for collection, field in STUDENT_NAME_FIELDS.items():
+            documents = store[collection]
+            updated[collection] = 0
+            last_id = None
+            while True:
+                query = {"student_ids": {"$exists": False}}
+                if last_id is not None:
+                    query["_id"] = {"$gt": last_id}
+                batch = documents.find(query, {field: 1}, sort="_id", limit=batch_size)
+                if not batch:
+                    break
+                last_id = batch[-1]["_id"]
+
+                names_per_doc = [doc.get(field) or [] for doc in batch]
+                names_per_doc = [names if isinstance(names, list) else [names] for names in names_per_doc]
+                flat = [name for names in names_per_doc for name in names]
+                ids = iter(Student.resolve_ids(flat, store["Students"]))
+
+                by_student_ids: Dict[tuple, List[ObjectId]] = {}
+                for doc, names in zip(batch, names_per_doc):
+                    student_ids = tuple(sid for sid in (next(ids) for _ in names) if sid is not None)
+                    by_student_ids.setdefault(student_ids, []).append(doc["_id"])
+                for student_ids, doc_ids in by_student_ids.items():
+                    updated[collection] += documents.update_many(
+                        {"_id": {"$in": doc_ids}, "student_ids": {"$exists": False}},
+                        {"$set": {"student_ids": list(student_ids)}}).modified
+        return updated
+
+    @staticmethod
+    def history(student_id: ObjectId, store) -> List[dict]:
+        """ Every individual and group lesson of a student, newest first (one indexed find per collection). """
+        projection = {"date": 1, "teacher_name": 1, "hours": 1, "subject": 1, "education_level": 1, "approved": 1}
+        lessons = []
+        for collection, lesson_type in (("IndividualLessons", "individual"), ("GroupLessons", "group")):
+            for lesson in LessonArchive.find(store[collection], {"student_ids": student_id}, projection):
+                lesson["lesson_type"] = lesson_type
+                lessons.append(lesson)
+
+        def sort_key(lesson):
+            date = lesson.get("date")
+            return date.isoformat() if isinstance(date, datetime) else str(date or "")
+
+        return sorted(lessons, key=sort_key, reverse=True)
+
+    @staticmethod
+    def names_by_id(student_ids: Iterable[ObjectId], students_repository) -> Dict[ObjectId, str]:
+        ids = list(set(student_ids))
+        if not ids:
+            return {}
+        return {s["_id"]: s["name"] for s in students_repository.find({"_id": {"$in": ids}}, {"name": 1})}
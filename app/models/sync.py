@@ -0,0 +1,153 @@
+import base64
+import binascii
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from bson import ObjectId
+
+from app.core.config import config
+from app.models.lesson_archive import LESSON_ARCHIVES, LessonArchive
+
+TOMBSTONES = "Tombstones"
+SYNC_COLLECTIONS = {"IndividualLessons": "individual", "GroupLessons": "group"}
+SYNC_PROJECTION = {"student_ids": 0}
+
+Cursor = Tuple[datetime, Optional[ObjectId]]
+
+
+class Sync:
+    """
+    Incremental sync of a teacher's lessons for offline clients.
+    Lesson writes stamp `updated_at`; deletes leave a tombstone (collection, doc_id, teacher_name,
+    updated_at) in Tombstones, kept for SYNC_TOMBSTONE_DAYS. A sync token is an opaque cursor
+    (updated_at, _id) into the merged stream of changed lessons and tombstones, or, while a full sync
+    is paging, (time the full sync started, last `_id`).
+    When a client has caught up, its next token points SYNC_SAFETY_SECONDS back, so writes that
+    commit late (or come from a server with a slightly late clock) are still sent; clients
+    apply changes as upserts, so the overlap is harmless.
+    `store` is a repository store (app.repositories).
+    """
+
+    @staticmethod
+    def now() -> datetime:
+        """ Stamp time, truncated to the millisecond BSON dates keep (so cursors compare exactly). """
+        now = datetime.utcnow()
+        return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+    @staticmethod
+    def touch(update: dict) -> dict:
+        """ Add `updated_at` to an update document. """
+        return {**update, "$set": {**update.get("$set", {}), "updated_at": Sync.now()}}
+
+    @staticmethod
+    def tombstone(store, collection: str, doc_id, teacher_name: Optional[str]) -> None:
+        now = Sync.now()
+        store[TOMBSTONES].insert_one({"collection": collection, "doc_id": doc_id, "teacher_name": teacher_name,
+                                      "updated_at": now,
+                                      "expires_at": now + timedelta(days=config.SYNC_TOMBSTONE_DAYS)})
+
+    # ---------- Tokens ----------
+
+    @staticmethod
+    def encode_token(cursor: Cursor, full: bool = False) -> str:
+        updated_at, last_id = cursor
+        milliseconds = int((updated_at - datetime(1970, 1, 1)).total_seconds() * 1000)
+        raw = f"{milliseconds}.{last_id or ''}{'.full' if full else ''}".encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    @staticmethod
+    def decode_token(token: str) -> Tuple[Cursor, bool]:
+        """ (cursor, whether a full sync is paging). Raises ValueError for a malformed token. """
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+            milliseconds, last_id, *full = raw.split(".")
+            if full not in ([], ["full"]):
+                raise ValueError(raw)
+            cursor = datetime(1970, 1, 1) + timedelta(milliseconds=int(milliseconds)), \
+                (ObjectId(last_id) if last_id else None)
+            return cursor, bool(full)
+        except (binascii.Error, UnicodeDecodeError, ValueError, TypeError) as e:
+            raise ValueError("Invalid sync token") from e
+
+    # ---------- Changes ----------
+
+    @staticmethod
+    def _after(cursor: Cursor) -> dict:
+        updated_at, last_id = cursor
+        if last_id is None:
+            return {"updated_at": {"$gte": updated_at}}
+        return {"$or": [{"updated_at": {"$gt": updated_at}}, {"updated_at": updated_at, "_id": {"$gt": last_id}}]}
+
+    @staticmethod
+    def _lesson_out(lesson: dict, lesson_type: str) -> dict:
+        return {**lesson, "_id": str(lesson["_id"]), "lesson_type": lesson_type}
+
+    @staticmethod
+    def full(store, teacher_name: str, limit: int, cursor: Optional[Cursor] = None) -> dict:
+        """
+        Every lesson of the teacher (archived ones included), `limit` per page: the first sync, or after
+        a token expired. Only the first page has `full: true` (the client drops its local copy).
+        Pages go by `_id`, as lessons written before sync carry no `updated_at`; the token keeps the
+        time the full sync started, and after the last page syncing continues incrementally from there.
+        """
+        started, last_id = cursor or (Sync.now(), None)
+        query = {"teacher_name": teacher_name}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        archived = LessonArchive.archived_before(store) is not None
+
+        lessons = {}
+        for collection, lesson_type in SYNC_COLLECTIONS.items():
+            sources = [store[collection], *([store[LESSON_ARCHIVES[collection]]] if archived else [])]
+            for source in sources:  # hot first: a lesson caught mid-archiving is sent as stored hot
+                for lesson in source.find(query, SYNC_PROJECTION, sort="_id", limit=limit + 1):
+                    lessons.setdefault(lesson["_id"], Sync._lesson_out(lesson, lesson_type))
+
+        ids = sorted(lessons)
+        has_more = len(ids) > limit
+        page = ids[:limit]
+        if has_more:
+            token = Sync.encode_token((started, page[-1]), full=True)
+        else:
+            token = Sync.encode_token((started - timedelta(seconds=config.SYNC_SAFETY_SECONDS), None))
+        return {"full": last_id is None, "lessons": [lessons[lesson_id] for lesson_id in page], "deleted": [],
+                "token": token, "has_more": has_more}
+
+    @staticmethod
+    def changes(store, teacher_name: str, token: Optional[str], limit: int) -> dict:
+        """ Lessons changed and deleted after the token, oldest first, at most `limit` per call. """
+        if not token:
+            return Sync.full(store, teacher_name, limit)
+        cursor, full = Sync.decode_token(token)
+        started = Sync.now()
+        if cursor[0] < started - timedelta(days=config.SYNC_TOMBSTONE_DAYS):
+            return Sync.full(store, teacher_name, limit)  # deletes older than the tombstones could be missed
+        if full:
+            return Sync.full(store, teacher_name, limit, cursor)
+
+        query = {"teacher_name": teacher_name, **Sync._after(cursor)}
+        order = [("updated_at", 1), ("_id", 1)]
+        merged = []
+        for collection, lesson_type in SYNC_COLLECTIONS.items():
+            for lesson in store[collection].find(query, SYNC_PROJECTION, sort=order, limit=limit + 1):
+                merged.append((lesson["updated_at"], lesson["_id"], Sync._lesson_out(lesson, lesson_type), None))
+        for tombstone in store[TOMBSTONES].find({**query, "collection": {"$in": list(SYNC_COLLECTIONS)}},
+                                                sort=order, limit=limit + 1):
+            deleted = {"_id": str(tombstone["doc_id"]), "lesson_type": SYNC_COLLECTIONS[tombstone["collection"]],
+                       "deleted_at": tombstone["updated_at"]}
+            merged.append((tombstone["updated_at"], tombstone["_id"], None, deleted))
+        merged.sort(key=lambda change: (change[0], change[1]))
+
+        has_more = len(merged) > limit
+        page = merged[:limit]
+        if has_more:
+            next_cursor = (page[-1][0], page[-1][1])
+        else:
+            next_cursor = (started - timedelta(seconds=config.SYNC_SAFETY_SECONDS), None)
+        return {
+            "full": False,
+            "lessons": [lesson for _, _, lesson, _ in page if lesson is not None],
+            "deleted": [deleted for _, _, _, deleted in page if deleted is not None],
+            "token": Sync.encode_token(next_cursor),
+            "has_more": has_more,
+        }
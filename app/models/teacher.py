@@ -22,6 +22,7 @@ class Teacher(User):
         """ Submits a new lesson with pending approval (Supports Individual & Group Lessons) """
         lesson_data["approved"] = False
         lesson_data["teacher_name"] = self.username
+        lesson_data["version"] = 1
 
         if "student_names" in lesson_data:
             lesson_data["lesson_type"] = "group"
@@ -35,16 +36,17 @@ class Teacher(User):
         """ Allows a teacher to edit their own lesson before approval """
         try:
             lesson_object_id = ObjectId(lesson_id)
-            lesson = lessons_collection.find_one(
-                {"_id": lesson_object_id, "teacher_name": self.username, "approved": False})
+            lesson_updates = {k: v for k, v in lesson_updates.items()
+                              if k not in ("_id", "approved", "teacher_name", "version")}
 
-            if not lesson:
-                return {"error": "Lesson not found or unauthorized to edit"}
+            # Single conditional write: cannot land on a lesson approved in the meantime
+            result = lessons_collection.update_one(
+                {"_id": lesson_object_id, "teacher_name": self.username, "approved": False},
+                {"$set": lesson_updates, "$inc": {"version": 1}})
 
-            if "approved" in lesson_updates:
-                del lesson_updates["approved"]
+            if result.matched_count == 0:
+                return {"error": "Lesson not found or unauthorized to edit"}
 
-            lessons_collection.update_one({"_id": lesson_object_id}, {"$set": lesson_updates})
             return {"message": "Lesson updated successfully", "lessonId": lesson_id}
         except Exception as e:
             return {"error": f"Error updating lesson: {str(e)}"}
@@ -0,0 +1,146 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from bson import ObjectId
+
+from app.core.analytics import LessonColumns
+from app.models.payroll import Payroll
+from app.utils.date_utils import add_months, month_bounds, parse_month
+
+TREND_DIMENSIONS = ("teacher", "student", "level", "subject")
+TREND_METRICS = ("hours", "lessons", "revenue")
+MAX_TREND_MONTHS = 120
+# Snapshot dimension of each payroll rate dimension
+_RATE_COLUMNS = {"teacher_name": "teacher", "lesson_type": "lesson_type", "education_level": "level",
+                 "subject": "subject"}
+
+Buckets = Dict[Any, Tuple[Any, float]]  # dimension value -> (label, total)
+
+
+class Trends:
+    """
+    Monthly series of hours, lessons or revenue per teacher, student, level or subject.
+    All months of a request come from one group-by over the lesson snapshot (app.core.analytics).
+    Months whose payroll is closed no longer change, so their buckets are kept in TrendRollups
+    and never recomputed.
+    Revenue is lesson hours at the pay rates (PayRates; a closed month uses the rates on its payslips).
+    Like the stats endpoints, a group lesson counts in full for each of its students.
+    `store` is a repository store (app.repositories).
+    """
+
+    @staticmethod
+    def month_range(first: str, last: str) -> List[str]:
+        """ YYYY-MM months from `first` to `last` inclusive (stops after MAX_TREND_MONTHS + 1). """
+        start, end = parse_month(first), parse_month(last)
+        months = []
+        while start <= end and len(months) <= MAX_TREND_MONTHS:
+            months.append(start.strftime("%Y-%m"))
+            start = add_months(start, 1)
+        return months
+
+    @staticmethod
+    def _closed_months(store, months: List[str]) -> Set[str]:
+        states = store["PayrollState"].find({"_id": {"$in": months}, "closed": True}, {"_id": 1})
+        return {state["_id"] for state in states}
+
+    @staticmethod
+    def _compute(store, snapshot: LessonColumns, months: List[str], dimension: str, metric: str,
+                 closed: Set[str]) -> Tuple[Dict[str, Buckets], Dict[str, float]]:
+        """ Buckets of every month in one pass, plus unrated hours per month (revenue only). """
+        buckets = {month: {} for month in months}
+        unrated = {month: 0.0 for month in months}
+        start, end = month_bounds(min(months))[0], month_bounds(max(months))[1]
+
+        if metric != "revenue":
+            totals = snapshot.group_sum(("month", dimension), metric, start, end)
+            for (month, value), total in totals.items():
+                if month in buckets:
+                    buckets[month][value] = (snapshot.label(dimension, value) if dimension == "student" else value,
+                                             total)
+            return buckets, unrated
+
+        rate_columns = [column for column in _RATE_COLUMNS.values() if column != dimension]
+        rates = Payroll.get_rates(store)
+        resolvers = {month: Payroll.month_rates(store, month, month in closed, rates) for month in months}
+        totals = snapshot.group_sum(("month", dimension, *rate_columns), "hours", start, end)
+        for (month, value, *rest), hours in totals.items():
+            if month not in buckets:
+                continue
+            columns = {dimension: value, **dict(zip(rate_columns, rest))}
+            rate = resolvers[month]({dim: columns[column] for dim, column in _RATE_COLUMNS.items()})
+            if rate is None:
+                unrated[month] += hours
+                rate = 0
+            label, amount = buckets[month].get(value, (None, 0))
+            if label is None:
+                label = snapshot.label(dimension, value) if dimension == "student" else value
+            buckets[month][value] = (label, amount + hours * rate)
+        return buckets, unrated
+
+    @staticmethod
+    def monthly(store, snapshot: LessonColumns, months: List[str], dimension: str,
+                metric: str) -> Tuple[Dict[str, Buckets], Dict[str, float]]:
+        """ Buckets per month: closed months from TrendRollups (stored on first use), the rest from the snapshot. """
+        rollups = store["TrendRollups"]
+        closed = Trends._closed_months(store, months)
+        buckets, unrated = {}, {}
+        for rollup in rollups.find({"_id": {"$in": [f"{month}:{dimension}:{metric}" for month in closed]}}):
+            buckets[rollup["month"]] = {b["key"]: (b["label"], b["value"]) for b in rollup["buckets"]}
+            unrated[rollup["month"]] = rollup.get("unrated_hours", 0)
+
+        missing = [month for month in months if month not in buckets]
+        if missing:
+            computed, computed_unrated = Trends._compute(store, snapshot, missing, dimension, metric, closed)
+            buckets.update(computed)
+            unrated.update(computed_unrated)
+            for month in closed.intersection(missing):
+                rollups.update_one({"_id": f"{month}:{dimension}:{metric}"}, {"$set": {
+                    "month": month, "dimension": dimension, "metric": metric,
+                    "buckets": [{"key": key, "label": label, "value": value}
+                                for key, (label, value) in computed[month].items()],
+                    "unrated_hours": computed_unrated[month],
+                    "computed_at": datetime.utcnow(),
+                }}, upsert=True)
+        return buckets, unrated
+
+    @staticmethod
+    def series(store, snapshot: LessonColumns, months: List[str], dimension: str, metric: str,
+               year_over_year: bool = True) -> dict:
+        """ Per-month totals and one series per dimension value, with the same months a year earlier. """
+        previous_months = [add_months(parse_month(month), -12).strftime("%Y-%m") for month in months]
+        buckets, unrated = Trends.monthly(store, snapshot, months + previous_months if year_over_year else months,
+                                          dimension, metric)
+
+        def rounded(value):
+            return round(value, 2 if metric == "revenue" else 4) if metric != "lessons" else value
+
+        def compare(value, previous):
+            if not year_over_year:
+                return {"value": rounded(value)}
+            return {"value": rounded(value), "previous": rounded(previous), "delta": rounded(value - previous),
+                    "change_pct": round(100 * (value - previous) / previous, 1) if previous else None}
+
+        totals = []
+        for month, previous_month in zip(months, previous_months):
+            total = {"month": month, **compare(sum(v for _, v in buckets[month].values()),
+                                               sum(v for _, v in buckets.get(previous_month, {}).values()))}
+            if metric == "revenue":
+                total["unrated_hours"] = rounded(unrated[month])
+            totals.append(total)
+
+        keys = {key: label for month in months for key, (label, _) in buckets[month].items()}
+        series = []
+        for key, label in keys.items():
+            values = [buckets[month].get(key, (None, 0))[1] for month in months]
+            previous = [buckets.get(month, {}).get(key, (None, 0))[1] for month in previous_months]
+            entry = {dimension: label}
+            if dimension == "student":
+                entry["student_id"] = str(key) if isinstance(key, ObjectId) else None
+            entry["months"] = [{"month": month, **compare(value, before)}
+                               for month, value, before in zip(months, values, previous)]
+            entry.update(compare(sum(values), sum(previous)))
+            series.append(entry)
+        series.sort(key=lambda entry: entry["value"], reverse=True)
+
+        return {"from": months[0], "to": months[-1], "dimension": dimension, "metric": metric,
+                "months": months, "totals": totals, "series": series}
@@ -0,0 +1,38 @@
+"""
+Storage access for route handlers: `Repository` (one collection) and `Store` (one branch database).
+REPOSITORY_BACKEND selects MongoDB (default) or in-process dictionaries for local tests and benchmarks.
+"""
+from typing import Dict
+
+from app.core.config import config
+from app.repositories.base import Repository, Store, WriteResult
+from app.repositories.memory import InMemoryRepository, InMemoryStore
+from app.repositories.mongo import MongoRepository, MongoStore
+
+_memory_stores: Dict[str, InMemoryStore] = {}
+
+
+def uses_mongo() -> bool:
+    return config.REPOSITORY_BACKEND != "memory"
+
+
+def get_branch_store(branch: str, reporting: bool = False) -> Store:
+    """
+    Store of a branch. `reporting=True` reads from secondaries with bounded staleness
+    (the in-memory backend has a single copy, so it ignores it).
+    """
+    database_name = config.BRANCH_DATABASES[branch]
+    if not uses_mongo():
+        store = _memory_stores.get(database_name)
+        if store is None:
+            store = _memory_stores.setdefault(database_name, InMemoryStore(database_name))
+        return store
+
+    from app.core.database import mongo_db
+    database = mongo_db.get_branch_db(branch)
+    return MongoStore(mongo_db.reporting(database) if reporting else database)
+
+
+def reset_memory_stores() -> None:
+    """ Drop all in-memory data (between test cases). """
+    _memory_stores.clear()
@@ -0,0 +1,114 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+Filter = dict
+Projection = Optional[dict]
+Sort = Union[None, str, Sequence[Tuple[str, int]]]
+
+
+class WriteResult(NamedTuple):
+    matched: int
+    modified: int
+    upserted_id: Any = None
+
+
+class UniqueKey(NamedTuple):
+    """ A unique index: `fields` (at most one array field), optionally only over documents matching `partial`. """
+    fields: Tuple[str, ...]
+    partial: Optional[Filter] = None
+
+
+# Unique indexes the write paths rely on (DuplicateKeyError closes their races). Database.ensure_indexes
+# creates them on MongoDB; InMemoryStore enforces them itself.
+UNIQUE_KEYS: Dict[str, Tuple[UniqueKey, ...]] = {
+    "IndividualLessons": (UniqueKey(("content_hash",), {"content_hash": {"$exists": True}}),),
+    "GroupLessons": (UniqueKey(("content_hash",), {"content_hash": {"$exists": True}}),),
+    "Students": (UniqueKey(("keys",)),),
+    "PayRates": (UniqueKey(("teacher_name", "lesson_type", "education_level", "subject")),),
+    "Payslips": (UniqueKey(("month", "teacher_name")),),
+    "PayrollDrafts": (UniqueKey(("month", "teacher_name")),),
+}
+
+
+class Repository(ABC):
+    """
+    CRUD over one collection, the only storage API route handlers use.
+    Method names follow pymongo, but results are plain values: `find` returns a list
+    (sorting/limiting are arguments, not cursor calls), `insert_one` the new `_id`,
+    deletes the deleted count, updates a WriteResult.
+    Filters and update documents use MongoDB syntax; InMemoryRepository documents the subset
+    every implementation must support.
+    """
+
+    name: str
+    store: "Store"
+
+    @abstractmethod
+    def find(self, filter: Filter = None, projection: Projection = None, sort: Sort = None,
+             limit: int = 0, skip: int = 0) -> List[dict]:
+        ...
+
+    @abstractmethod
+    def find_raw(self, filter: Filter = None, projection: Projection = None, sort: Sort = None,
+                 limit: int = 0, skip: int = 0) -> Iterator:
+        """
+        `find` for bulk reads (see app.utils.raw_bson): yields RawBSONDocument lazily, one pass only.
+        """
+
+    @abstractmethod
+    def find_one(self, filter: Filter = None, projection: Projection = None) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def count(self, filter: Filter = None) -> int:
+        ...
+
+    @abstractmethod
+    def insert_one(self, document: dict):
+        """
+        Insert and return the new `_id` (also set on `document`, like pymongo).
+        Raises DuplicateKeyError on `_id` and UNIQUE_KEYS, as updates and upserts do.
+        """
+
+    @abstractmethod
+    def insert_many(self, documents: Iterable[dict], ordered: bool = True) -> list:
+        ...
+
+    @abstractmethod
+    def update_one(self, filter: Filter, update: dict, upsert: bool = False) -> WriteResult:
+        ...
+
+    @abstractmethod
+    def update_many(self, filter: Filter, update: dict) -> WriteResult:
+        ...
+
+    @abstractmethod
+    def find_one_and_update(self, filter: Filter, update: dict, projection: Projection = None,
+                            return_new: bool = False, upsert: bool = False) -> Optional[dict]:
+        """ Atomically update one document; returns it as it was before (or after, with `return_new`). """
+
+    @abstractmethod
+    def find_one_and_delete(self, filter: Filter, projection: Projection = None) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def delete_one(self, filter: Filter) -> int:
+        ...
+
+    @abstractmethod
+    def delete_many(self, filter: Filter) -> int:
+        ...
+
+    def aggregate(self, pipeline: list) -> List[dict]:
+        """ Aggregation pipelines run on MongoDB only. """
+        raise NotImplementedError(f"Aggregation on {self.name} needs the MongoDB backend")
+
+
+class Store(ABC):
+    """ The repositories of one branch database: `store["IndividualLessons"]`. """
+
+    name: str
+
+    @abstractmethod
+    def __getitem__(self, collection: str) -> Repository:
+        ...
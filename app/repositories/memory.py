@@ -0,0 +1,408 @@
+import copy
+import re
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence
+
+import bson
+from bson import ObjectId
+from bson.raw_bson import RawBSONDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from app.repositories.base import UNIQUE_KEYS, Filter, Projection, Repository, Sort, Store, UniqueKey, WriteResult
+
+# Filter subset: equality (arrays match any element, None matches missing), $eq $ne $gt $gte
+# $lt $lte $in $nin $exists $regex/$options, $or $and $nor, dotted paths.
+# Update subset: $set $unset $inc $setOnInsert $addToSet (with $each) $push $pull $pullAll,
+# and "field.$" in $set for the array element matched by the filter.
+
+_MISSING = object()
+_TYPE_ORDER = {type(None): 0, int: 1, float: 1, bool: 1, str: 2, dict: 3, list: 4, ObjectId: 5, datetime: 6}
+
+
+def _get(document: Any, path: str) -> Any:
+    value = document
+    for part in path.split("."):
+        if isinstance(value, dict):
+            value = value.get(part, _MISSING)
+        elif isinstance(value, list) and part.isdigit():
+            value = value[int(part)] if int(part) < len(value) else _MISSING
+        else:
+            return _MISSING
+        if value is _MISSING:
+            return _MISSING
+    return value
+
+
+def _comparable(a: Any, b: Any) -> bool:
+    """ Mongo only orders values of the same type bracket (a date never matches a string range). """
+    return _TYPE_ORDER.get(type(a), 9) == _TYPE_ORDER.get(type(b), 9)
+
+
+def _compare(value: Any, operator: str, operand: Any) -> bool:
+    candidates = value if isinstance(value, list) else [value]
+    for candidate in candidates:
+        if candidate is _MISSING or not _comparable(candidate, operand):
+            continue
+        if ((operator == "$gt" and candidate > operand) or (operator == "$gte" and candidate >= operand)
+                or (operator == "$lt" and candidate < operand) or (operator == "$lte" and candidate <= operand)):
+            return True
+    return False
+
+
+def _equals(value: Any, operand: Any) -> bool:
+    if value is _MISSING:
+        return operand is None
+    if value == operand:
+        return True
+    return isinstance(value, list) and not isinstance(operand, list) and operand in value
+
+
+def _match_condition(value: Any, condition: Any) -> bool:
+    if not (isinstance(condition, dict) and condition and all(key.startswith("$") for key in condition)):
+        return _equals(value, condition)
+
+    for operator, operand in condition.items():
+        if operator == "$eq":
+            matched = _equals(value, operand)
+        elif operator == "$ne":
+            matched = not _equals(value, operand)
+        elif operator in ("$gt", "$gte", "$lt", "$lte"):
+            matched = _compare(value, operator, operand)
+        elif operator == "$in":
+            matched = any(_equals(value, item) for item in operand)
+        elif operator == "$nin":
+            matched = not any(_equals(value, item) for item in operand)
+        elif operator == "$exists":
+            matched = (value is not _MISSING) == bool(operand)
+        elif operator == "$regex":
+            flags = re.IGNORECASE if "i" in condition.get("$options", "") else 0
+            pattern = re.compile(operand, flags) if isinstance(operand, str) else operand
+            candidates = value if isinstance(value, list) else [value]
+            matched = any(isinstance(c, str) and pattern.search(c) for c in candidates)
+        elif operator == "$options":
+            continue
+        else:
+            raise NotImplementedError(f"In-memory repositories do not support {operator}")
+        if not matched:
+            return False
+    return True
+
+
+def matches(document: dict, filter: Filter) -> bool:
+    for key, condition in (filter or {}).items():
+        if key == "$or":
+            if not any(matches(document, sub) for sub in condition):
+                return False
+        elif key == "$and":
+            if not all(matches(document, sub) for sub in condition):
+                return False
+        elif key == "$nor":
+            if any(matches(document, sub) for sub in condition):
+                return False
+        elif key.startswith("$"):
+            raise NotImplementedError(f"In-memory repositories do not support {key}")
+        elif not _match_condition(_get(document, key), condition):
+            return False
+    return True
+
+
+def _project(document: dict, projection: Projection) -> dict:
+    document = copy.deepcopy(document)
+    if not projection:
+        return document
+    include_id = projection.get("_id", 1)
+    fields = {key: value for key, value in projection.items() if key != "_id"}
+    if fields and all(fields.values()):
+        projected = {key: document[key] for key in fields if key in document}
+        if include_id and "_id" in document:
+            projected["_id"] = document["_id"]
+        return projected
+    for key in fields:
+        document.pop(key, None)
+    if not include_id:
+        document.pop("_id", None)
+    return document
+
+
+def _sort_key(value: Any):
+    if value is _MISSING:
+        value = None
+    return _TYPE_ORDER.get(type(value), 9), value if value is not None else 0
+
+
+def _set_path(document: dict, path: str, value: Any) -> None:
+    parts = path.split(".")
+    target = document
+    for part in parts[:-1]:
+        if isinstance(target, list):
+            target = target[int(part)]
+        else:
+            target = target.setdefault(part, {})
+    if isinstance(target, list):
+        target[int(parts[-1])] = value
+    else:
+        target[parts[-1]] = value
+
+
+def _unset_path(document: dict, path: str) -> None:
+    parts = path.split(".")
+    target = _get(document, ".".join(parts[:-1])) if len(parts) > 1 else document
+    if isinstance(target, dict):
+        target.pop(parts[-1], None)
+
+
+def _resolve_positional(path: str, document: dict, filter: Filter) -> str:
+    """ "student_ids.$" -> "student_ids.<index of the element the filter matched>". """
+    if ".$" not in path:
+        return path
+    array_field = path.split(".$")[0]
+    array = _get(document, array_field)
+    condition = filter.get(array_field)
+    for index, element in enumerate(array if isinstance(array, list) else []):
+        if _match_condition(element, condition):
+            return path.replace(".$", f".{index}", 1)
+    raise ValueError(f"The positional operator did not find the match needed from the query ({path})")
+
+
+def apply_update(document: dict, update: dict, filter: Filter, inserting: bool = False) -> None:
+    if not update or not all(key.startswith("$") for key in update):
+        raise NotImplementedError("In-memory repositories only support operator updates")
+    for operator, fields in update.items():
+        for path, value in fields.items():
+            path = _resolve_positional(path, document, filter)
+            current = _get(document, path)
+            if operator == "$set":
+                _set_path(document, path, copy.deepcopy(value))
+            elif operator == "$setOnInsert":
+                if inserting:
+                    _set_path(document, path, copy.deepcopy(value))
+            elif operator == "$unset":
+                _unset_path(document, path)
+            elif operator == "$inc":
+                _set_path(document, path, (0 if current is _MISSING else current) + value)
+            elif operator in ("$addToSet", "$push"):
+                items = value["$each"] if isinstance(value, dict) and "$each" in value else [value]
+                array = [] if current is _MISSING else current
+                for item in items:
+                    if operator == "$push" or item not in array:
+                        array.append(copy.deepcopy(item))
+                _set_path(document, path, array)
+            elif operator in ("$pull", "$pullAll"):
+                if isinstance(current, list):
+                    if operator == "$pullAll":
+                        kept = [item for item in current if item not in value]
+                    else:
+                        kept = [item for item in current if not _match_condition(item, value)]
+                    _set_path(document, path, kept)
+            else:
+                raise NotImplementedError(f"In-memory repositories do not support {operator}")
+
+
+def _seed_from_filter(filter: Filter) -> dict:
+    """ Equality fields of an upsert filter become fields of the inserted document. """
+    return {key: copy.deepcopy(value) for key, value in (filter or {}).items()
+            if not key.startswith("$") and not (isinstance(value, dict) and any(k.startswith("$") for k in value))}
+
+
+def _hashable(value: Any) -> Any:
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(item) for item in value)
+    if isinstance(value, dict):
+        return tuple((key, _hashable(item)) for key, item in value.items())
+    return value
+
+
+class _UniqueIndex:
+    """ One UniqueKey over a collection: index entry -> `_id` of the document holding it. """
+
+    def __init__(self, key: UniqueKey):
+        self.key = key
+        self.owners: Dict[Any, Any] = {}
+
+    def entries(self, document: dict) -> set:
+        """ Like MongoDB: a missing field indexes as null, an array field once per element. """
+        if self.key.partial is not None and not matches(document, self.key.partial):
+            return set()
+        entries = [()]
+        for field in self.key.fields:
+            value = _get(document, field)
+            values = (value or [None]) if isinstance(value, list) else [None if value is _MISSING else value]
+            entries = [entry + (_hashable(item),) for entry in entries for item in values]
+        return set(entries)
+
+    def check(self, document: dict) -> None:
+        for entry in self.entries(document):
+            owner = self.owners.get(entry, _MISSING)
+            if owner is not _MISSING and owner != document["_id"]:
+                raise DuplicateKeyError(
+                    f"E11000 duplicate key error index: {'_'.join(self.key.fields)} dup key: {entry}", 11000,
+                    {"keyPattern": {field: 1 for field in self.key.fields},
+                     "keyValue": dict(zip(self.key.fields, entry))})
+
+    def add(self, document: dict) -> None:
+        for entry in self.entries(document):
+            self.owners[entry] = document["_id"]
+
+    def remove(self, document: dict) -> None:
+        for entry in self.entries(document):
+            if self.owners.get(entry) == document["_id"]:
+                del self.owners[entry]
+
+
+class InMemoryRepository(Repository):
+    """
+    Dict-backed repository for local tests and benchmarks (REPOSITORY_BACKEND=memory).
+    Documents are deep-copied in and out, and one lock makes every call atomic,
+    mirroring single-document atomicity in MongoDB. `unique_keys` are enforced on every write.
+    """
+
+    def __init__(self, name: str, store: "InMemoryStore", unique_keys: Sequence[UniqueKey] = ()):
+        self.name = name
+        self.store = store
+        self._documents: Dict[Any, dict] = {}
+        self._unique = [_UniqueIndex(key) for key in unique_keys]
+        self._lock = threading.RLock()
+
+    def _store(self, document: dict, previous: Optional[dict] = None) -> None:
+        """ Save a new or updated document; DuplicateKeyError (nothing saved) on a unique key. """
+        for index in self._unique:
+            index.check(document)
+        for index in self._unique:
+            if previous is not None:
+                index.remove(previous)
+            index.add(document)
+        self._documents[document["_id"]] = document
+
+    def _remove(self, document: dict) -> None:
+        for index in self._unique:
+            index.remove(document)
+        del self._documents[document["_id"]]
+
+    def _matching(self, filter: Filter) -> Iterable[dict]:
+        _id = (filter or {}).get("_id")
+        if _id is not None and not isinstance(_id, dict):
+            document = self._documents.get(_id)
+            return [document] if document is not None and matches(document, filter) else []
+        return [document for document in self._documents.values() if matches(document, filter)]
+
+    def find(self, filter: Filter = None, projection: Projection = None, sort: Sort = None,
+             limit: int = 0, skip: int = 0) -> List[dict]:
+        with self._lock:
+            documents = list(self._matching(filter))
+            if sort:
+                for field, direction in reversed([(sort, 1)] if isinstance(sort, str) else list(sort)):
+                    documents.sort(key=lambda doc: _sort_key(_get(doc, field)), reverse=direction < 0)
+            documents = documents[skip:skip + limit if limit else None]
+            return [_project(document, projection) for document in documents]
+
+    def find_raw(self, filter: Filter = None, projection: Projection = None, sort: Sort = None,
+                 limit: int = 0, skip: int = 0) -> Iterator:
+        for document in self.find(filter, projection, sort, limit, skip):
+            yield RawBSONDocument(bson.encode(document))
+
+    def find_one(self, filter: Filter = None, projection: Projection = None) -> Optional[dict]:
+        found = self.find(filter, projection, limit=1)
+        return found[0] if found else None
+
+    def count(self, filter: Filter = None) -> int:
+        with self._lock:
+            return len(list(self._matching(filter)))
+
+    def insert_one(self, document: dict):
+        with self._lock:
+            document.setdefault("_id", ObjectId())
+            if document["_id"] in self._documents:
+                raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: _id_", 11000,
+                                        {"keyPattern": {"_id": 1}, "keyValue": {"_id": document["_id"]}})
+            self._store(copy.deepcopy(document))
+            return document["_id"]
+
+    def insert_many(self, documents: Iterable[dict], ordered: bool = True) -> list:
+        inserted, errors = [], []
+        for position, document in enumerate(documents):
+            try:
+                inserted.append(self.insert_one(document))
+            except DuplicateKeyError as e:
+                errors.append({"index": position, "code": 11000, "errmsg": str(e), **(e.details or {})})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(inserted)})
+        return inserted
+
+    def _update(self, filter: Filter, update: dict, multi: bool, upsert: bool):
+        """ Returns (matched, modified, upserted_id, [(before, after), ...]). """
+        changes = []
+        for document in list(self._matching(filter)):
+            updated = copy.deepcopy(document)
+            apply_update(updated, update, filter)
+            self._store(updated, previous=document)
+            changes.append((document, updated))
+            if not multi:
+                break
+        if changes or not upsert:
+            modified = sum(1 for before, after in changes if before != after)
+            return len(changes), modified, None, changes
+
+        document = _seed_from_filter(filter)
+        apply_update(document, update, filter, inserting=True)
+        self.insert_one(document)
+        return 0, 0, document["_id"], [(None, self._documents[document["_id"]])]
+
+    def update_one(self, filter: Filter, update: dict, upsert: bool = False) -> WriteResult:
+        with self._lock:
+            matched, modified, upserted_id, _ = self._update(filter, update, False, upsert)
+            return WriteResult(matched, modified, upserted_id)
+
+    def update_many(self, filter: Filter, update: dict) -> WriteResult:
+        with self._lock:
+            matched, modified, _, _ = self._update(filter, update, True, False)
+            return WriteResult(matched, modified)
+
+    def find_one_and_update(self, filter: Filter, update: dict, projection: Projection = None,
+                            return_new: bool = False, upsert: bool = False) -> Optional[dict]:
+        with self._lock:
+            _, _, _, changes = self._update(filter, update, False, upsert)
+            if not changes:
+                return None
+            before, after = changes[0]
+            document = after if return_new else before
+            return _project(document, projection) if document is not None else None
+
+    def find_one_and_delete(self, filter: Filter, projection: Projection = None) -> Optional[dict]:
+        with self._lock:
+            for document in self._matching(filter):
+                self._remove(document)
+                return _project(document, projection)
+            return None
+
+    def delete_one(self, filter: Filter) -> int:
+        return 1 if self.find_one_and_delete(filter) is not None else 0
+
+    def delete_many(self, filter: Filter) -> int:
+        with self._lock:
+            doomed = list(self._matching(filter))
+            for document in doomed:
+                self._remove(document)
+            return len(doomed)
+
+
+class InMemoryStore(Store):
+    """
+    In-memory stand-in for one branch database; collections appear on first use.
+    `unique_keys` (collection -> UniqueKey tuple) are the unique indexes, UNIQUE_KEYS by default.
+    """
+
+    def __init__(self, name: str, unique_keys: Optional[Mapping[str, Sequence[UniqueKey]]] = None):
+        self.name = name
+        self.unique_keys = UNIQUE_KEYS if unique_keys is None else unique_keys
+        self._repositories: Dict[str, InMemoryRepository] = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, collection: str) -> InMemoryRepository:
+        with self._lock:
+            if collection not in self._repositories:
+                self._repositories[collection] = InMemoryRepository(
+                    collection, self, self.unique_keys.get(collection, ()))
+            return self._repositories[collection]
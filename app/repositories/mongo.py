@@ -0,0 +1,87 @@
+from typing import Iterable, Iterator, List, Optional
+
+from pymongo import ReturnDocument
+
+from app.repositories.base import Filter, Projection, Repository, Sort, Store, WriteResult
+from app.utils.raw_bson import RAW_CODEC_OPTIONS
+
+
+class MongoRepository(Repository):
+    """ Repository over a pymongo collection; `collection` stays available for Mongo-only work. """
+
+    def __init__(self, collection, store: "MongoStore"):
+        self.collection = collection
+        self.name = collection.name
+        self.store = store
+
+    def find(self, filter: Filter = None, projection: Projection = None, sort: Sort = None,
+             limit: int = 0, skip: int = 0) -> List[dict]:
+        cursor = self.collection.find(filter or {}, projection)
+        if sort:
+            cursor = cursor.sort(sort if not isinstance(sort, str) else [(sort, 1)])
+        if skip:
+            cursor = cursor.skip(skip)
+        if limit:
+            cursor = cursor.limit(limit)
+        return list(cursor)
+
+    def find_raw(self, filter: Filter = None, projection: Projection = None, sort: Sort = None,
+                 limit: int = 0, skip: int = 0) -> Iterator:
+        cursor = self.collection.with_options(codec_options=RAW_CODEC_OPTIONS).find(filter or {}, projection)
+        if sort:
+            cursor = cursor.sort(sort if not isinstance(sort, str) else [(sort, 1)])
+        if skip:
+            cursor = cursor.skip(skip)
+        if limit:
+            cursor = cursor.limit(limit)
+        return cursor
+
+    def find_one(self, filter: Filter = None, projection: Projection = None) -> Optional[dict]:
+        return self.collection.find_one(filter or {}, projection)
+
+    def count(self, filter: Filter = None) -> int:
+        return self.collection.count_documents(filter or {})
+
+    def insert_one(self, document: dict):
+        return self.collection.insert_one(document).inserted_id
+
+    def insert_many(self, documents: Iterable[dict], ordered: bool = True) -> list:
+        return self.collection.insert_many(list(documents), ordered=ordered).inserted_ids
+
+    def update_one(self, filter: Filter, update: dict, upsert: bool = False) -> WriteResult:
+        result = self.collection.update_one(filter, update, upsert=upsert)
+        return WriteResult(result.matched_count, result.modified_count, result.upserted_id)
+
+    def update_many(self, filter: Filter, update: dict) -> WriteResult:
+        result = self.collection.update_many(filter, update)
+        return WriteResult(result.matched_count, result.modified_count)
+
+    def find_one_and_update(self, filter: Filter, update: dict, projection: Projection = None,
+                            return_new: bool = False, upsert: bool = False) -> Optional[dict]:
+        return self.collection.find_one_and_update(
+            filter, update, projection=projection, upsert=upsert,
+            return_document=ReturnDocument.AFTER if return_new else ReturnDocument.BEFORE,
+        )
+
+    def find_one_and_delete(self, filter: Filter, projection: Projection = None) -> Optional[dict]:
+        return self.collection.find_one_and_delete(filter, projection=projection)
+
+    def delete_one(self, filter: Filter) -> int:
+        return self.collection.delete_one(filter).deleted_count
+
+    def delete_many(self, filter: Filter) -> int:
+        return self.collection.delete_many(filter).deleted_count
+
+    def aggregate(self, pipeline: list) -> List[dict]:
+        return list(self.collection.aggregate(pipeline))
+
+
+class MongoStore(Store):
+    """ Repositories of one pymongo database (or a read-preference view of it). """
+
+    def __init__(self, database):
+        self.database = database
+        self.name = database.name
+
+    def __getitem__(self, collection: str) -> MongoRepository:
+        return MongoRepository(self.database[collection], self)
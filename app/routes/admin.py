@@ -1,237 +1,345 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import PlainTextResponse
 from bson import ObjectId
-from datetime import datetime
-
-from app.core.dependencies import get_group_lessons_collection, get_individual_lessons_collection, get_users_collection, \
-    role_required
+from datetime import date
+from typing import Optional
+
+from app.core.analytics import DIMENSIONS, LESSON_COLLECTIONS, PROJECTION, lesson_snapshots
+from app.core.config import config
+from app.core.metrics import metrics
+from app.core.profiling import PROFILES, hot_paths
+from app.core.search import search_indexes
+from app.core.tenancy import get_branch
+from app.models.lesson_archive import LessonArchive
+from app.models.lesson_conflicts import LessonConflicts
+from app.models.payroll import Payroll
+from app.models.student import Student
+from app.models.sync import Sync
+from app.models.trends import MAX_TREND_MONTHS, TREND_DIMENSIONS, TREND_METRICS, Trends
+from app.core.user_cache import invalidate_user_profile
+from app.routes.teacher import birthdays_cache, version_predicate
+from app.schemas.responses import _to_day, AdminApprovedLessonsResponse, AdminPendingLessonsResponse, StudentStatsResponse, \
+    TeacherStatsResponse
+from app.schemas.user import Role
+from app.core.dependencies import get_group_lessons_repository, get_individual_lessons_repository, get_users_repository, \
+    role_required, get_reporting_group_lessons_repository, get_reporting_individual_lessons_repository, \
+    get_students_repository, get_store, get_reporting_store
+from app.utils.date_utils import date_range_filter, month_bounds, parse_month
+from app.utils.raw_bson import json_listing, rows
 
 router = APIRouter()
 
 
-def find_lessons(lessons_collection, filter_query):
-    """Retrieve lessons from the database based on a given filter query."""
-    lessons = list(
-        lessons_collection.find(filter_query, {
-            "_id": 1,
-            "teacher_name": 1,
-            "student_names": 1,
-            "student_name": 1,
-            "date": 1,
-            "hours": 1,
-            "education_level": 1,
-            "subject": 1,
-        })
-    )
+ADMIN_LESSON_PROJECTION = {"_id": 1, "teacher_name": 1, "student_names": 1, "student_name": 1, "date": 1,
+                           "hours": 1, "education_level": 1, "subject": 1}
+
 
-    for lesson in lessons:
-        lesson["_id"] = str(lesson["_id"])
+def find_lessons(lessons_repository, filter_query, since: Optional[str] = None):
+    """
+    Retrieve lessons from the database based on a given filter query.
+    Archived months are included unless `since` (YYYY-MM) starts inside the hot window; pending
+    lessons are never archived, so their listings only read the hot collection.
+    With RAW_BSON_READS the lessons are a one-pass iterator for `lessons_response`.
+    """
+    if filter_query.get("approved") is False:
+        if config.RAW_BSON_READS:
+            return rows(lessons_repository.find_raw(filter_query, ADMIN_LESSON_PROJECTION))
+        return lessons_repository.find(filter_query, ADMIN_LESSON_PROJECTION)
+    start = parse_month(since) if since else None
+    find = LessonArchive.find_rows if config.RAW_BSON_READS else LessonArchive.find
+    # `_id` and `date` are rendered by AdminLessonOut during serialization
+    return find(lessons_repository, {**filter_query, **date_range_filter(start, None)}, ADMIN_LESSON_PROJECTION,
+                since=start)
 
-        if "date" in lesson:
-            if isinstance(lesson["date"], str):
-                try:
-                    lesson["date"] = datetime.fromisoformat(lesson["date"]).strftime("%Y-%m-%d")
-                except ValueError:
-                    pass
-            elif isinstance(lesson["date"], datetime):
-                lesson["date"] = lesson["date"].strftime("%Y-%m-%d")
 
-    return lessons
+def _listing_row(lesson: dict) -> dict:
+    if "date" in lesson:
+        lesson["date"] = _to_day(lesson["date"])
+    return lesson
 
 
-def update_lesson_status(lessons_collection, lesson_id: str, approved: bool):
-    """Update the approval status of a lesson."""
+def lessons_response(message: str, key: str, lessons):
+    """ Listing body; with RAW_BSON_READS it is encoded here row by row (same JSON as AdminLessonOut). """
+    if config.RAW_BSON_READS:
+        return Response(json_listing({"message": message}, key, lessons, _listing_row), media_type="application/json")
+    return {"message": message, key: lessons}
+
+
+def update_lesson_status(lessons_repository, lesson_id: str, approved: bool, version: Optional[int] = None):
+    """
+    Update the approval status of a lesson.
+    With `version`, only the version the admin reviewed is approved/rejected (409 otherwise).
+    """
     try:
         lesson_object_id = ObjectId(lesson_id)
-        result = lessons_collection.update_one({"_id": lesson_object_id}, {"$set": {"approved": approved}})
-
-        if result.matched_count == 0:
+        query = {"_id": lesson_object_id}
+        if version is not None:
+            query["version"] = version_predicate(version)
+
+        def change_status():
+            return lessons_repository.find_one_and_update(
+                query, Sync.touch({"$set": {"approved": approved}, "$inc": {"version": 1}}), projection=PROJECTION
+            )
+
+        previous = change_status()
+        if previous is None and LessonArchive.restore(lessons_repository, lesson_object_id):
+            previous = change_status()
+
+        if previous is None:
+            if version is not None and lessons_repository.find_one({"_id": lesson_object_id}, {"_id": 1}):
+                raise HTTPException(status_code=409, detail="Lesson was modified since it was loaded")
             raise HTTPException(status_code=404, detail="Lesson not found")
 
+        if previous.get("approved", False) != approved:
+            Payroll.mark_dirty(lessons_repository.store, previous.get("teacher_name"), previous.get("date"))
+            lesson_type = LESSON_COLLECTIONS[lessons_repository.name]
+            lesson_snapshots.apply(lessons_repository.store,
+                                   lambda snapshot: snapshot.upsert({**previous, "approved": approved}, lesson_type))
+
         return {"message": f"Lesson {'approved' if approved else 'rejected'} successfully"}
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Error updating lesson: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
-@router.get("/approved-group-lessons", response_model=dict)
+@router.get("/metrics", response_model=dict)
+def get_metrics(current_user=Depends(role_required("admin"))):
+    """Return in-process counters (per worker) for capacity planning."""
+    return metrics.snapshot()
+
+
+@router.get("/profiles", response_model=dict)
+def list_profiles(
+        limit: int = Query(50, ge=1, le=500),
+        store=Depends(get_store),
+        current_user=Depends(role_required("admin"))
+):
+    """Recent on-demand request profiles (requests sent with `X-Profile: 1` or `?profile=1`)."""
+    profiles = store[PROFILES].find({}, {"stacks": 0, "hot_functions": 0, "expires_at": 0},
+                                    sort=[("created_at", -1)], limit=limit)
+    return {"profiles": profiles}
+
+
+@router.get("/profiles/hot", response_model=dict)
+def get_hot_paths(
+        top: int = Query(20, ge=1, le=200),
+        reset: bool = Query(False, description="Clear the aggregate after reading it"),
+        current_user=Depends(role_required("admin"))
+):
+    """Hot functions per route from the sampled profiles of this worker (PROFILE_SAMPLE_EVERY)."""
+    routes = hot_paths.snapshot(top)
+    if reset:
+        hot_paths.reset()
+    return {"sample_every": config.PROFILE_SAMPLE_EVERY, "routes": routes}
+
+
+@router.get("/profiles/hot/folded", response_class=PlainTextResponse)
+def get_hot_path_stacks(
+        route: str = Query(..., description='Route key as listed by /profiles/hot, e.g. "GET /teacher/lessons"'),
+        current_user=Depends(role_required("admin"))
+):
+    """Aggregated stacks of one route in folded format (flamegraph.pl, speedscope)."""
+    stacks = hot_paths.folded(route)
+    if stacks is None:
+        raise HTTPException(status_code=404, detail="No samples for this route")
+    return PlainTextResponse(stacks)
+
+
+@router.get("/profiles/{profile_id}", response_model=dict)
+def get_profile(profile_id: str, store=Depends(get_store), current_user=Depends(role_required("admin"))):
+    """One request profile: hot functions and the sampled stacks."""
+    profile = store[PROFILES].find_one({"_id": profile_id}, {"expires_at": 0})
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+
+@router.get("/profiles/{profile_id}/folded", response_class=PlainTextResponse)
+def get_profile_stacks(profile_id: str, store=Depends(get_store), current_user=Depends(role_required("admin"))):
+    """One request profile in folded format (flamegraph.pl, speedscope)."""
+    profile = store[PROFILES].find_one({"_id": profile_id}, {"stacks": 1})
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse("".join(f"{entry['stack']} {entry['count']}\n" for entry in profile["stacks"]))
+
+
+@router.patch("/users/{username}/role", response_model=dict)
+def change_user_role(
+        username: str,
+        role: Role = Query(..., description="New role"),
+        branch: str = Depends(get_branch),
+        users_repository=Depends(get_users_repository),
+        current_user=Depends(role_required("admin"))
+):
+    """Change a user's role; takes effect on the user's next request."""
+    result = users_repository.update_one({"username": username}, Sync.touch({"$set": {"role": role.value}}))
+
+    if result.matched == 0:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    invalidate_user_profile(branch, username)
+    birthdays_cache.clear()  # the birthday lists only show teachers
+
+    def reindex(index):
+        if role == Role.TEACHER:
+            index.upsert_teacher(username)
+        else:
+            index.remove("teacher", username)
+    search_indexes.apply(users_repository.store, reindex)
+    return {"message": "User role updated successfully", "username": username, "role": role.value}
+
+
+@router.get("/approved-group-lessons", response_model=AdminApprovedLessonsResponse, response_model_exclude_unset=True)
 def get_approved_group_lessons(
-        lessons_collection=Depends(get_group_lessons_collection),
+        since: Optional[str] = Query(None, description="Only lessons from this month (YYYY-MM) on"),
+        lessons_repository=Depends(get_reporting_group_lessons_repository),
         current_user=Depends(role_required("admin"))
 ):
     """Retrieve all approved group lessons for the admin."""
     print(f"👤 Admin {current_user['username']} fetching approved group lessons")
 
-    approved_lessons = find_lessons(lessons_collection, {"approved": True})
+    approved_lessons = find_lessons(lessons_repository, {"approved": True}, since)
 
-    return {
-        "message": "Approved group lessons retrieved successfully",
-        "approved_lessons": approved_lessons
-    }
+    return lessons_response("Approved group lessons retrieved successfully", "approved_lessons", approved_lessons)
 
 
-@router.get("/approved-individual-lessons", response_model=dict)
+@router.get("/approved-individual-lessons", response_model=AdminApprovedLessonsResponse, response_model_exclude_unset=True)
 def get_approved_individual_lessons(
-        lessons_collection=Depends(get_individual_lessons_collection),
+        since: Optional[str] = Query(None, description="Only lessons from this month (YYYY-MM) on"),
+        lessons_repository=Depends(get_reporting_individual_lessons_repository),
         current_user=Depends(role_required("admin"))
 ):
     """Retrieve all approved individual lessons for the admin."""
-    approved_lessons = find_lessons(lessons_collection, {"approved": True})
+    approved_lessons = find_lessons(lessons_repository, {"approved": True}, since)
 
-    return {
-        "message": "Approved individual lessons retrieved successfully",
-        "approved_lessons": approved_lessons
-    }
+    return lessons_response("Approved individual lessons retrieved successfully", "approved_lessons", approved_lessons)
 
 
-@router.get("/pending-individual-lessons", response_model=dict)
+@router.get("/pending-individual-lessons", response_model=AdminPendingLessonsResponse, response_model_exclude_unset=True)
 def get_pending_individual_lessons(
-        lessons_collection=Depends(get_individual_lessons_collection),
+        lessons_repository=Depends(get_individual_lessons_repository),
         current_user=Depends(role_required("admin"))
 ):
     """Retrieve all pending individual lessons for the admin."""
-    pending_lessons = find_lessons(lessons_collection, {"approved": False})
+    pending_lessons = find_lessons(lessons_repository, {"approved": False})
 
-    return {
-        "message": "Pending individual lessons retrieved successfully",
-        "pending_lessons": pending_lessons
-    }
+    return lessons_response("Pending individual lessons retrieved successfully", "pending_lessons", pending_lessons)
 
 
 @router.post("/approve-individual-lesson/{lesson_id}")
 def approve_individual_lesson(
         lesson_id: str,
-        lessons_collection=Depends(get_individual_lessons_collection),
+        version: Optional[int] = Query(None, description="Version the admin reviewed (optional)"),
+        lessons_repository=Depends(get_individual_lessons_repository),
         current_user=Depends(role_required("admin"))
 ):
     """Approve an individual lesson."""
-    return update_lesson_status(lessons_collection, lesson_id, approved=True)
+    return update_lesson_status(lessons_repository, lesson_id, approved=True, version=version)
 
 
 @router.post("/reject-individual-lesson/{lesson_id}")
 def reject_individual_lesson(
         lesson_id: str,
-        lessons_collection=Depends(get_individual_lessons_collection),
+        version: Optional[int] = Query(None, description="Version the admin reviewed (optional)"),
+        lessons_repository=Depends(get_individual_lessons_repository),
         current_user=Depends(role_required("admin"))
 ):
     """Reject an individual lesson."""
-    return update_lesson_status(lessons_collection, lesson_id, approved=False)
+    return update_lesson_status(lessons_repository, lesson_id, approved=False, version=version)
 
 
-@router.get("/pending-group-lessons", response_model=dict)
+@router.get("/pending-group-lessons", response_model=AdminPendingLessonsResponse, response_model_exclude_unset=True)
 def get_pending_group_lessons(
-        lessons_collection=Depends(get_group_lessons_collection),
+        lessons_repository=Depends(get_group_lessons_repository),
         current_user=Depends(role_required("admin"))
 ):
     """Retrieve all pending group lessons for the admin."""
-    pending_lessons = find_lessons(lessons_collection, {"approved": False})
+    pending_lessons = find_lessons(lessons_repository, {"approved": False})
 
-    return {
-        "message": "Pending group lessons retrieved successfully",
-        "pending_lessons": pending_lessons
-    }
+    return lessons_response("Pending group lessons retrieved successfully", "pending_lessons", pending_lessons)
 
 
 @router.post("/approve-group-lesson/{lesson_id}")
 def approve_group_lesson(
         lesson_id: str,
-        lessons_collection=Depends(get_group_lessons_collection),
+        version: Optional[int] = Query(None, description="Version the admin reviewed (optional)"),
+        lessons_repository=Depends(get_group_lessons_repository),
         current_user=Depends(role_required("admin"))
 ):
     """Approve a group lesson."""
-    return update_lesson_status(lessons_collection, lesson_id, approved=True)
+    return update_lesson_status(lessons_repository, lesson_id, approved=True, version=version)
 
 
 @router.post("/reject-group-lesson/{lesson_id}")
 def reject_group_lesson(
         lesson_id: str,
-        lessons_collection=Depends(get_group_lessons_collection),
+        version: Optional[int] = Query(None, description="Version the admin reviewed (optional)"),
+        lessons_repository=Depends(get_group_lessons_repository),
         current_user=Depends(role_required("admin"))
 ):
     """Reject a group lesson."""
-    return update_lesson_status(lessons_collection, lesson_id, approved=False)
+    return update_lesson_status(lessons_repository, lesson_id, approved=False, version=version)
 
 @router.delete("/admin/delete-lesson/{lesson_id}", response_model=dict)
 def admin_delete_lesson(
     lesson_id: str,
-    lessons_collection=Depends(get_individual_lessons_collection),
+    lessons_repository=Depends(get_individual_lessons_repository),
     current_user=Depends(role_required("admin"))
 ):
     """Admin deletes any lesson (regardless of owner or approval)."""
-    result = lessons_collection.delete_one({"_id": ObjectId(lesson_id)})
+    lesson_object_id = ObjectId(lesson_id)
+    deleted = lessons_repository.find_one_and_delete(
+        {"_id": lesson_object_id}, projection={"approved": 1, "teacher_name": 1, "date": 1}
+    )
+    if deleted is None and LessonArchive.restore(lessons_repository, lesson_object_id):
+        deleted = lessons_repository.find_one_and_delete(
+            {"_id": lesson_object_id}, projection={"approved": 1, "teacher_name": 1, "date": 1}
+        )
 
-    if result.deleted_count == 0:
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Lesson not found")
+    Sync.tombstone(lessons_repository.store, lessons_repository.name, lesson_object_id, deleted.get("teacher_name"))
+
+    if deleted.get("approved"):
+        Payroll.mark_dirty(lessons_repository.store, deleted.get("teacher_name"), deleted.get("date"))
+        lesson_snapshots.apply(lessons_repository.store, lambda snapshot: snapshot.remove(lesson_object_id))
 
     return {"message": "Lesson deleted by admin successfully"}
 
-@router.get("/student-stats", response_model=dict)
+@router.get("/student-stats", response_model=StudentStatsResponse)
 def get_student_stats(
         month: str = Query(..., description="Month in YYYY-MM format"),
         token: str = Query(..., description="Access token"),
-        individual_lessons=Depends(get_individual_lessons_collection),
-        group_lessons=Depends(get_group_lessons_collection),
+        store=Depends(get_reporting_store),
+        students_repository=Depends(get_students_repository),
         current_user=Depends(role_required("admin"))
 ):
     """Retrieve student statistics filtered by a given month (YYYY-MM)."""
+    start, end = month_bounds(month)
+    snapshot = lesson_snapshots.get(store)
 
-    try:
-        datetime.strptime(month, "%Y-%m")
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid month format. Use YYYY-MM")
-
+    # Students are keyed by directory id so spelling variants of one name land in one row;
+    # lessons not yet backfilled fall back to the normalized name.
+    levels = snapshot.first_values("student", "level", start, end)
     student_stats = {}
+    for (key, lesson_type), hours in snapshot.group_sum(("student", "lesson_type"), start=start, end=end).items():
+        if key is None:
+            continue
+        stat = student_stats.setdefault(key, {
+            "student_id": str(key) if isinstance(key, ObjectId) else None,
+            "student_name": snapshot.label("student", key),
+            "total_individual_hours": 0,
+            "total_group_hours": 0,
+            "education_level": levels.get(key) or "Unknown Level"
+        })
+        stat[f"total_{lesson_type}_hours"] += hours
 
-    individual_lessons_list = list(individual_lessons.find({
-        "approved": True,
-        "$or": [
-            {"$expr": {"$regexMatch": {
-                "input": {"$dateToString": {"format": "%Y-%m", "date": {"$toDate": "$date"}}},
-                "regex": f"^{month}"
-            }}},
-            {"date": {"$regex": f"^{month}"}}
-        ]
-    }))
-
-    group_lessons_list = list(group_lessons.find({
-        "approved": True,
-        "$or": [
-            {"$expr": {"$regexMatch": {
-                "input": {"$dateToString": {"format": "%Y-%m", "date": {"$toDate": "$date"}}},
-                "regex": f"^{month}"
-            }}},
-            {"date": {"$regex": f"^{month}"}}
-        ]
-    }))
-
-    for lesson in individual_lessons_list:
-        student_name = lesson.get("student_name", "Unknown Student")
-        education_level = lesson.get("education_level", "Unknown Level")
-
-        if student_name not in student_stats:
-            student_stats[student_name] = {
-                "student_name": student_name,
-                "total_individual_hours": 0,
-                "total_group_hours": 0,
-                "education_level": education_level
-            }
-
-        student_stats[student_name]["total_individual_hours"] += lesson.get("hours", 0)
-
-    for lesson in group_lessons_list:
-        student_names = lesson.get("student_names", [])
-        education_level = lesson.get("education_level", "Unknown Level")
-
-        for student_name in student_names:
-            if student_name not in student_stats:
-                student_stats[student_name] = {
-                    "student_name": student_name,
-                    "total_individual_hours": 0,
-                    "total_group_hours": 0,
-                    "education_level": education_level
-                }
-
-            student_stats[student_name]["total_group_hours"] += lesson.get("hours", 0)
+    display_names = Student.names_by_id([k for k in student_stats if isinstance(k, ObjectId)], students_repository)
+    for key, stat in student_stats.items():
+        stat["student_name"] = display_names.get(key, stat["student_name"])
 
     return {
         "message": "Student statistics retrieved successfully",
@@ -239,77 +347,113 @@ def get_student_stats(
     }
 
 
-@router.get("/teacher-individual-stats", response_model=dict)
+@router.get("/teacher-individual-stats", response_model=TeacherStatsResponse)
 def get_teacher_individual_stats(
         month: str,
-        individual_lessons=Depends(get_individual_lessons_collection),
-        group_lessons=Depends(get_group_lessons_collection),
+        store=Depends(get_reporting_store),
         current_user=Depends(role_required("admin"))
 ):
     """Retrieve statistics for all teachers' individual and group lessons in the given month."""
-
-    try:
-        datetime.strptime(month, "%Y-%m")  # Validate date format
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid month format. Use YYYY-MM")
+    start, end = month_bounds(month)  # validates the YYYY-MM format
+    snapshot = lesson_snapshots.get(store)
 
     teacher_stats = {}
-
-    # ✅ Fetch lessons for the given month
-    def fetch_lessons(collection):
-        return list(collection.find({
-            "approved": True,
-            "$or": [
-                {"$expr": {"$regexMatch": {
-                    "input": {"$dateToString": {"format": "%Y-%m", "date": {"$toDate": "$date"}}},
-                    "regex": f"^{month}"
-                }}},
-                {"date": {"$regex": f"^{month}"}}  # Handle string dates
-            ]
-        }))
-
-    individual_lessons_list = fetch_lessons(individual_lessons)
-    group_lessons_list = fetch_lessons(group_lessons)
-
-    # ✅ Process Individual Lessons
-    for lesson in individual_lessons_list:
-        teacher_name = lesson.get("teacher_name", "Unknown Teacher")
-        education_level = lesson.get("education_level", "Unknown Level")
-        hours = lesson.get("hours", 0)
-
-        if teacher_name not in teacher_stats:
-            teacher_stats[teacher_name] = {
-                "teacher_name": teacher_name,
-                "total_individual_hours": 0,
-                "total_group_hours": 0,
-                "individual_hours_by_education_level": {},
-                "group_hours_by_education_level": {},
-            }
-
-        teacher_stats[teacher_name]["total_individual_hours"] += hours
-        teacher_stats[teacher_name]["individual_hours_by_education_level"].setdefault(education_level, 0)
-        teacher_stats[teacher_name]["individual_hours_by_education_level"][education_level] += hours
-
-    # ✅ Process Group Lessons
-    for lesson in group_lessons_list:
-        teacher_name = lesson.get("teacher_name", "Unknown Teacher")
-        education_level = lesson.get("education_level", "Unknown Level")
-        hours = lesson.get("hours", 0)
-
-        if teacher_name not in teacher_stats:
-            teacher_stats[teacher_name] = {
-                "teacher_name": teacher_name,
-                "total_individual_hours": 0,
-                "total_group_hours": 0,
-                "individual_hours_by_education_level": {},
-                "group_hours_by_education_level": {},
-            }
-
-        teacher_stats[teacher_name]["total_group_hours"] += hours
-        teacher_stats[teacher_name]["group_hours_by_education_level"].setdefault(education_level, 0)
-        teacher_stats[teacher_name]["group_hours_by_education_level"][education_level] += hours
+    hours_by_group = snapshot.group_sum(("teacher", "lesson_type", "level"), start=start, end=end)
+    for (teacher_name, lesson_type, education_level), hours in hours_by_group.items():
+        teacher_name = teacher_name or "Unknown Teacher"
+        education_level = education_level or "Unknown Level"
+        stat = teacher_stats.setdefault(teacher_name, {
+            "teacher_name": teacher_name,
+            "total_individual_hours": 0,
+            "total_group_hours": 0,
+            "individual_hours_by_education_level": {},
+            "group_hours_by_education_level": {},
+        })
+        stat[f"total_{lesson_type}_hours"] += hours
+        by_level = stat[f"{lesson_type}_hours_by_education_level"]
+        by_level[education_level] = by_level.get(education_level, 0) + hours
 
     return {
         "message": "Teacher individual lesson stats retrieved successfully",
         "teachers": list(teacher_stats.values())
     }
+
+
+@router.get("/analytics", response_model=dict)
+def get_analytics(
+        by: str = Query("teacher", description=f"Comma-separated dimensions: {', '.join(DIMENSIONS)}"),
+        metric: str = Query("hours", pattern="^(hours|lessons)$"),
+        date_from: Optional[date] = Query(None, alias="from", description="First day (YYYY-MM-DD)"),
+        date_to: Optional[date] = Query(None, alias="to", description="Day after the last (YYYY-MM-DD)"),
+        lesson_type: Optional[str] = Query(None, pattern="^(individual|group)$"),
+        teacher: Optional[str] = None,
+        store=Depends(get_reporting_store),
+        current_user=Depends(role_required("admin"))
+):
+    """Sum hours or lessons over any date range, grouped by any dimensions (from the lesson snapshot)."""
+    dimensions = [dim.strip() for dim in by.split(",") if dim.strip()]
+    unknown = [dim for dim in dimensions if dim not in DIMENSIONS]
+    if unknown or len(set(dimensions)) != len(dimensions):
+        raise HTTPException(status_code=400, detail=f"Invalid dimensions. Use: {', '.join(DIMENSIONS)}")
+
+    where = {key: value for key, value in (("lesson_type", lesson_type), ("teacher", teacher)) if value}
+    snapshot = lesson_snapshots.get(store)
+    groups = []
+    for key, value in snapshot.group_sum(dimensions, metric, date_from, date_to, **where).items():
+        group = dict(zip(dimensions, key))
+        if "student" in group:
+            student = group["student"]
+            group["student_id"] = str(student) if isinstance(student, ObjectId) else None
+            group["student"] = snapshot.label("student", student)
+        group["value"] = round(value, 4) if metric == "hours" else value
+        groups.append(group)
+    groups.sort(key=lambda group: group["value"], reverse=True)
+
+    return {"by": dimensions, "metric": metric, "groups": groups}
+
+
+@router.get("/trends", response_model=dict)
+def get_trends(
+        date_from: str = Query(..., alias="from", description="First month (YYYY-MM)"),
+        date_to: str = Query(..., alias="to", description="Last month (YYYY-MM), included"),
+        dimension: str = Query("teacher", pattern=f"^({'|'.join(TREND_DIMENSIONS)})$"),
+        metric: str = Query("hours", pattern=f"^({'|'.join(TREND_METRICS)})$"),
+        yoy: bool = Query(True, description="Include the same months a year earlier and the deltas"),
+        limit: Optional[int] = Query(None, ge=1, description="Only the largest series"),
+        store=Depends(get_store),
+        current_user=Depends(role_required("admin"))
+):
+    """Monthly hours, lessons or revenue per teacher, student, level or subject, with year-over-year deltas."""
+    months = Trends.month_range(date_from, date_to)
+    if not months:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    if len(months) > MAX_TREND_MONTHS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_TREND_MONTHS} months per request")
+
+    trends = Trends.series(store, lesson_snapshots.get(store), months, dimension, metric, yoy)
+    trends["series"] = trends["series"][:limit]
+    return trends
+
+
+@router.get("/lesson-conflicts", response_model=dict)
+def get_lesson_conflicts(
+        teacher_name: Optional[str] = Query(None, description="Only this teacher (default: every teacher)"),
+        store=Depends(get_reporting_store),
+        current_user=Depends(role_required("admin"))
+):
+    """
+    Duplicate and overlapping lessons already stored, archived months included.
+    For every teacher at once on a large history, queue a `lesson_conflicts` report job instead.
+    """
+    return LessonConflicts.sweep(store, teacher_name)
+
+
+@router.post("/archive-lessons", response_model=dict)
+def archive_lessons(
+        store=Depends(get_store),
+        current_user=Depends(role_required("admin"))
+):
+    """Move approved lessons of closed months to the archive now (also runs nightly)."""
+    result = LessonArchive.run(store)
+    return {"message": "Lessons archived successfully", "archived_before": result["archived_before"].date().isoformat(),
+            "moved": result["moved"]}
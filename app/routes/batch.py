@@ -0,0 +1,127 @@
+import asyncio
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlencode, urlsplit
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import BaseModel
+
+from app.core.config import config
+from app.core.dependencies import get_current_authenticated_user
+from app.core.metrics import metrics
+from app.core.tenancy import get_branch
+
+router = APIRouter()
+
+# Never run inside a batch: the batch itself, and streams that would never finish
+EXCLUDED_PREFIXES = ("/batch", "/events")
+# Request headers not passed on to items (they describe the batch body)
+DROPPED_HEADERS = {b"content-length", b"content-type", b"transfer-encoding", b"expect"}
+
+
+class BatchItem(BaseModel):
+    id: Optional[str] = None
+    method: str = "GET"
+    path: str  # e.g. "/admin/pending-individual-lessons" (may carry a query string)
+    params: Dict[str, Any] = {}
+
+
+class BatchRequest(BaseModel):
+    requests: List[BatchItem]
+
+
+def _validate(item: BatchItem) -> None:
+    path = urlsplit(item.path).path
+    if item.method.upper() != "GET":
+        raise HTTPException(status_code=400, detail=f"Only GET requests can be batched ({item.path})")
+    if not path.startswith("/") or path.startswith(EXCLUDED_PREFIXES):
+        raise HTTPException(status_code=400, detail=f"Path cannot be batched: {item.path}")
+
+
+def _decode_body(headers: Dict[str, str], body: bytes) -> Any:
+    content_type = headers.get("content-type", "")
+    if not body:
+        return None
+    if content_type.startswith("application/json"):
+        return orjson.loads(body)
+    if content_type.startswith("text/"):
+        return body.decode("utf-8", errors="replace")
+    return None  # binary (PDF, ZIP): request it directly
+
+
+async def _dispatch(request: Request, item: BatchItem, user: dict, branch: str) -> dict:
+    """ Run one GET through the whole app in-process, with the batch's user and branch already resolved. """
+    target = urlsplit(item.path)
+    query = [target.query] if target.query else []
+    params = urlencode(item.params, doseq=True)
+    if params:
+        query.append(params)
+    query.append(urlencode({"token": request.query_params.get("token", "")}))  # last value wins
+    scope = {
+        "type": "http",
+        "asgi": request.scope.get("asgi", {"version": "3.0"}),
+        "http_version": request.scope.get("http_version", "1.1"),
+        "method": "GET",
+        "scheme": request.scope.get("scheme", "http"),
+        "server": request.scope.get("server"),
+        "client": request.scope.get("client"),
+        "root_path": request.scope.get("root_path", ""),
+        "path": target.path,
+        "raw_path": target.path.encode(),
+        "query_string": "&".join(query).encode(),
+        "headers": [(k, v) for k, v in request.scope["headers"] if k not in DROPPED_HEADERS],
+        "state": {**request.scope.get("state", {}), "batch_user": user, "branch": branch},
+    }
+
+    done = asyncio.Event()
+    received = False
+    response = {"status": 500, "headers": {}, "body": bytearray()}
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in message.get("headers", [])}
+        elif message["type"] == "http.response.body":
+            response["body"] += message.get("body", b"")
+
+    try:
+        await request.app(scope, receive, send)
+    except Exception as e:  # ServerErrorMiddleware already sent the 500; keep the other items
+        print(f"❌ Batch item {item.path} failed: {str(e)}")
+        response["status"] = 500
+    finally:
+        done.set()
+
+    status = response["status"]
+    metrics.incr("batch_items", outcome="ok" if status < 400 else "error")
+    return {"id": item.id, "path": item.path, "status": status,
+            "body": _decode_body(response["headers"], bytes(response["body"]))}
+
+
+@router.post("", response_model=dict)
+async def run_batch(
+        batch: BatchRequest,
+        request: Request,
+        branch: str = Depends(get_branch),
+        current_user=Depends(get_current_authenticated_user)
+):
+    """
+    Run several GET requests in one round trip (e.g. every panel of the admin dashboard).
+    The caller is authenticated once; items run concurrently and each keeps its own status,
+    so one failing item does not fail the batch.
+    """
+    if not batch.requests or len(batch.requests) > config.BATCH_MAX_REQUESTS:
+        raise HTTPException(status_code=400, detail=f"Send 1 to {config.BATCH_MAX_REQUESTS} requests")
+    for item in batch.requests:
+        _validate(item)
+
+    responses = await asyncio.gather(*(_dispatch(request, item, current_user, branch) for item in batch.requests))
+    return {"responses": responses}
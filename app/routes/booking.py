@@ -1,17 +1,19 @@
 from datetime import datetime
 from typing import Optional, List, Any, Dict
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.cron import CronTrigger
-from pytz import timezone
-from apscheduler.triggers.interval import IntervalTrigger
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 
 from bson import ObjectId
 
-from app.core.database import mongo_db
 from app.models.booking import Booking
-from app.core.dependencies import get_student_bookings_collection, role_required
+from app.models.lesson_archive import LessonArchive
+from app.models.sync import Sync
+from app.repositories import get_branch_store
+from app.schemas.responses import BookingOut, BookingStatusResponse
+from app.core.dependencies import get_student_bookings_repository, role_required, get_students_repository
+from app.core.idempotency import idempotent
+from app.core.rate_limit import client_ip
+from app.utils.raw_bson import rows
 from app.utils.send_email_with_attachments import export_to_csv_memory, send_email_with_attachment
 from app.core.config import config
 
@@ -47,10 +49,15 @@ def _coerce_date_or_today(date_str: Optional[str]) -> str:
 @router.post("/", response_model=dict)
 def create_booking(
     booking_data: dict,
-    bookings_collection=Depends(get_student_bookings_collection),
+    request: Request,
+    bookings_repository=Depends(get_student_bookings_repository),
+    students_repository=Depends(get_students_repository),
+    idempotency=Depends(idempotent("booking")),
 ):
     """
-    Create a booking.
+    Create a booking. A retry with the same Idempotency-Key header (or, without one, the same
+    payload within a couple of minutes) returns the first response instead of booking twice.
+    The route is public, so retries are matched per client address.
     Expected payload (key fields):
       - phone, subject, ageLevel, lessonDate (YYYY-MM-DD), lessonTime (HH:MM 24h), hours (float)
       - students: List[str]  (>=1 for individual, >=2 for group)
@@ -59,15 +66,16 @@ def create_booking(
       - parentName: Optional[str]
       - notes: Optional[str]
     """
-    return Booking.create_booking(booking_data, bookings_collection)
+    return idempotency.run(lambda: Booking.create_booking(booking_data, bookings_repository, students_repository),
+                           caller=f"ip:{client_ip(request) or ''}")
 
 
 # 2) Update booking status
-@router.patch("/{booking_id}/status", response_model=dict)
+@router.patch("/{booking_id}/status", response_model=BookingStatusResponse, response_model_exclude_unset=True)
 def update_booking_status(
     booking_id: str,
     payload: dict,   # expects {"status": "approved"} etc.
-    bookings_collection=Depends(get_student_bookings_collection),
+    bookings_repository=Depends(get_student_bookings_repository),
     current_user=Depends(role_required("admin")),
 ):
     new_status = payload.get("status")
@@ -79,55 +87,49 @@ def update_booking_status(
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid booking_id")
 
-    updated = bookings_collection.find_one_and_update(
+    updated = bookings_repository.find_one_and_update(
         {"_id": obj_id},
-        {"$set": {"status": new_status}},
-        return_document=True,  # assumes your pymongo helper handles ReturnDocument
+        Sync.touch({"$set": {"status": new_status}}),
+        return_new=True,
     )
     if not updated:
         raise HTTPException(status_code=404, detail="Booking not found")
 
-    _stringify_id(updated)
     return {"message": "Status updated", "booking": updated}
 
 
 # 3) Bookings created on a date (default: today UTC)
-@router.get("/today/bookings", response_model=List[dict])
+@router.get("/today/bookings", response_model=List[BookingOut], response_model_exclude_unset=True)
 def get_bookings_by_date(
     date: Optional[str] = Query(None, description="Target date in YYYY-MM-DD (UTC). Omit for today."),
-    bookings_collection=Depends(get_student_bookings_collection),
+    bookings_repository=Depends(get_student_bookings_repository),
     current_user=Depends(role_required("admin")),
 ):
     target = _coerce_date_or_today(date)
-    items = list(bookings_collection.find({"bookingDate": target}))
-    return [_stringify_id(x) for x in items]
+    return bookings_repository.find({"bookingDate": target})
 
 
 # 4) Lessons scheduled on a date (default: today UTC)
-@router.get("/today/lessons", response_model=List[dict])
+@router.get("/today/lessons", response_model=List[BookingOut], response_model_exclude_unset=True)
 def get_lessons_by_date(
     date: Optional[str] = Query(None, description="Target date in YYYY-MM-DD (UTC). Omit for today."),
-    bookings_collection=Depends(get_student_bookings_collection),
+    bookings_repository=Depends(get_student_bookings_repository),
     current_user=Depends(role_required("admin")),
 ):
     target = _coerce_date_or_today(date)
-    items = list(bookings_collection.find({"lessonDate": target}))
-    return [_stringify_id(x) for x in items]
+    return bookings_repository.find({"lessonDate": target})
 
 
 # ---------- Email Export ----------
 
 def process_today_bookings():
-    today = _todays_iso_utc()
-    coll = mongo_db.student_bookings_collection
+    """Email the daily bookings/lessons CSVs of every branch."""
+    for branch in config.BRANCH_DATABASES:
+        process_branch_bookings(branch, get_branch_store(branch, reporting=True)["StudentBookings"])
 
-    bookings_today = list(coll.find({"bookingDate": today}))
-    lessons_today = list(coll.find({"lessonDate": today}))
 
-    for b in bookings_today:
-        _stringify_id(b)
-    for l in lessons_today:
-        _stringify_id(l)
+def process_branch_bookings(branch: str, coll):
+    today = _todays_iso_utc()
 
     # UPDATED: headers reflect new Booking model (parentName instead of first/last name)
     headers = [
@@ -136,6 +138,20 @@ def process_today_bookings():
         "lessonType", "students", "status", "bookingDate"
     ]
 
+    if config.RAW_BSON_READS:
+        # Only the exported columns are decoded, one row at a time as the CSV is written
+        projection = {h: 1 for h in headers}
+        bookings_today = rows(coll.find_raw({"bookingDate": today}, projection))
+        lessons_today = rows(coll.find_raw({"lessonDate": today}, projection))
+    else:
+        bookings_today = coll.find({"bookingDate": today})
+        lessons_today = coll.find({"lessonDate": today})
+
+        for b in bookings_today:
+            _stringify_id(b)
+        for l in lessons_today:
+            _stringify_id(l)
+
     def normalize(doc: Dict[str, Any]) -> Dict[str, Any]:
         d = dict(doc)
         # stringify list of students
@@ -147,11 +163,11 @@ def process_today_bookings():
         # keep only expected columns & order
         return {h: d.get(h, "") for h in headers}
 
-    bookings_csv = export_to_csv_memory([normalize(x) for x in bookings_today], headers)
-    lessons_csv = export_to_csv_memory([normalize(x) for x in lessons_today], headers)
+    bookings_csv = export_to_csv_memory((normalize(x) for x in bookings_today), headers)
+    lessons_csv = export_to_csv_memory((normalize(x) for x in lessons_today), headers)
 
     send_email_with_attachment(
-        subject=f"Daily Report {today}",
+        subject=f"Daily Report {today}" if branch == config.DEFAULT_BRANCH else f"Daily Report {today} ({branch})",
         body=f"Attached are today's bookings (created today) and lessons (scheduled today).",
         to_email=config.EMAIL_TO,
         attachments=[
@@ -164,7 +180,12 @@ def process_today_bookings():
 # ---------- Scheduler ----------
 
 def start_scheduler():
-    scheduler = BackgroundScheduler(timezone=timezone("Asia/Jerusalem"))
+    """Start the daily report job; APScheduler and pytz are only imported here, at startup."""
+    from apscheduler.schedulers.background import BackgroundScheduler
+    from apscheduler.triggers.cron import CronTrigger
+    from pytz import timezone
+
+    scheduler = BackgroundScheduler(timezone=timezone(config.TIMEZONE))
 
     # Daily at 10:00 Asia/Jerusalem
     scheduler.add_job(
@@ -176,7 +197,17 @@ def start_scheduler():
         coalesce=True,
     )
 
-    # For testing: every 2 minutes
+    # Nightly: move approved lessons of closed months to the archive collections
+    scheduler.add_job(
+        LessonArchive.run_all_branches,
+        trigger=CronTrigger(hour=3, minute=0),
+        id="nightly_lesson_archive",
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True,
+    )
+
+    # For testing: every 2 minutes (import IntervalTrigger from apscheduler.triggers.interval)
     # scheduler.add_job(
     #     process_today_bookings,
     #     trigger=IntervalTrigger(minutes=2),
@@ -187,3 +218,4 @@ def start_scheduler():
     # )
 
     scheduler.start()
+    return scheduler
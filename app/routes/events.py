@@ -0,0 +1,63 @@
+import asyncio
+from typing import Any
+
+import orjson
+from bson import ObjectId
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+
+from app.core.dependencies import role_required
+from app.core.events import event_bus
+from app.core.tenancy import get_branch
+
+router = APIRouter()
+
+KEEP_ALIVE_SECONDS = 15
+
+
+def _default(value: Any):
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError
+
+
+def _format_sse(event: dict) -> str:
+    data = orjson.dumps(event, default=_default).decode("utf-8")
+    return f"event: {event['collection']}\ndata: {data}\n\n"
+
+
+@router.get("/stream")
+async def stream_events(
+        request: Request,
+        branch: str = Depends(get_branch),
+        current_user=Depends(role_required("admin", "teacher"))
+):
+    """
+    Server-Sent Events stream of lesson/booking changes.
+    Admins receive every change; teachers receive changes to their own lessons only.
+    A `resync` event means events were dropped and the client should refetch its lists.
+    """
+    subscription = event_bus.subscribe(current_user, branch)
+
+    async def event_generator():
+        try:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=KEEP_ALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+
+                if subscription.overflowed:
+                    subscription.overflowed = False
+                    yield "event: resync\ndata: {}\n\n"
+                yield _format_sse(event)
+        finally:
+            event_bus.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
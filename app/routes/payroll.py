@@ -0,0 +1,76 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel, Field
+
+from app.core.dependencies import get_store, role_required
+from app.models.payroll import Payroll
+from app.utils.date_utils import parse_month
+
+router = APIRouter()
+
+
+class PayRateRequest(BaseModel):
+    """ Hourly rate; omitted dimensions match any value. """
+    rate: float = Field(..., ge=0)
+    teacher_name: Optional[str] = None
+    lesson_type: Optional[str] = Field(None, description='"individual" or "group"')
+    education_level: Optional[str] = None
+    subject: Optional[str] = None
+
+
+@router.get("/rates", response_model=dict)
+def get_pay_rates(db=Depends(get_store), current_user=Depends(role_required("admin"))):
+    """List the configured pay rates."""
+    return {"rates": Payroll.get_rates(db)}
+
+
+@router.put("/rates", response_model=dict)
+def set_pay_rate(rate: PayRateRequest, db=Depends(get_store), current_user=Depends(role_required("admin"))):
+    """Create or update a pay rate. Open months are recomputed on their next read."""
+    saved = Payroll.set_rate(db, **rate.dict())
+    return {"message": "Pay rate saved successfully", "rate": saved}
+
+
+@router.delete("/rates", response_model=dict)
+def delete_pay_rate(
+        teacher_name: Optional[str] = Query(None),
+        lesson_type: Optional[str] = Query(None),
+        education_level: Optional[str] = Query(None),
+        subject: Optional[str] = Query(None),
+        db=Depends(get_store),
+        current_user=Depends(role_required("admin"))
+):
+    """Delete the pay rate with exactly these dimensions."""
+    if not Payroll.delete_rate(db, teacher_name=teacher_name, lesson_type=lesson_type,
+                               education_level=education_level, subject=subject):
+        raise HTTPException(status_code=404, detail="Pay rate not found")
+    return {"message": "Pay rate deleted successfully"}
+
+
+@router.get("/me", response_model=dict)
+def get_my_payslip(
+        month: str = Query(..., description="Month in YYYY-MM format"),
+        db=Depends(get_store),
+        current_user=Depends(role_required("teacher"))
+):
+    """The authenticated teacher's payslip for a month."""
+    parse_month(month)
+    payslip = Payroll.get_payslip(db, month, current_user["username"])
+    if not payslip:
+        raise HTTPException(status_code=404, detail="No payslip for this month")
+    return {"payslip": payslip}
+
+
+@router.get("/{month}", response_model=dict)
+def get_month_payroll(month: str, db=Depends(get_store), current_user=Depends(role_required("admin"))):
+    """Payroll of every teacher for a month (YYYY-MM)."""
+    parse_month(month)
+    return Payroll.compute_month(db, month)
+
+
+@router.post("/{month}/close", response_model=dict)
+def close_month_payroll(month: str, db=Depends(get_store), current_user=Depends(role_required("admin"))):
+    """Close a month: its payslips become immutable."""
+    parse_month(month)
+    return {"message": "Payroll month closed", **Payroll.close_month(db, month)}
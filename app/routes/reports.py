@@ -0,0 +1,171 @@
+import io
+import zipfile
+from typing import Optional
+from urllib.parse import quote
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from pydantic import BaseModel
+
+from app.core.dependencies import get_store, role_required
+from app.core.report_jobs import JOB_TYPES, job_workers
+from app.core.reports import report_renderer
+from app.models.report_jobs import ReportJobs
+from app.models.statements import Statements
+from app.routes.students import parse_student_id
+from app.utils.date_utils import parse_month
+
+router = APIRouter()
+
+
+class JobRequest(BaseModel):
+    type: str
+    params: dict = {}
+
+
+def _attachment(filename: str) -> str:
+    return f"attachment; filename*=UTF-8''{quote(filename)}"
+
+
+def pdf_response(store, document: dict, filename: str, if_none_match: Optional[str]) -> Response:
+    """ Render (or reuse) a document; the content hash is the ETag, so a matching If-None-Match skips rendering. """
+    etag = f'"{report_renderer.content_hash(document)}"'
+    if if_none_match == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    digest, pdf = report_renderer.render(store, document)
+    return Response(pdf, media_type="application/pdf",
+                    headers={"ETag": f'"{digest}"', "Content-Disposition": _attachment(filename)})
+
+
+@router.get("/teacher-statement")
+def get_teacher_statement(
+        month: str = Query(..., description="Month in YYYY-MM"),
+        teacher_name: Optional[str] = Query(None, description="Admins only; teachers get their own statement"),
+        if_none_match: Optional[str] = Header(None),
+        store=Depends(get_store),
+        current_user=Depends(role_required("admin", "teacher"))
+):
+    """Monthly statement of a teacher's approved lessons, hours and pay, as a PDF."""
+    parse_month(month)
+    if current_user["role"] != "admin" or not teacher_name:
+        teacher_name = current_user["username"]
+    document = Statements.teacher_month(store, month, teacher_name)
+    return pdf_response(store, document, f"{teacher_name}_{month}.pdf", if_none_match)
+
+
+@router.get("/teacher-statements")
+def get_all_teacher_statements(
+        month: str = Query(..., description="Month in YYYY-MM"),
+        store=Depends(get_store),
+        current_user=Depends(role_required("admin"))
+):
+    """Statements of every teacher with lessons in the month, rendered in parallel, as one ZIP."""
+    parse_month(month)
+    documents = Statements.teacher_months(store, month)
+    if not documents:
+        raise HTTPException(status_code=404, detail="No approved lessons in this month")
+
+    rendered = report_renderer.render_many(store, list(documents.values()))
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_STORED) as bundle:  # PDFs are already compressed
+        for teacher_name, (_, pdf) in zip(documents, rendered):
+            bundle.writestr(f"{teacher_name}_{month}.pdf", pdf)
+    print(f"🧾 Rendered {len(documents)} teacher statements for {month}")
+    return Response(archive.getvalue(), media_type="application/zip",
+                    headers={"Content-Disposition": _attachment(f"teacher_statements_{month}.zip")})
+
+
+@router.get("/student-statement/{student_id}")
+def get_student_statement(
+        student_id: str,
+        month: str = Query(..., description="Month in YYYY-MM"),
+        if_none_match: Optional[str] = Header(None),
+        store=Depends(get_store),
+        current_user=Depends(role_required("admin"))
+):
+    """A student's lessons and payments in a month, as a PDF."""
+    parse_month(month)
+    document = Statements.student_month(store, month, parse_student_id(student_id))
+    if document is None:
+        raise HTTPException(status_code=404, detail="Student not found")
+    return pdf_response(store, document, f"student_{student_id}_{month}.pdf", if_none_match)
+
+
+@router.get("/payment-receipt/{payment_id}")
+def get_payment_receipt(
+        payment_id: str,
+        if_none_match: Optional[str] = Header(None),
+        store=Depends(get_store),
+        current_user=Depends(role_required("admin"))
+):
+    """Receipt of one student payment, as a PDF."""
+    try:
+        object_id = ObjectId(payment_id)
+    except (InvalidId, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid payment ID")
+    document = Statements.payment_receipt(store, object_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail="Payment not found")
+    return pdf_response(store, document, f"receipt_{payment_id}.pdf", if_none_match)
+
+
+# ---------- Jobs ----------
+
+def _job_out(job: dict) -> dict:
+    out = {key: job.get(key) for key in ("type", "params", "status", "progress", "attempts", "created_at",
+                                         "started_at", "finished_at", "error", "result")}
+    out["id"] = job["_id"]
+    if job.get("artifact"):
+        out["artifact"] = {**job["artifact"], "url": f"/reports/jobs/{job['_id']}/artifact"}
+    return out
+
+
+@router.post("/jobs", response_model=dict, status_code=202)
+def create_report_job(
+        request: JobRequest,
+        store=Depends(get_store),
+        current_user=Depends(role_required("admin"))
+):
+    """
+    Queue a report job (trends, teacher_statements, lessons_export, lesson_conflicts); identical requests share
+    one job. A finished job is only reused while the payroll of every month it covers is closed.
+    """
+    job_type = JOB_TYPES.get(request.type)
+    if job_type is None:
+        raise HTTPException(status_code=400, detail=f"type must be one of {', '.join(JOB_TYPES)}")
+
+    params = job_type.validate(request.params)
+    job, created = ReportJobs.enqueue(store, request.type, params, current_user["username"],
+                                      reuse_done=job_type.final(store, params))
+    if created:
+        job_workers.wake()
+    return {"message": "Report job queued" if created else "An identical report job already exists",
+            "deduplicated": not created, "job": _job_out(job)}
+
+
+@router.get("/jobs/{job_id}", response_model=dict)
+def get_report_job(
+        job_id: str,
+        store=Depends(get_store),
+        current_user=Depends(role_required("admin"))
+):
+    """Status, progress and (once done) result of a report job."""
+    job = ReportJobs.get(store, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    return _job_out(job)
+
+
+@router.get("/jobs/{job_id}/artifact")
+def get_report_job_artifact(
+        job_id: str,
+        store=Depends(get_store),
+        current_user=Depends(role_required("admin"))
+):
+    """Download the file produced by a finished job."""
+    artifact = ReportJobs.artifact(store, job_id)
+    if artifact is None:
+        raise HTTPException(status_code=404, detail="No file for this job (not finished, or expired)")
+    return Response(artifact["data"], media_type=artifact["media_type"],
+                    headers={"Content-Disposition": _attachment(artifact["filename"])})
@@ -0,0 +1,26 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app.core.dependencies import get_store, role_required
+from app.core.metrics import metrics
+from app.core.search import SEARCH_KINDS, search_indexes
+
+router = APIRouter()
+
+
+@router.get("", response_model=dict)
+def search(
+        q: str = Query(..., min_length=1, description="Name, alias, parent name, phone or teacher username"),
+        kinds: Optional[List[str]] = Query(None, alias="type", description="student, teacher or contact"),
+        limit: int = Query(20, ge=1, le=100),
+        store=Depends(get_store),
+        current_user=Depends(role_required("admin"))
+):
+    """Typo-tolerant search across students, teachers and booking contacts."""
+    if kinds and not set(kinds) <= set(SEARCH_KINDS):
+        raise HTTPException(status_code=400, detail=f"type must be one of {', '.join(SEARCH_KINDS)}")
+
+    metrics.incr("search_queries")
+    results = search_indexes.get(store).search(q, limit=limit, kinds=kinds)
+    return {"query": q, "results": results}
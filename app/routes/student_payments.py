@@ -2,7 +2,9 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from datetime import datetime
 from bson import ObjectId
 
-from app.core.dependencies import get_student_payments_collection, role_required
+from app.core.dependencies import get_student_payments_repository, role_required, get_students_repository
+from app.models.student import Student
+from app.schemas.responses import PaymentsResponse
 
 router = APIRouter()
 
@@ -12,7 +14,8 @@ def add_student_payment(
     name: str = Query(...),
     cost: int = Query(...),
     date: str = Query(...),
-    payments_collection=Depends(get_student_payments_collection),
+    payments_repository=Depends(get_student_payments_repository),
+    students_repository=Depends(get_students_repository),
     current_user=Depends(role_required("admin"))
 ):
     """Add a student payment."""
@@ -25,16 +28,17 @@ def add_student_payment(
         "name": name.strip(),
         "cost": cost,
         "date": date,
+        "student_ids": Student.ids_for(name, students_repository),
     }
 
-    result = payments_collection.insert_one(payment)
-    return {"message": "✅ Payment added successfully", "payment_id": str(result.inserted_id)}
+    payment_id = payments_repository.insert_one(payment)
+    return {"message": "✅ Payment added successfully", "payment_id": str(payment_id)}
 
 
-@router.get("/", response_model=dict)
+@router.get("/", response_model=PaymentsResponse, response_model_exclude_unset=True)
 def get_payments_by_month(
     month: str = Query(..., description="Month in YYYY-MM"),
-    payments_collection=Depends(get_student_payments_collection),
+    payments_repository=Depends(get_student_payments_repository),
     current_user=Depends(role_required("admin"))
 ):
     """Get all student payments for a specific month."""
@@ -43,11 +47,8 @@ def get_payments_by_month(
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid month format. Use YYYY-MM")
 
-    payments = list(payments_collection.find({
+    payments = list(payments_repository.find({
         "date": {"$regex": f"^{month}"}
     }))
 
-    for p in payments:
-        p["_id"] = str(p["_id"])
-
     return {"payments": payments}
@@ -0,0 +1,106 @@
+import re
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel
+
+from app.core.dependencies import get_store, get_students_repository, role_required
+from app.models.student import Student
+from app.utils.text import normalize_name
+
+router = APIRouter()
+
+
+class AliasRequest(BaseModel):
+    alias: str
+
+
+def parse_student_id(student_id: str) -> ObjectId:
+    try:
+        return ObjectId(student_id)
+    except (InvalidId, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid student ID")
+
+
+def _student_out(student: dict) -> dict:
+    return {"id": str(student["_id"]), "name": student["name"], "keys": student["keys"]}
+
+
+@router.get("/", response_model=dict)
+def list_students(
+        q: str = Query("", description="Name prefix (normalized like stored names)"),
+        limit: int = Query(50, ge=1, le=500),
+        students_repository=Depends(get_students_repository),
+        current_user=Depends(role_required("admin"))
+):
+    """List students, optionally by name/alias prefix. Anchored prefixes use the `keys` index."""
+    query = {}
+    key = normalize_name(q)
+    if key:
+        query["keys"] = {"$regex": f"^{re.escape(key)}"}
+    students = students_repository.find(query, {"name": 1, "keys": 1}, sort="name", limit=limit)
+    return {"students": [_student_out(student) for student in students]}
+
+
+@router.get("/{student_id}/history", response_model=dict)
+def get_student_history(
+        student_id: str,
+        store=Depends(get_store),
+        current_user=Depends(role_required("admin"))
+):
+    """All individual and group lessons of a student."""
+    object_id = parse_student_id(student_id)
+    student = store["Students"].find_one({"_id": object_id})
+    if not student:
+        raise HTTPException(status_code=404, detail="Student not found")
+
+    lessons = Student.history(object_id, store)
+    for lesson in lessons:
+        lesson["_id"] = str(lesson["_id"])
+    return {"student": _student_out(student), "lessons": lessons}
+
+
+@router.post("/{student_id}/aliases", response_model=dict)
+def add_student_alias(
+        student_id: str,
+        request: AliasRequest,
+        students_repository=Depends(get_students_repository),
+        current_user=Depends(role_required("admin"))
+):
+    """Register another spelling of a student's name."""
+    result = Student.add_alias(parse_student_id(student_id), request.alias, students_repository)
+    if "error" in result:
+        status_code = 404 if result["error"] == "Student not found" else 409
+        raise HTTPException(status_code=status_code, detail=result["error"])
+    return result
+
+
+@router.post("/{student_id}/merge/{duplicate_id}", response_model=dict)
+def merge_students(
+        student_id: str,
+        duplicate_id: str,
+        store=Depends(get_store),
+        current_user=Depends(role_required("admin"))
+):
+    """Merge a duplicate student into `student_id`; lessons, bookings and payments follow."""
+    target_id, source_id = parse_student_id(student_id), parse_student_id(duplicate_id)
+    if target_id == source_id:
+        raise HTTPException(status_code=400, detail="Cannot merge a student into itself")
+    if not store["Students"].find_one({"_id": target_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Student not found")
+
+    result = Student.merge(source_id, target_id, store)
+    if "error" in result:
+        raise HTTPException(status_code=404, detail=result["error"])
+    return result
+
+
+@router.post("/backfill", response_model=dict)
+def backfill_students(
+        batch_size: int = Query(500, ge=1, le=5000),
+        store=Depends(get_store),
+        current_user=Depends(role_required("admin"))
+):
+    """Resolve `student_ids` for documents written before the directory existed."""
+    return {"message": "Backfill complete", "updated": Student.backfill(store, batch_size=batch_size)}
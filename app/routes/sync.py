@@ -0,0 +1,27 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app.core.config import config
+from app.core.dependencies import get_store, role_required
+from app.models.sync import Sync
+
+router = APIRouter()
+
+
+@router.get("", response_model=dict)
+def sync_lessons(
+        since: Optional[str] = Query(None, description="Token from the previous sync; omit for a full sync"),
+        limit: int = Query(config.SYNC_PAGE_SIZE, ge=1, le=config.SYNC_PAGE_SIZE),
+        store=Depends(get_store),
+        current_user=Depends(role_required("teacher"))
+):
+    """
+    The teacher's lessons changed and deleted since `since`, for the offline mobile app.
+    Call again with the returned token while `has_more` is true. `full` means the client must replace
+    its local copy (no token, or one older than the tombstone retention).
+    """
+    try:
+        return Sync.changes(store, current_user["username"], since, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,8 +1,24 @@
 from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo.errors import DuplicateKeyError
 from fastapi import APIRouter, Depends, HTTPException, Query
-from app.core.dependencies import get_individual_lessons_collection, role_required, get_current_authenticated_user, get_users_collection
-from app.schemas.Lesson import IndividualLessonBase
-from datetime import datetime
+from pydantic import TypeAdapter, ValidationError
+from app.core.dependencies import get_individual_lessons_repository, role_required, get_current_authenticated_user, get_users_repository, \
+    get_reporting_individual_lessons_repository, get_students_repository, get_reporting_store
+from app.core.analytics import lesson_snapshots
+from app.core.config import config
+from app.core.idempotency import idempotent
+from app.core.tenancy import get_branch
+from app.models.lesson_archive import LessonArchive
+from app.models.lesson_conflicts import CONFLICT_PROJECTION, CONTENT_FIELDS, LESSON_TYPES, LessonConflicts
+from app.models.student import Student
+from app.models.sync import Sync
+from app.schemas.Lesson import GroupLessonBase, IndividualLessonBase
+from app.schemas.responses import PendingLessonsResponse, ApprovedLessonsResponse, TeacherLessonStatsResponse
+from app.utils.cache import TTLCache
+from datetime import datetime, timedelta
+from typing import Optional
+from app.utils.date_utils import date_range_filter, parse_month
 
 router = APIRouter()
 
@@ -10,56 +26,180 @@ router = APIRouter()
 @router.post("/submit", response_model=dict)
 def submit_lesson(
         lesson: IndividualLessonBase,
-        lessons_collection=Depends(get_individual_lessons_collection),
-        current_user=Depends(role_required("teacher"))
+        lessons_repository=Depends(get_individual_lessons_repository),
+        students_repository=Depends(get_students_repository),
+        current_user=Depends(role_required("teacher")),
+        idempotency=Depends(idempotent("teacher_submit"))
 ):
-    """Submit a new lesson (Pending Approval)."""
-    lesson_data = lesson.dict()
-    lesson_data["teacher_name"] = current_user["username"]
-    lesson_data["approved"] = False
-
-    inserted = lessons_collection.insert_one(lesson_data)
-
-    return {"message": "Lesson submitted successfully, pending approval", "lesson_id": str(inserted.inserted_id)}
+    """Submit a new lesson (Pending Approval). Retries with the same Idempotency-Key return the first response."""
+    def create():
+        lesson_data = lesson.dict()
+        lesson_data["teacher_name"] = current_user["username"]
+        lesson_data["approved"] = False
+        lesson_data["version"] = 1
+        lesson_data["updated_at"] = Sync.now()
+        lesson_data["student_ids"] = Student.ids_for(lesson_data["student_name"], students_repository)
+
+        inserted_id = insert_lesson(lessons_repository, "individual", lesson_data)
+
+        return {"message": "Lesson submitted successfully, pending approval", "lesson_id": str(inserted_id)}
+
+    return idempotency.run(create, caller=current_user["username"])
+
+
+# Levels the teacher dashboards break hours down by
+EDUCATION_LEVELS = ["ابتدائي", "إعدادي", "ثانوي"]
+
+# Fields a teacher may never set through an edit
+PROTECTED_LESSON_FIELDS = ("_id", "approved", "teacher_name", "version", "student_ids", "updated_at", "content_hash")
+
+
+# Submit schemas; edits validate the fields they change with the same types (e.g. `date` stays a datetime)
+LESSON_SCHEMAS = {"individual": IndividualLessonBase, "group": GroupLessonBase}
+_FIELD_ADAPTERS = {lesson_type: {name: TypeAdapter(field.annotation) for name, field in schema.model_fields.items()}
+                   for lesson_type, schema in LESSON_SCHEMAS.items()}
+
+
+def parse_lesson_updates(lesson_type: str, updates: dict) -> dict:
+    """Validate and convert edited lesson fields as submit does; 422 on invalid values."""
+    adapters = _FIELD_ADAPTERS[lesson_type]
+    parsed, errors = {}, []
+    for field, value in updates.items():
+        if field not in adapters:
+            parsed[field] = value
+            continue
+        try:
+            parsed[field] = adapters[field].validate_python(value)
+        except ValidationError as e:
+            errors += [{**error, "loc": ["body", field, *error["loc"]]}
+                       for error in e.errors(include_url=False, include_context=False)]
+    if errors:
+        raise HTTPException(status_code=422, detail=errors)
+    return parsed
+
+
+def reject_conflicts(store, lesson_type: str, lesson: dict, exclude_id=None):
+    """Raise 409 when the lesson duplicates, or overlaps in time, another lesson of the same teacher."""
+    conflicts = LessonConflicts.find(store, lesson_type, lesson, exclude_id)
+    if conflicts["duplicates"]:
+        raise HTTPException(status_code=409, detail={"message": "This lesson was already submitted", **conflicts})
+    if conflicts["overlaps"]:
+        raise HTTPException(status_code=409, detail={"message": "The lesson overlaps another lesson of yours", **conflicts})
+
+
+def insert_lesson(lessons_repository, lesson_type: str, lesson_data: dict):
+    """Insert a submitted lesson after the conflict check; the unique content_hash index closes the race."""
+    reject_conflicts(lessons_repository.store, lesson_type, lesson_data)
+    lesson_data["content_hash"] = LessonConflicts.content_hash(lesson_type, lesson_data)
+    try:
+        return lessons_repository.insert_one(lesson_data)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail={"message": "This lesson was already submitted",
+                                                     **LessonConflicts.find(lessons_repository.store, lesson_type, lesson_data)})
+
+
+def version_predicate(version: int):
+    """Match a lesson at `version`; lessons stored before versioning count as version 0."""
+    return {"$in": [0, None]} if version == 0 else version
+
+
+def update_pending_lesson(lessons_repository, lesson_id: str, current_user, lesson_updates: dict, students_repository):
+    """
+    Compare-and-set edit of the teacher's own pending lesson in a single round trip.
+    If the body carries `version`, the edit only applies to that version.
+    Raises 409 when the lesson was approved or changed concurrently.
+    """
+    try:
+        lesson_object_id = ObjectId(lesson_id)
+    except InvalidId:
+        raise HTTPException(status_code=400, detail="Invalid lesson_id")
+
+    expected_version = lesson_updates.get("version")
+    updates = {k: v for k, v in lesson_updates.items() if k not in PROTECTED_LESSON_FIELDS}
+    if not updates:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    lesson_type = LESSON_TYPES[lessons_repository.name]
+    updates = parse_lesson_updates(lesson_type, updates)
+
+    for name_field in ("student_name", "student_names"):
+        if name_field in updates:
+            updates["student_ids"] = Student.ids_for(updates[name_field], students_repository)
+
+    query = {"_id": lesson_object_id, "teacher_name": current_user["username"], "approved": False}
+    if expected_version is not None:
+        query["version"] = version_predicate(expected_version)
+
+    if any(field in updates for field in CONTENT_FIELDS):
+        current = lessons_repository.find_one(query, {**CONFLICT_PROJECTION, "version": 1})
+        if current is not None:
+            # Check the edited lesson, and only apply the edit to the version checked
+            edited = {**current, **updates}
+            reject_conflicts(lessons_repository.store, lesson_type, edited, exclude_id=lesson_object_id)
+            updates["content_hash"] = LessonConflicts.content_hash(lesson_type, edited)
+            query["version"] = version_predicate(current.get("version") or 0)
+
+    try:
+        updated = lessons_repository.find_one_and_update(
+            query,
+            Sync.touch({"$set": updates, "$inc": {"version": 1}}),
+            projection={"version": 1},
+            return_new=True,
+        )
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="This lesson was already submitted")
+    if updated:
+        return updated["version"]
+
+    # Failure path only: tell "missing" apart from "lost the race"
+    if not lessons_repository.find_one({"_id": lesson_object_id, "teacher_name": current_user["username"]}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Lesson not found or not authorized to update")
+    raise HTTPException(status_code=409, detail="Lesson was approved or modified by someone else. Reload and try again.")
 
 
-def fetch_lessons(lessons_collection, current_user, approved_status):
-    """Helper function to fetch lessons based on approval status."""
-    return [
-        {**lesson, "_id": str(lesson["_id"])}
-        for lesson in lessons_collection.find({"teacher_name": current_user["username"], "approved": approved_status})
-    ]
+def fetch_lessons(lessons_repository, current_user, approved_status, since: Optional[str] = None):
+    """
+    Helper function to fetch lessons based on approval status.
+    Approved lessons include archived months unless `since` (YYYY-MM) starts inside the hot window.
+    """
+    query = {"teacher_name": current_user["username"], "approved": approved_status}
+    if not approved_status:
+        return lessons_repository.find(query)  # pending lessons are never archived
+    start = parse_month(since) if since else None
+    return LessonArchive.find(lessons_repository, {**query, **date_range_filter(start, None)}, since=start)
 
 
-@router.get("/pending-lessons", response_model=dict)
+@router.get("/pending-lessons", response_model=PendingLessonsResponse, response_model_exclude_unset=True)
 def get_pending_lessons(
-        lessons_collection=Depends(get_individual_lessons_collection),
+        lessons_repository=Depends(get_individual_lessons_repository),
         current_user=Depends(role_required("teacher"))
 ):
     """Retrieve all pending lessons for the authenticated teacher."""
-    return {"message": "Pending lessons retrieved successfully", "pending_lessons": fetch_lessons(lessons_collection, current_user, False)}
+    return {"message": "Pending lessons retrieved successfully", "pending_lessons": fetch_lessons(lessons_repository, current_user, False)}
 
 
-@router.get("/approved-lessons", response_model=dict)
+@router.get("/approved-lessons", response_model=ApprovedLessonsResponse, response_model_exclude_unset=True)
 def get_approved_lessons(
-        lessons_collection=Depends(get_individual_lessons_collection),
+        since: Optional[str] = Query(None, description="Only lessons from this month (YYYY-MM) on"),
+        lessons_repository=Depends(get_reporting_individual_lessons_repository),
         current_user=Depends(role_required("teacher"))
 ):
     """Retrieve all approved lessons for the authenticated teacher."""
-    return {"message": "Approved lessons retrieved successfully", "approved_lessons": fetch_lessons(lessons_collection, current_user, True)}
+    return {"message": "Approved lessons retrieved successfully",
+            "approved_lessons": fetch_lessons(lessons_repository, current_user, True, since)}
 
 
 @router.delete("/delete-lesson/{lesson_id}", response_model=dict)
 def delete_lesson(
         lesson_id: str,
-        lessons_collection=Depends(get_individual_lessons_collection),
+        lessons_repository=Depends(get_individual_lessons_repository),
         current_user=Depends(role_required("teacher"))
 ):
     """Delete a lesson (Only for the lesson owner)."""
-    result = lessons_collection.delete_one({"_id": ObjectId(lesson_id), "teacher_name": current_user["username"], "approved": False})
+    deleted_count = lessons_repository.delete_one({"_id": ObjectId(lesson_id), "teacher_name": current_user["username"], "approved": False})
 
-    if result.deleted_count == 0:
+    if deleted_count == 0:
         raise HTTPException(status_code=404, detail="Lesson not found or not authorized to delete")
+    Sync.tombstone(lessons_repository.store, lessons_repository.name, ObjectId(lesson_id), current_user["username"])
 
     return {"message": "Lesson deleted successfully"}
 
@@ -68,103 +208,124 @@ def delete_lesson(
 def update_lesson(
         lesson_id: str,
         lesson_updates: dict,
-        lessons_collection=Depends(get_individual_lessons_collection),
+        lessons_repository=Depends(get_individual_lessons_repository),
+        students_repository=Depends(get_students_repository),
         current_user=Depends(role_required("teacher"))
 ):
-    """Update a lesson's details (Only for the lesson owner)."""
-    lesson = lessons_collection.find_one({"_id": ObjectId(lesson_id), "teacher_name": current_user["username"], "approved": False})
-
-    if not lesson:
-        raise HTTPException(status_code=404, detail="Lesson not found or not authorized to update")
-
-    if "_id" in lesson_updates:
-        del lesson_updates["_id"]
+    """Update a lesson's details (Only for the lesson owner, while pending)."""
+    version = update_pending_lesson(lessons_repository, lesson_id, current_user, lesson_updates, students_repository)
 
-    lessons_collection.update_one({"_id": ObjectId(lesson_id)}, {"$set": lesson_updates})
+    return {"message": "Lesson updated successfully", "version": version}
 
-    return {"message": "Lesson updated successfully"}
 
 
-
-@router.get("/teacher-individual-stats", response_model=dict)
+@router.get("/teacher-individual-stats", response_model=TeacherLessonStatsResponse)
 def get_teacher_individual_stats(
         month: int = Query(None, description="Filter lessons by month (1-12)"),
-        lessons_collection=Depends(get_individual_lessons_collection),
+        store=Depends(get_reporting_store),
         current_user=Depends(role_required("teacher"))
 ):
     """Retrieve statistics for the authenticated teacher's individual lessons."""
     print(f"📊 Fetching individual lesson stats for: {current_user['username']} | Month: {month}")
 
-    # ✅ Fetch necessary fields
-    projection = {"hours": 1, "education_level": 1, "date": 1}
-    lessons = list(
-        lessons_collection.find({"teacher_name": current_user["username"], "approved": True}, projection)
-    )
-
-    # ✅ Extract month safely
-    def get_month(lesson):
-        date_value = lesson.get("date")
-        if isinstance(date_value, str):
-            try:
-                return datetime.fromisoformat(date_value).month
-            except ValueError:
-                return None
-        elif isinstance(date_value, datetime):
-            return date_value.month
-        return None
-
-    # ✅ Filter by month if provided
+    where = {"teacher": current_user["username"], "lesson_type": "individual"}
     if month:
-        lessons = [lesson for lesson in lessons if get_month(lesson) == month]
-
-    # ✅ Calculate statistics
-    total_lessons = len(lessons)
-    total_hours = sum(lesson.get("hours", 0) for lesson in lessons)
+        where["month_of_year"] = month  # that month of every year
 
-    # ✅ Define education levels
-    education_levels = ["ابتدائي", "إعدادي", "ثانوي"]
-
-    # ✅ Calculate hours by education level
-    def calculate_hours_by_level(lessons):
-        return {
-            level: sum(lesson["hours"] for lesson in lessons if lesson.get("education_level") == level)
-            for level in education_levels
-        }
+    snapshot = lesson_snapshots.get(store)
+    total_lessons = snapshot.group_sum(metric="lessons", **where)[()]
+    hours_by_level = snapshot.group_sum(("level",), **where)
 
     return {
         "message": "Teacher individual lesson stats retrieved successfully",
         "total_lessons": total_lessons,
-        "total_hours": total_hours,
-        "hours_by_education_level": calculate_hours_by_level(lessons)
+        "total_hours": sum(hours_by_level.values()),
+        "hours_by_education_level": {level: hours_by_level.get((level,), 0) for level in EDUCATION_LEVELS}
     }
 
 
+# Birthday results only change at midnight, so they are cached per local day; routes that add a user with a
+# birthday or change a role clear the cache.
+birthdays_cache = TTLCache()
+
+
+def _local_tz():
+    from pytz import timezone  # deferred: pytz loads its zone database on import
+    return timezone(config.TIMEZONE)
+
+
+def _local_now() -> datetime:
+    return datetime.now(_local_tz())
+
+
+def _next_local_midnight(now: datetime) -> datetime:
+    return _local_tz().localize(datetime.combine(now.date() + timedelta(days=1), datetime.min.time()))
+
+
+def _birthday_entry(teacher: dict) -> dict:
+    return {"_id": str(teacher["_id"]), "name": teacher["username"], "birthday": teacher["birthday_md"]}
+
 
 @router.get("/teachers-birthdays", response_model=dict)
-def get_teachers_birthdays(teachers_collection=Depends(get_users_collection)):
+def get_teachers_birthdays(branch: str = Depends(get_branch), teachers_repository=Depends(get_users_repository)):
     """Retrieve only the teachers who have a birthday today."""
-
-    today = datetime.today().strftime("%m-%d")  # Get today's month and day (MM-DD)
-
-    # Fetch teachers with `birthday` field
-    teachers = list(teachers_collection.find({}, {"_id": 1, "username": 1, "birthday": 1}))
-
-    today_birthdays = []
-    for teacher in teachers:
-        if "birthday" in teacher and teacher["birthday"]:  # Ensure field exists
-            try:
-                # Convert "YYYY-MM-DD" to "MM-DD" and check if it's today
-                birth_month_day = datetime.strptime(teacher["birthday"], "%Y-%m-%d").strftime("%m-%d")
-                if birth_month_day == today:
-                    today_birthdays.append({
-                        "_id": str(teacher["_id"]),
-                        "name": teacher["username"],
-                        "birthday": birth_month_day
-                    })
-            except ValueError:
-                continue  # Skip invalid dates
+    now = _local_now()
+    today = now.strftime("%m-%d")
+    cache_key = (branch, "today", now.date())
+
+    today_birthdays = birthdays_cache.get(cache_key)
+    if today_birthdays is None:
+        teachers = teachers_repository.find(
+            {"role": "teacher", "birthday_md": today},
+            {"_id": 1, "username": 1, "birthday_md": 1}
+        )
+        today_birthdays = [_birthday_entry(teacher) for teacher in teachers]
+        birthdays_cache.set(cache_key, today_birthdays, expires_at=_next_local_midnight(now))
 
     return {
         "message": "Today's teachers' birthdays retrieved successfully",
         "birthdays": today_birthdays
-    }
\ No newline at end of file
+    }
+
+
+@router.get("/teachers-birthdays/upcoming", response_model=dict)
+def get_upcoming_teachers_birthdays(
+        days: int = Query(7, ge=0, le=366, description="Look-ahead window in days (0 = today only)"),
+        branch: str = Depends(get_branch),
+        teachers_repository=Depends(get_users_repository)
+):
+    """Retrieve teachers whose birthday falls within the next `days` days, soonest first."""
+    now = _local_now()
+    cache_key = (branch, "upcoming", now.date(), days)
+
+    upcoming = birthdays_cache.get(cache_key)
+    if upcoming is None:
+        start_md = now.strftime("%m-%d")
+        end_md = (now + timedelta(days=days)).strftime("%m-%d")
+
+        if days >= 365:
+            md_filter = {"$ne": None}
+        elif start_md <= end_md:
+            md_filter = {"$gte": start_md, "$lte": end_md}
+        else:
+            md_filter = None  # Window wraps past Dec 31
+
+        query = {"role": "teacher"}
+        if md_filter is not None:
+            query["birthday_md"] = md_filter
+        else:
+            query["$or"] = [{"birthday_md": {"$gte": start_md}}, {"birthday_md": {"$lte": end_md}}]
+
+        teachers = teachers_repository.find(query, {"_id": 1, "username": 1, "birthday_md": 1})
+        # MM-DD keys at or after today sort first; wrapped keys (next year) after them
+        upcoming = sorted(
+            (_birthday_entry(teacher) for teacher in teachers),
+            key=lambda entry: (entry["birthday"] < start_md, entry["birthday"])
+        )
+        birthdays_cache.set(cache_key, upcoming, expires_at=_next_local_midnight(now))
+
+    return {
+        "message": "Upcoming teachers' birthdays retrieved successfully",
+        "days": days,
+        "birthdays": upcoming
+    }
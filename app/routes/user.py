@@ -1,42 +1,74 @@
-from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends, HTTPException
+import time
+from datetime import timedelta
+from bson import ObjectId
+from fastapi import APIRouter, Depends, HTTPException, Request
 
 from app.core.auth import verify_password, hash_password
 from app.core.config import config
-from app.core.dependencies import get_users_collection
-from app.core.security import create_access_token, create_reset_token, verify_reset_token, generate_token
+from app.core.dependencies import get_users_repository, get_auth_tokens_repository
+from app.core.metrics import metrics
+from app.core.rate_limit import get_login_throttle, client_ip
+from app.core.search import search_indexes
+from app.core.tenancy import get_branch
+from app.core.user_cache import invalidate_user_profile
+from app.core.security import create_access_token
+from app.models.auth_token import AuthToken
 from app.models.base_user import User
 from app.schemas.user import UserBase, Role, UserLogin, ForgotPasswordRequest, ResetPasswordRequest, ResendVerificationRequest
+from app.routes.teacher import birthdays_cache
 from app.utils.email_utils import send_verification_email, send_reset_email
 
 router = APIRouter()
 
 
 @router.post("/signin")
-def signin(user: UserLogin, users_collection=Depends(get_users_collection)):
+def signin(
+        user: UserLogin,
+        request: Request,
+        branch: str = Depends(get_branch),
+        users_repository=Depends(get_users_repository),
+        throttle=Depends(get_login_throttle)
+):
     """Authenticate a user and return a JWT token, only if verified."""
-    existing_user = users_collection.find_one({"username": user.username})
+    ip = client_ip(request)
+    throttle_key = f"{branch}:{user.username}"
+    throttle.check(throttle_key, ip)  # before any DB or bcrypt work
 
-    if not existing_user or not verify_password(user.password, existing_user["password"]):
+    existing_user = users_repository.find_one({"username": user.username}, {"username": 1, "password": 1, "role": 1, "verified": 1, "token_version": 1})
+
+    password_ok = False
+    if existing_user:
+        started = time.perf_counter()
+        password_ok = verify_password(user.password, existing_user["password"])
+        metrics.incr("bcrypt_verifications")
+        metrics.incr("bcrypt_seconds", time.perf_counter() - started)
+
+    if not password_ok:
+        throttle.record_failure(throttle_key, ip)
         raise HTTPException(status_code=400, detail="Invalid username or password")
 
+    throttle.record_success(throttle_key, ip)
+
     if not existing_user.get("verified", False):
         raise HTTPException(status_code=403, detail="Email not verified. Please verify your email before logging in.")
 
-    token = create_access_token({"username": existing_user["username"], "role": existing_user["role"]})
+    token = create_access_token({"username": existing_user["username"], "role": existing_user["role"], "branch": branch,
+                                 "token_version": existing_user.get("token_version", 0)})
 
     return {"message": "Login successful", "access_token": token, "token_type": "bearer"}
 
 
 @router.post("/signup")
-def signup(user: UserBase, users_collection=Depends(get_users_collection)):
+def signup(
+        user: UserBase,
+        branch: str = Depends(get_branch),
+        users_repository=Depends(get_users_repository),
+        tokens_repository=Depends(get_auth_tokens_repository)
+):
     """Register a new user with email verification and expiration."""
-    if users_collection.find_one({"$or": [{"email": user.email}, {"username": user.username}]}):
+    if users_repository.find_one({"$or": [{"email": user.email}, {"username": user.username}]}):
         raise HTTPException(status_code=400, detail="User with this email or username already exists")
 
-    verification_token = generate_token()
-    expiration_time = datetime.utcnow() + timedelta(hours=config.VERIFICATION_EXPIRE_HOURS)
-
     hashed_password = hash_password(user.password.get_secret_value())
 
     new_user = User(
@@ -45,71 +77,103 @@ def signup(user: UserBase, users_collection=Depends(get_users_collection)):
         password=hashed_password,
         role=user.role,
         birthday=user.birthday,
-        verified=False,
-        verification_token=verification_token,
-        verification_expiry=expiration_time
+        verified=False
     )
 
-    new_user.save(users_collection)
-    send_verification_email(user.email, verification_token, user.username)
+    saved = new_user.save(users_repository)
+    verification_token = AuthToken.issue(
+        ObjectId(saved["userId"]), "verify", timedelta(hours=config.VERIFICATION_EXPIRE_HOURS), tokens_repository
+    )
+    if user.birthday:
+        birthdays_cache.clear()
+    if user.role == Role.TEACHER:
+        search_indexes.apply(users_repository.store, lambda index: index.upsert_teacher(user.username))
+    send_verification_email(user.email, verification_token, user.username, branch)
 
     return {"message": "User registered successfully. Please check your email to verify your account."}
 
 
 @router.post("/forgot-password")
-def forgot_password(request: ForgotPasswordRequest, users_collection=Depends(get_users_collection)):
+def forgot_password(
+        request: ForgotPasswordRequest,
+        branch: str = Depends(get_branch),
+        users_repository=Depends(get_users_repository),
+        tokens_repository=Depends(get_auth_tokens_repository)
+):
     """Generate a password reset token and send it via email."""
-    user = users_collection.find_one({"email": request.email})
+    user = users_repository.find_one({"email": request.email}, {"_id": 1, "email": 1, "username": 1})
 
     if not user:
         raise HTTPException(status_code=400, detail="User with this email not found")
 
-    reset_token = create_reset_token(user["email"])
-    send_reset_email(user["email"], reset_token, user["username"])
+    reset_token = AuthToken.issue(
+        user["_id"], "reset", timedelta(minutes=config.RESET_TOKEN_EXPIRE_MINUTES), tokens_repository
+    )
+    send_reset_email(user["email"], reset_token, user["username"], branch)
 
     return {"message": "A password reset link has been sent to your email."}
 
 
 @router.post("/reset-password")
-def reset_password(request: ResetPasswordRequest, users_collection=Depends(get_users_collection)):
+def reset_password(
+        request: ResetPasswordRequest,
+        branch: str = Depends(get_branch),
+        users_repository=Depends(get_users_repository),
+        tokens_repository=Depends(get_auth_tokens_repository)
+):
     """Verify the reset token and allow the user to set a new password."""
-    email = verify_reset_token(request.token)
+    status, token_doc = AuthToken.consume(request.token, "reset", tokens_repository)
 
-    if not email:
+    if status != "ok":
         raise HTTPException(status_code=400, detail="Invalid or expired token")
 
-    if not users_collection.find_one({"email": email}):
+    hashed_password = hash_password(request.new_password)
+    # Bumping token_version signs out every session issued before the reset
+    updated_user = users_repository.find_one_and_update(
+        {"_id": token_doc["user_id"]}, {"$set": {"password": hashed_password}, "$inc": {"token_version": 1}},
+        projection={"username": 1}
+    )
+
+    if not updated_user:
         raise HTTPException(status_code=400, detail="User not found")
 
-    hashed_password = hash_password(request.new_password)
-    users_collection.update_one({"email": email}, {"$set": {"password": hashed_password}})
+    invalidate_user_profile(branch, updated_user["username"])
 
     return {"message": "Password reset successful. You can now log in with your new password."}
 
 
 @router.get("/verify-email")
-def verify_email(token: str, users_collection=Depends(get_users_collection)):
+def verify_email(
+        token: str,
+        users_repository=Depends(get_users_repository),
+        tokens_repository=Depends(get_auth_tokens_repository)
+):
     """Confirm user email verification with expiration check."""
-    user = users_collection.find_one({"verificationToken": token})
+    status, token_doc = AuthToken.consume(token, "verify", tokens_repository)
 
-    if not user:
-        return {"message": "تم التحقق من بريدك الإلكتروني بالفعل. يمكنك تسجيل الدخول."} if users_collection.find_one({"verified": True, "verificationToken": {"$exists": False}}) else HTTPException(status_code=400, detail="Invalid token")
+    if status == "used":
+        return {"message": "تم التحقق من بريدك الإلكتروني بالفعل. يمكنك تسجيل الدخول."}
 
-    if user.get("verificationExpiry") and datetime.utcnow() > user["verificationExpiry"]:
+    if status == "expired":
         raise HTTPException(status_code=400, detail="Verification link has expired. Please request a new one.")
 
-    users_collection.update_one(
-        {"_id": user["_id"]},
-        {"$set": {"verified": True}, "$unset": {"verificationToken": "", "verificationExpiry": ""}}
-    )
+    if status == "invalid":
+        raise HTTPException(status_code=400, detail="Invalid token")
+
+    users_repository.update_one({"_id": token_doc["user_id"]}, {"$set": {"verified": True}})
 
     return {"message": "تم التحقق من بريدك الإلكتروني بنجاح! يمكنك الآن تسجيل الدخول."}
 
 
 @router.post("/resend-verification")
-def resend_verification(request: ResendVerificationRequest, users_collection=Depends(get_users_collection)):
+def resend_verification(
+        request: ResendVerificationRequest,
+        branch: str = Depends(get_branch),
+        users_repository=Depends(get_users_repository),
+        tokens_repository=Depends(get_auth_tokens_repository)
+):
     """Resend a new verification email if the old one expired."""
-    user = users_collection.find_one({"email": request.email})
+    user = users_repository.find_one({"email": request.email}, {"_id": 1, "email": 1, "username": 1, "verified": 1})
 
     if not user:
         raise HTTPException(status_code=400, detail="User not found")
@@ -117,14 +181,10 @@ def resend_verification(request: ResendVerificationRequest, users_collection=Dep
     if user.get("verified"):
         raise HTTPException(status_code=400, detail="User is already verified")
 
-    new_verification_token = generate_token()
-    expiration_time = datetime.utcnow() + timedelta(hours=config.VERIFICATION_EXPIRE_HOURS)
-
-    users_collection.update_one(
-        {"_id": user["_id"]},
-        {"$set": {"verificationToken": new_verification_token, "verificationExpiry": expiration_time}}
+    new_verification_token = AuthToken.issue(
+        user["_id"], "verify", timedelta(hours=config.VERIFICATION_EXPIRE_HOURS), tokens_repository
     )
 
-    send_verification_email(user["email"], new_verification_token, user["username"])
+    send_verification_email(user["email"], new_verification_token, user["username"], branch)
 
     return {"message": "A new verification link has been sent to your email."}
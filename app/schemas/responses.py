@@ -0,0 +1,154 @@
+from datetime import datetime
+from typing import Annotated, Any, Dict, List, Optional, Union
+
+from bson import ObjectId
+from pydantic import BaseModel, BeforeValidator, ConfigDict, Field
+
+# Response schemas for the hot read endpoints.
+# Routes return raw Mongo documents; these models convert ObjectId/datetime once, in pydantic-core,
+# instead of per-document Python loops plus jsonable_encoder. Routes declare them with
+# `response_model_exclude_unset=True` so fields absent from a document stay absent in the JSON.
+
+
+def _object_id_to_str(value: Any) -> Any:
+    return str(value) if isinstance(value, ObjectId) else value
+
+
+def _to_day(value: Any) -> Any:
+    """ Render datetimes and ISO strings as YYYY-MM-DD (the admin listing format). """
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d")
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value).strftime("%Y-%m-%d")
+        except ValueError:
+            return value
+    return value
+
+
+ObjectIdStr = Annotated[str, BeforeValidator(_object_id_to_str)]
+Number = Union[int, float]  # keeps ints as ints in the JSON output
+DayStr = Annotated[str, BeforeValidator(_to_day)]
+
+
+class MongoModel(BaseModel):
+    model_config = ConfigDict(populate_by_name=True, extra="ignore")
+
+    id: ObjectIdStr = Field(alias="_id")
+
+
+# ---------- Lessons ----------
+
+class LessonOut(MongoModel):
+    date: Optional[Union[datetime, str]] = None
+    teacher_name: Optional[str] = None
+    student_name: Optional[str] = None
+    student_names: Optional[List[str]] = None
+    hours: Optional[Number] = None
+    subject: Optional[str] = None
+    education_level: Optional[str] = None
+    approved: Optional[bool] = None
+    lesson_type: Optional[str] = None
+    version: Optional[int] = None
+
+
+class AdminLessonOut(LessonOut):
+    date: Optional[DayStr] = None
+
+
+class PendingLessonsResponse(BaseModel):
+    message: str
+    pending_lessons: List[LessonOut]
+
+
+class ApprovedLessonsResponse(BaseModel):
+    message: str
+    approved_lessons: List[LessonOut]
+
+
+class AdminPendingLessonsResponse(BaseModel):
+    message: str
+    pending_lessons: List[AdminLessonOut]
+
+
+class AdminApprovedLessonsResponse(BaseModel):
+    message: str
+    approved_lessons: List[AdminLessonOut]
+
+
+# ---------- Bookings ----------
+
+class BookingOut(MongoModel):
+    parentName: Optional[str] = None
+    phone: Optional[str] = None
+    subject: Optional[str] = None
+    ageLevel: Optional[str] = None
+    lessonDate: Optional[str] = None
+    lessonTime: Optional[str] = None
+    hours: Optional[Number] = None
+    notes: Optional[str] = None
+    lessonType: Optional[str] = None
+    students: Optional[List[str]] = None
+    status: Optional[str] = None
+    bookingDate: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+
+class BookingStatusResponse(BaseModel):
+    message: str
+    booking: BookingOut
+
+
+# ---------- Payments ----------
+
+class PaymentOut(MongoModel):
+    name: Optional[str] = None
+    cost: Optional[Number] = None
+    date: Optional[str] = None
+
+
+class PaymentsResponse(BaseModel):
+    payments: List[PaymentOut]
+
+
+# ---------- Stats ----------
+
+class StudentStat(BaseModel):
+    student_id: Optional[str] = None
+    student_name: str
+    total_individual_hours: Number
+    total_group_hours: Number
+    education_level: str
+
+
+class StudentStatsResponse(BaseModel):
+    message: str
+    students: List[StudentStat]
+
+
+class TeacherStat(BaseModel):
+    teacher_name: str
+    total_individual_hours: Number
+    total_group_hours: Number
+    individual_hours_by_education_level: Dict[str, Number]
+    group_hours_by_education_level: Dict[str, Number]
+
+
+class TeacherStatsResponse(BaseModel):
+    message: str
+    teachers: List[TeacherStat]
+
+
+class TeacherLessonStatsResponse(BaseModel):
+    message: str
+    total_lessons: int
+    total_hours: Number
+    hours_by_education_level: Dict[str, Number]
+
+
+class DashboardOverviewResponse(BaseModel):
+    message: str
+    total_lessons: int
+    total_hours: Number
+    individual_hours_by_level: Dict[str, Number]
+    group_hours_by_level: Dict[str, Number]
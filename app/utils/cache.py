@@ -0,0 +1,71 @@
+import threading
+import time
+from datetime import datetime
+from typing import Any, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Small thread-safe in-process cache with per-entry expiry.
+    Entries expire either after `ttl` seconds or at an absolute `expires_at` datetime.
+    Hit/miss counters are kept so cache effectiveness can be measured.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, ttl: Optional[float] = None, max_size: int = 10_000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._data = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """ Return the cached value for `key`, or `default` if missing/expired. """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, self._MISSING)
+            if entry is not self._MISSING:
+                value, deadline = entry
+                if deadline is None or deadline > now:
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None,
+            expires_at: Optional[datetime] = None) -> None:
+        """ Store `value`; `expires_at` (aware datetime) takes precedence over `ttl`. """
+        if expires_at is not None:
+            ttl = max((expires_at - datetime.now(expires_at.tzinfo)).total_seconds(), 0)
+        elif ttl is None:
+            ttl = self.ttl
+        deadline = time.monotonic() + ttl if ttl is not None else None
+
+        with self._lock:
+            if len(self._data) >= self.max_size and key not in self._data:
+                self._data.pop(next(iter(self._data)))
+            self._data[key] = (value, deadline)
+
+    def invalidate(self, key: Hashable) -> None:
+        """ Drop a single entry. """
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """ Drop every entry. """
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        """ Return size and hit/miss counters. """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
@@ -0,0 +1,57 @@
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+
+
+def parse_month(month: str) -> datetime:
+    """ Validate a YYYY-MM string and return the first instant of that month (400 otherwise). """
+    try:
+        return datetime.strptime(month, "%Y-%m")
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid month format. Use YYYY-MM")
+
+
+def add_months(month_start: datetime, months: int) -> datetime:
+    """ Shift a first-of-month datetime by a number of months. """
+    index = month_start.year * 12 + month_start.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def month_bounds(month: str) -> Tuple[datetime, datetime]:
+    """ [start, end) datetimes of a YYYY-MM month. """
+    start = parse_month(month)
+    return start, add_months(start, 1)
+
+
+def date_range_filter(start: Optional[datetime], end: Optional[datetime], field: str = "date") -> dict:
+    """
+    Index-friendly filter for `start <= field < end` (either bound may be None).
+    Lesson dates are BSON dates, but older documents store ISO strings, so both forms are matched
+    with plain range predicates (ISO strings sort chronologically).
+    """
+    if start is None and end is None:
+        return {}
+    as_dates, as_strings = {}, {}
+    if start is not None:
+        as_dates["$gte"], as_strings["$gte"] = start, start.strftime("%Y-%m-%d")
+    if end is not None:
+        as_dates["$lt"], as_strings["$lt"] = end, end.strftime("%Y-%m-%d")
+    return {"$or": [{field: as_dates}, {field: as_strings}]}
+
+
+def month_filter(month: str, field: str = "date") -> dict:
+    """ date_range_filter for one YYYY-MM month. """
+    return date_range_filter(*month_bounds(month), field=field)
+
+
+def month_of(value) -> Optional[str]:
+    """ YYYY-MM of a stored lesson date (datetime or ISO string), or None if unparseable. """
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m")
+    if isinstance(value, str) and len(value) >= 7:
+        try:
+            return datetime.strptime(value[:7], "%Y-%m").strftime("%Y-%m")
+        except ValueError:
+            return None
+    return None
@@ -1,16 +1,13 @@
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import os
-from dotenv import load_dotenv
-import random
-import string
-
 from app.core.config import config
 
 
 def send_email(subject: str, body: str, to_email: str):
     """Generic function to send an email."""
+    # Imported on first send: the mail stack is not needed to start the app
+    import smtplib
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+
     sender_email = config.EMAIL_USER
     password = config.EMAIL_PASSWORD
 
@@ -29,12 +26,17 @@ def send_email(subject: str, body: str, to_email: str):
         print(f"Error sending email: {str(e)}")
 
 
-def send_verification_email(to_email: str, token: str, name: str):
+def _branch_param(branch: str) -> str:
+    """Query suffix routing an emailed link to a non-default branch."""
+    return "" if not branch or branch == config.DEFAULT_BRANCH else f"&branch={branch}"
+
+
+def send_verification_email(to_email: str, token: str, name: str, branch: str = None):
     """Send an email verification link after user signup."""
     subject = "Verify Your Account"
 
-    verification_link = f"al-maram.com/verify-email?token={token}"
-    resend_link = f"al-maram.com/ResendVerification?email={to_email}"
+    verification_link = f"al-maram.com/verify-email?token={token}{_branch_param(branch)}"
+    resend_link = f"al-maram.com/ResendVerification?email={to_email}{_branch_param(branch)}"
 
     body = f"""
     Dear {name},
@@ -58,7 +60,7 @@ def send_verification_email(to_email: str, token: str, name: str):
     send_email(subject, body, to_email)
 
 
-def send_reset_email(to_email: str, token: str, name: str):
+def send_reset_email(to_email: str, token: str, name: str, branch: str = None):
     """Send a password reset link via email."""
     subject = "Password Reset Request"
     body = f"""
@@ -66,7 +68,7 @@ def send_reset_email(to_email: str, token: str, name: str):
 
     We received a request to reset your password. Click the link below:
 
-   al-maram.com/reset-password?token={token}
+   al-maram.com/reset-password?token={token}{_branch_param(branch)}
 
     If you did not request this, please ignore the email.
 
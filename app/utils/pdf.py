@@ -0,0 +1,126 @@
+"""
+Right-to-left PDF rendering of report documents.
+Runs inside report worker processes (app.core.reports), so it only imports the PDF and shaping
+libraries. A document is plain data:
+
+    {"title": str, "subtitle": str, "fields": [[label, value], ...],
+     "columns": [str, ...], "rows": [[cell, ...], ...], "totals": [[label, value], ...], "footer": str}
+
+Columns run from the right edge of the page to the left, like the text.
+"""
+import io
+import os
+from typing import Dict, List, Optional
+
+PAGE_MARGIN = 40
+ROW_HEIGHT = 18
+_fonts: Dict[str, str] = {}
+
+
+def shape(value) -> str:
+    """ Visual-order text for the PDF: Arabic letters joined into their contextual forms, then bidi reordered. """
+    from arabic_reshaper import reshape
+    from bidi.algorithm import get_display
+
+    text = "" if value is None else str(value)
+    return get_display(reshape(text)) if text else text
+
+
+def _register_font(font_path: Optional[str]) -> str:
+    """ Register the report font once per process; falls back to reportlab's Vera (no Arabic glyphs). """
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    name = _fonts.get(font_path)
+    if name is None:
+        path = font_path
+        if not path or not os.path.exists(path):
+            import reportlab
+            print(f"⚠️ Report font {font_path!r} not found, Arabic text will not render")
+            path = os.path.join(os.path.dirname(reportlab.__file__), "fonts", "Vera.ttf")
+        name = _fonts[font_path] = f"ReportFont{len(_fonts)}"
+        pdfmetrics.registerFont(TTFont(name, path))
+    return name
+
+
+def _column_widths(font: str, columns: List[str], rows: List[list], width: float) -> List[float]:
+    """ Share the page width in proportion to each column's widest cell. """
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    widest = [stringWidth(shape(column), font, 10) for column in columns]
+    for row in rows:
+        for i, cell in enumerate(row):
+            widest[i] = max(widest[i], stringWidth(shape(cell), font, 10))
+    total = sum(widest) or 1
+    return [width * w / total for w in widest]
+
+
+def render_pdf(document: dict, font_path: Optional[str] = None) -> bytes:
+    """ Lay out one document (see module docstring) on A4 pages and return the PDF bytes. """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen.canvas import Canvas
+
+    font = _register_font(font_path)
+    page_width, page_height = A4
+    right, left = page_width - PAGE_MARGIN, PAGE_MARGIN
+    buffer = io.BytesIO()
+    # invariant: no timestamps or random ids, so the same document always renders to the same bytes
+    pdf = Canvas(buffer, pagesize=A4, invariant=1)
+    pdf.setTitle(document.get("title", ""))
+
+    columns = document.get("columns") or []
+    rows = document.get("rows") or []
+    widths = _column_widths(font, columns, rows, right - left) if columns else []
+    y = page_height - PAGE_MARGIN
+
+    def text(value, x, size=10):
+        pdf.setFont(font, size)
+        pdf.drawRightString(x, y, shape(value))
+
+    def table_row(cells, header=False):
+        nonlocal y
+        x = right
+        for cell, width in zip(cells, widths):
+            text(cell, x - 4, 10)
+            x -= width
+        y -= ROW_HEIGHT
+        pdf.setLineWidth(0.8 if header else 0.2)
+        pdf.line(left, y + ROW_HEIGHT - 13, right, y + ROW_HEIGHT - 13)
+
+    def new_page(repeat_header: bool):
+        nonlocal y
+        pdf.showPage()
+        y = page_height - PAGE_MARGIN
+        if repeat_header:
+            table_row(columns, header=True)
+
+    text(document.get("title", ""), right, 16)
+    y -= 22
+    if document.get("subtitle"):
+        text(document["subtitle"], right, 11)
+        y -= 20
+    for label, value in document.get("fields") or []:
+        text(f"{label}: {value}", right, 10)
+        y -= 16
+    y -= 10
+
+    if columns:
+        table_row(columns, header=True)
+        for row in rows:
+            if y < PAGE_MARGIN + ROW_HEIGHT:
+                new_page(repeat_header=True)
+            table_row(row)
+        y -= 10
+
+    for label, value in document.get("totals") or []:
+        if y < PAGE_MARGIN + ROW_HEIGHT:
+            new_page(repeat_header=False)
+        text(f"{label}: {value}", right, 11)
+        y -= 18
+
+    if document.get("footer"):
+        y = PAGE_MARGIN / 2
+        text(document["footer"], right, 8)
+
+    pdf.save()
+    return buffer.getvalue()
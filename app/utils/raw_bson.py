@@ -0,0 +1,44 @@
+"""
+Bulk-read fast path, opt-in with RAW_BSON_READS.
+`Repository.find_raw` yields RawBSONDocument: cursor batches stay undecoded BSON, and each row is
+decoded (projected fields only) when it is consumed and encoded straight into the output, instead
+of every document being decoded into a dict, validated into a response model and copied.
+benchmarks/bench_raw_bson.py measures per-row CPU and allocations of both paths.
+"""
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+import bson
+import orjson
+from bson import ObjectId
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+
+RAW_CODEC_OPTIONS = CodecOptions(document_class=RawBSONDocument)
+
+
+def rows(raw_documents: Iterable[RawBSONDocument]) -> Iterator[dict]:
+    """ Decode one document at a time. """
+    for raw in raw_documents:
+        yield bson.decode(raw.raw)
+
+
+def _default(value: Any):
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError
+
+
+def json_listing(head: dict, key: str, documents: Iterable[dict],
+                 transform: Optional[Callable[[dict], dict]] = None) -> bytes:
+    """ `{**head, key: [documents]}` as JSON, encoding each document as soon as it is decoded. """
+    out = bytearray(orjson.dumps(head)[:-1])
+    if head:
+        out += b","
+    out += orjson.dumps(key) + b":["
+    separator = b""
+    for document in documents:
+        out += separator
+        out += orjson.dumps(transform(document) if transform else document, default=_default)
+        separator = b","
+    out += b"]}"
+    return bytes(out)
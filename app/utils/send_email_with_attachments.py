@@ -1,11 +1,5 @@
 import csv
 import io
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.base import MIMEBase
-from email import encoders
-import os
 from app.core.config import config
 
 
@@ -26,6 +20,13 @@ def send_email_with_attachment(subject: str, body: str, to_email: str, attachmen
     Send an email with CSV (or any file-like) attachments.
     attachments: list of (filename, file_content) tuples
     """
+    # Imported on first send: the mail stack is not needed to start the app
+    import smtplib
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.base import MIMEBase
+    from email import encoders
+
     sender_email = config.EMAIL_USER
     password = config.EMAIL_PASSWORD
 
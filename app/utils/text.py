@@ -0,0 +1,28 @@
+import re
+
+from pyarabic import araby
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_name(name: str) -> str:
+    """
+    Canonical form of a person's name for matching, not display:
+    trimmed, whitespace collapsed, case-folded, Arabic diacritics/tatweel removed and
+    letter variants unified (أ/إ/آ -> ا, ة -> ه, ى -> ي).
+    """
+    if not name:
+        return ""
+    text = araby.strip_tashkeel(araby.strip_tatweel(str(name)))
+    text = text.replace("ى", "ي")  # before normalize_alef, which would map it to ا
+    text = araby.normalize_alef(text)
+    text = araby.normalize_teh(text)
+    return _WHITESPACE.sub(" ", text).strip().casefold()
+
+
+_DIGITS = str.maketrans("٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹", "0123456789" * 2)
+
+
+def normalize_phone(phone: str) -> str:
+    """ Digits only (Arabic-Indic digits converted), so "050-123 4567" and "٠٥٠١٢٣٤٥٦٧" match. """
+    return "".join(ch for ch in str(phone or "").translate(_DIGITS) if ch.isdigit())
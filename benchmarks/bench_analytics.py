@@ -0,0 +1,228 @@
+"""
+Stats queries at 1M lessons: the old per-lesson Python loops vs the columnar snapshot
+(app.core.analytics) vs a MongoDB aggregation pipeline.
+
+Queries: admin teacher stats for one month (teacher x type x level), admin student stats for one
+month, one teacher's dashboard (a month of every year) and a 12-month subject trend.
+The loop column times the Python loop alone over documents already in memory (the endpoints
+also paid for fetching them); the Mongo column runs only with --mongo-url and uses a scratch
+database that is dropped afterwards.
+
+    python -m benchmarks.bench_analytics [--lessons 1000000] [--rounds 5] [--mongo-url mongodb://localhost]
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from app.core.analytics import LessonColumns
+from app.utils.text import normalize_name
+
+LEVELS = ["ابتدائي", "إعدادي", "ثانوي"]
+SUBJECTS = ["math", "physics", "english", "arabic", "hebrew", "chemistry", "biology", "history"]
+MONTH = (datetime(2025, 3, 1), datetime(2025, 4, 1))
+YEAR = (datetime(2024, 7, 1), datetime(2025, 7, 1))
+
+
+def make_lessons(n: int, seed: int = 3):
+    rng = random.Random(seed)
+    students = [(ObjectId() if i % 4 else None, f"student {i}") for i in range(5000)]
+    start = datetime(2023, 1, 1, 8)
+    individual, group = [], []
+    for i in range(n):
+        lesson = {
+            "_id": ObjectId(),
+            "approved": True,
+            "teacher_name": f"teacher{rng.randrange(200)}",
+            "education_level": rng.choice(LEVELS),
+            "subject": rng.choice(SUBJECTS),
+            "hours": rng.choice((1, 1.5, 2)),
+            "date": start + timedelta(minutes=rng.randrange(3 * 365 * 24 * 60)),
+        }
+        if rng.random() < 0.7:
+            student_id, name = rng.choice(students)
+            lesson.update(student_name=name, student_ids=[student_id] if student_id else [])
+            individual.append(lesson)
+        else:
+            picked = rng.sample(students, rng.randint(2, 4))
+            lesson.update(student_names=[name for _, name in picked],
+                          student_ids=[sid for sid, _ in picked] if all(sid for sid, _ in picked) else [])
+            group.append(lesson)
+    return individual, group
+
+
+# ---------- The loops the endpoints ran before the snapshot ----------
+
+def in_range(lesson, bounds):
+    return bounds[0] <= lesson["date"] < bounds[1]
+
+
+def loop_teacher_stats(individual, group):
+    stats = {}
+    for lessons, kind in ((individual, "individual"), (group, "group")):
+        for lesson in lessons:
+            if not in_range(lesson, MONTH):
+                continue
+            stat = stats.setdefault(lesson.get("teacher_name", "Unknown Teacher"), {
+                "total_individual_hours": 0, "total_group_hours": 0,
+                "individual_hours_by_education_level": {}, "group_hours_by_education_level": {}})
+            stat[f"total_{kind}_hours"] += lesson.get("hours", 0)
+            by_level = stat[f"{kind}_hours_by_education_level"]
+            level = lesson.get("education_level", "Unknown Level")
+            by_level[level] = by_level.get(level, 0) + lesson.get("hours", 0)
+    return stats
+
+
+def loop_student_stats(individual, group):
+    stats = {}
+    for lessons, kind in ((individual, "individual"), (group, "group")):
+        for lesson in lessons:
+            if not in_range(lesson, MONTH):
+                continue
+            names = [lesson.get("student_name")] if kind == "individual" else lesson.get("student_names", [])
+            ids = lesson.get("student_ids") or []
+            if len(ids) != len(names):
+                ids = [None] * len(names)
+            for student_id, name in zip(ids, names):
+                key = student_id or normalize_name(name)
+                stat = stats.setdefault(key, {"total_individual_hours": 0, "total_group_hours": 0,
+                                              "education_level": lesson.get("education_level")})
+                stat[f"total_{kind}_hours"] += lesson.get("hours", 0)
+    return stats
+
+
+def loop_dashboard(individual, group):
+    mine = [lesson for lessons in (individual, group) for lesson in lessons
+            if lesson["teacher_name"] == "teacher7" and lesson["date"].month == 3]
+    return len(mine), {level: sum(l["hours"] for l in mine if l.get("education_level") == level) for level in LEVELS}
+
+
+def loop_trend(individual, group):
+    trend = {}
+    for lessons in (individual, group):
+        for lesson in lessons:
+            if in_range(lesson, YEAR):
+                key = (lesson["date"].strftime("%Y-%m"), lesson["subject"])
+                trend[key] = trend.get(key, 0) + lesson["hours"]
+    return trend
+
+
+# ---------- Snapshot ----------
+
+def snapshot_queries(snapshot: LessonColumns):
+    start, end = MONTH[0].date(), MONTH[1].date()
+    return {
+        "teacher stats (month)": lambda: snapshot.group_sum(("teacher", "lesson_type", "level"), start=start, end=end),
+        "student stats (month)": lambda: (snapshot.group_sum(("student", "lesson_type"), start=start, end=end),
+                                          snapshot.first_values("student", "level", start, end)),
+        "teacher dashboard": lambda: (snapshot.group_sum(("lesson_type", "level"), teacher="teacher7", month_of_year=3),
+                                      snapshot.group_sum(metric="lessons", teacher="teacher7", month_of_year=3)),
+        "12-month subject trend": lambda: snapshot.group_sum(("month", "subject"), start=YEAR[0].date(), end=YEAR[1].date()),
+    }
+
+
+# ---------- MongoDB ----------
+
+def mongo_queries(db):
+    month = {"approved": True, "date": {"$gte": MONTH[0], "$lt": MONTH[1]}}
+
+    def union(match, group):
+        return list(db["IndividualLessons"].aggregate([
+            {"$match": match}, {"$addFields": {"lesson_type": "individual"}},
+            {"$unionWith": {"coll": "GroupLessons", "pipeline": [
+                {"$match": match}, {"$addFields": {"lesson_type": "group"}}]}},
+            *group,
+        ], allowDiskUse=True))
+
+    return {
+        "teacher stats (month)": lambda: union(month, [{"$group": {
+            "_id": {"t": "$teacher_name", "k": "$lesson_type", "l": "$education_level"}, "hours": {"$sum": "$hours"}}}]),
+        "student stats (month)": lambda: union(month, [
+            {"$addFields": {"student": {"$ifNull": ["$student_names", ["$student_name"]]}}},
+            {"$unwind": "$student"},
+            {"$group": {"_id": {"s": "$student", "k": "$lesson_type"}, "hours": {"$sum": "$hours"},
+                        "level": {"$first": "$education_level"}}}]),
+        "teacher dashboard": lambda: union({"approved": True, "teacher_name": "teacher7"}, [
+            {"$match": {"$expr": {"$eq": [{"$month": "$date"}, 3]}}},
+            {"$group": {"_id": {"k": "$lesson_type", "l": "$education_level"},
+                        "hours": {"$sum": "$hours"}, "lessons": {"$sum": 1}}}]),
+        "12-month subject trend": lambda: union({"approved": True, "date": {"$gte": YEAR[0], "$lt": YEAR[1]}}, [
+            {"$group": {"_id": {"m": {"$dateTrunc": {"date": "$date", "unit": "month"}}, "s": "$subject"},
+                        "hours": {"$sum": "$hours"}}}]),
+    }
+
+
+def load_mongo(url: str, individual, group):
+    from pymongo import MongoClient
+    client = MongoClient(url)
+    db = client["bench_analytics"]
+    client.drop_database(db.name)
+    for name, lessons in (("IndividualLessons", individual), ("GroupLessons", group)):
+        for i in range(0, len(lessons), 50_000):
+            db[name].insert_many([dict(lesson) for lesson in lessons[i:i + 50_000]], ordered=False)
+        db[name].create_index([("approved", 1), ("date", 1)])
+        db[name].create_index([("teacher_name", 1), ("approved", 1)])
+    return client, db
+
+
+def timed(fn, rounds: int) -> float:
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lessons", type=int, default=1_000_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--mongo-url", default=None)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    individual, group = make_lessons(args.lessons)
+    print(f"{args.lessons} lessons generated in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    snapshot = LessonColumns()
+    snapshot.load([(lesson, "individual") for lesson in individual] + [(lesson, "group") for lesson in group])
+    print(f"snapshot built in {time.perf_counter() - started:.1f}s "
+          f"({snapshot.size} rows, {sum(c.nbytes for c in snapshot.columns.values()) / 2 ** 20:.0f} MiB)")
+
+    loops = {
+        "teacher stats (month)": lambda: loop_teacher_stats(individual, group),
+        "student stats (month)": lambda: loop_student_stats(individual, group),
+        "teacher dashboard": lambda: loop_dashboard(individual, group),
+        "12-month subject trend": lambda: loop_trend(individual, group),
+    }
+    vectorized = snapshot_queries(snapshot)
+
+    mongo, client = {}, None
+    if args.mongo_url:
+        started = time.perf_counter()
+        client, db = load_mongo(args.mongo_url, individual, group)
+        print(f"MongoDB loaded in {time.perf_counter() - started:.1f}s")
+        mongo = mongo_queries(db)
+
+    print(f"  {'query':<24} {'loop ms':>9} {'snapshot ms':>12} {'mongo ms':>9}")
+    for name in loops:
+        loop_ms = timed(loops[name], max(1, args.rounds // 2))
+        snapshot_ms = timed(vectorized[name], args.rounds)
+        mongo_ms = f"{timed(mongo[name], args.rounds):9.1f}" if name in mongo else f"{'-':>9}"
+        print(f"  {name:<24} {loop_ms:9.1f} {snapshot_ms:12.2f} {mongo_ms}")
+
+    # Incremental refresh: one approval replaces a lesson's rows without a rebuild
+    lesson = dict(individual[0], hours=3)
+    print(f"  upsert one lesson: {timed(lambda: snapshot.upsert(lesson, 'individual'), 1000) * 1000:.1f} µs")
+
+    if client is not None:
+        client.drop_database("bench_analytics")
+
+
+if __name__ == "__main__":
+    main()
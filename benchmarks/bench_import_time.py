@@ -0,0 +1,85 @@
+"""
+Import-time budget for `app.main` (cold start of a worker).
+
+Runs `python -X importtime -c "import app.main"` in a fresh interpreter with a placeholder
+Mongo URL, prints the slowest top-level imports, and exits non-zero when the total exceeds
+the budget, when importing created the Mongo client, or when a module that must stay lazy
+(scheduler, timezone database, mail stack) was imported.
+
+    python -m benchmarks.bench_import_time [--budget-ms 1500] [--top 15]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+LAZY_MODULES = ["apscheduler", "pytz", "smtplib", "email.mime", "dotenv"]
+
+PROBE = """
+import app.main
+import sys
+from app.core.database import mongo_db
+print("MONGO_CONNECTED", int(mongo_db._client is not None))
+print("LAZY_IMPORTED", ",".join(m for m in {lazy} if m in sys.modules))
+"""
+
+
+def measure():
+    env = {
+        **os.environ,
+        "MONGO_CLUSTER_URL": "mongodb://placeholder.invalid:27017",
+        "MONGO_DATABASE": "bench",
+        "SECRET_KEY": "bench",
+        "ALGO_HASH": "HS256",
+        "ENV_FILE": os.devnull,
+    }
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(lazy=LAZY_MODULES)],
+        capture_output=True, text=True, env=env, check=True,
+    )
+
+    # stderr lines: "import time: self [us] | cumulative | imported package", children first,
+    # nesting shown by two spaces per level; app.main's direct imports are at depth 1
+    total_ms, children = 0.0, []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        if depth == 0 and name.strip() == "app.main":
+            total_ms = int(cumulative) / 1000
+        elif depth == 1:
+            children.append((int(cumulative) / 1000, name.strip()))
+
+    info = dict(line.split(" ", 1) for line in result.stdout.splitlines() if " " in line)
+    lazy_imported = [m for m in info.get("LAZY_IMPORTED", "").split(",") if m]
+    return total_ms, children, int(info["MONGO_CONNECTED"]), lazy_imported
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget-ms", type=float, default=1500)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    total_ms, children, connected, lazy_imported = measure()
+
+    print(f"import app.main: {total_ms:.0f} ms (budget {args.budget_ms:.0f} ms)")
+    for ms, name in sorted(children, reverse=True)[:args.top]:
+        print(f"  {ms:8.1f} ms  {name}")
+
+    failures = []
+    if total_ms > args.budget_ms:
+        failures.append(f"import time {total_ms:.0f} ms exceeds budget {args.budget_ms:.0f} ms")
+    if connected:
+        failures.append("a MongoClient was created at import")
+    if lazy_imported:
+        failures.append(f"imported eagerly: {', '.join(lazy_imported)}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Bulk reads: the dict path vs the raw-BSON path (RAW_BSON_READS, app.utils.raw_bson).
+
+Listing: an admin approved-lessons response (AdminLessonOut through pydantic + orjson, as FastAPI
+renders it, vs rows decoded one at a time and encoded straight into the body).
+Export: the lessons CSV (dict rows vs rows decoded from raw BSON).
+The cursor is simulated from BSON batches the way pymongo decodes server replies (dicts vs
+RawBSONDocument), so only client-side work is timed; --mongo-url reads a scratch collection
+through MongoRepository instead (dropped afterwards).
+Reported per row: CPU time (best of --repeat) and peak traced memory (tracemalloc).
+
+    python -m benchmarks.bench_raw_bson [--lessons 100000] [--repeat 5] [--mongo-url mongodb://localhost]
+"""
+import argparse
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import bson
+import orjson
+from bson import ObjectId
+from bson.codec_options import CodecOptions
+
+from app.schemas.responses import AdminApprovedLessonsResponse
+from app.utils.raw_bson import RAW_CODEC_OPTIONS, json_listing, rows
+from app.utils.send_email_with_attachments import export_to_csv_memory
+
+FIELDS = ["_id", "teacher_name", "student_name", "date", "hours", "education_level", "subject"]
+PROJECTION = {field: 1 for field in FIELDS}
+BATCH = 1000
+DICT_CODEC_OPTIONS = CodecOptions()
+
+
+def make_batches(n: int):
+    start = datetime(2025, 1, 1, 9)
+    documents = [bson.encode({
+        "_id": ObjectId(), "teacher_name": f"teacher{i % 40}", "student_name": f"طالب {i % 900}",
+        "date": start + timedelta(hours=i), "hours": 1.5, "education_level": "ثانوي", "subject": "math",
+    }) for i in range(n)]
+    return [b"".join(documents[i:i + BATCH]) for i in range(0, n, BATCH)]
+
+
+def simulated_cursor(batches, codec_options):
+    def cursor():
+        for batch in batches:
+            yield from bson.decode_all(batch, codec_options)
+    return cursor
+
+
+def _day(lesson: dict) -> dict:
+    if isinstance(lesson.get("date"), datetime):
+        lesson["date"] = lesson["date"].strftime("%Y-%m-%d")
+    return lesson
+
+
+def listing_dicts(cursor) -> bytes:
+    payload = {"message": "Approved lessons retrieved successfully", "approved_lessons": list(cursor())}
+    model = AdminApprovedLessonsResponse.model_validate(payload)
+    return orjson.dumps(model.model_dump(mode="json", by_alias=True, exclude_unset=True))
+
+
+def listing_raw(cursor) -> bytes:
+    return json_listing({"message": "Approved lessons retrieved successfully"}, "approved_lessons",
+                        rows(cursor()), _day)
+
+
+def _csv_row(lesson: dict) -> dict:
+    return {**lesson, "_id": str(lesson["_id"]), "date": lesson["date"].isoformat()}
+
+
+def export_dicts(cursor) -> str:
+    return export_to_csv_memory([_csv_row(lesson) for lesson in cursor()], FIELDS)
+
+
+def export_raw(cursor) -> str:
+    return export_to_csv_memory((_csv_row(lesson) for lesson in rows(cursor())), FIELDS)
+
+
+def measure(fn, cursor, n: int, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(cursor)
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    fn(cursor)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(timings) / n * 1e6, peak / n
+
+
+def mongo_cursors(url: str, batches):
+    from pymongo import MongoClient
+
+    from app.repositories.mongo import MongoStore
+
+    client = MongoClient(url)
+    db = client[f"bench_raw_bson_{ObjectId()}"]
+    for batch in batches:
+        db["IndividualLessons"].insert_many(bson.decode_all(batch))
+    repository = MongoStore(db)["IndividualLessons"]
+    return client, db, (lambda: iter(repository.find({}, PROJECTION))), \
+        (lambda: repository.find_raw({}, PROJECTION))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lessons", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--mongo-url", default=None)
+    args = parser.parse_args()
+
+    batches = make_batches(args.lessons)
+    client = None
+    if args.mongo_url:
+        client, db, dict_cursor, raw_cursor = mongo_cursors(args.mongo_url, batches)
+    else:
+        dict_cursor = simulated_cursor(batches, DICT_CODEC_OPTIONS)
+        raw_cursor = simulated_cursor(batches, RAW_CODEC_OPTIONS)
+
+    try:
+        assert orjson.loads(listing_dicts(dict_cursor)) == orjson.loads(listing_raw(raw_cursor))
+        assert export_dicts(dict_cursor) == export_raw(raw_cursor)
+        print(f"{args.lessons} lessons ({'MongoDB' if client else 'simulated cursor'})")
+        print(f"  {'path':<16} {'dict us/row':>12} {'raw us/row':>11} {'dict B/row':>11} {'raw B/row':>10}")
+        for name, dict_path, raw_path in (("listing", listing_dicts, listing_raw), ("csv export", export_dicts, export_raw)):
+            dict_us, dict_bytes = measure(dict_path, dict_cursor, args.lessons, args.repeat)
+            raw_us, raw_bytes = measure(raw_path, raw_cursor, args.lessons, args.repeat)
+            print(f"  {name:<16} {dict_us:12.2f} {raw_us:11.2f} {dict_bytes:11.0f} {raw_bytes:10.0f}")
+    finally:
+        if client:
+            client.drop_database(db.name)
+            client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Query latency of the in-process search index (GET /search) at 100k records.
+
+Records mix Arabic and Latin student names with aliases, teacher usernames and booking
+contacts; queries cover prefixes, full names, typos, un-normalized Arabic and phone numbers.
+
+    python -m benchmarks.bench_search [--records 100000] [--rounds 20]
+"""
+import argparse
+import random
+import statistics
+import time
+
+from bson import ObjectId
+
+from app.core.search import SearchIndex
+from app.utils.text import normalize_name
+
+FIRST = ["أحمد", "محمد", "مصطفى", "فاطمة", "ليلى", "يوسف", "مريم", "عمر", "خالد", "سارة", "نور", "إبراهيم",
+         "ahmad", "mohammad", "lina", "yousef", "maryam", "omar", "khaled", "sara", "noor", "rami"]
+LAST = ["الخطيب", "حداد", "منصور", "عيسى", "سليمان", "جبارين", "زعبي", "أبو ريا", "عثمان", "حسين",
+        "khatib", "haddad", "mansour", "issa", "suleiman", "jabareen", "zoabi", "othman", "hussein"]
+
+QUERIES = ["ا", "ah", "ahmad", "ahmd khatib", "احمد", "أحمَد الخطيب", "مصطفي", "فاطمه حداد",
+           "teacher12", "0501234", "٠٥٢٣", "052-311", "yousef zoabi", "ليلى منصور", "xyzq"]
+
+
+def build(records: int, seed: int = 7) -> SearchIndex:
+    rng = random.Random(seed)
+    index = SearchIndex()
+    students = int(records * 0.7)
+    contacts = records - students - 200
+    for i in range(students):
+        name = f"{rng.choice(FIRST)} {rng.choice(LAST)} {i}"
+        keys = [normalize_name(name)]
+        if i % 10 == 0:
+            keys.append(normalize_name(f"{rng.choice(FIRST)} {rng.choice(LAST)}"))
+        index.upsert_student({"_id": ObjectId(), "name": name, "keys": keys})
+    for i in range(200):
+        index.upsert_teacher(f"teacher{i}")
+    for i in range(contacts):
+        index.add_booking_contact({"parentName": f"{rng.choice(FIRST)} {rng.choice(LAST)}",
+                                   "phone": f"05{rng.randint(0, 9)}{rng.randint(1000000, 9999999)}",
+                                   "students": [f"{rng.choice(FIRST)} {rng.choice(LAST)}"]})
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=100_000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    index = build(args.records)
+    print(f"{len(index)} records indexed in {time.perf_counter() - started:.1f}s")
+
+    print(f"  {'query':<16} {'hits':>5} {'p50 ms':>8} {'max ms':>8}")
+    for query in QUERIES:
+        timings = []
+        for _ in range(args.rounds):
+            t = time.perf_counter()
+            results = index.search(query, limit=20)
+            timings.append((time.perf_counter() - t) * 1000)
+        print(f"  {query:<16} {len(results):>5} {statistics.median(timings):8.2f} {max(timings):8.2f}")
+
+
+if __name__ == "__main__":
+    main()
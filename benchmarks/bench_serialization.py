@@ -0,0 +1,78 @@
+"""
+Serialization cost of a 10k-lesson listing response.
+
+Compares the old path (per-document `_id` stringify loop + jsonable_encoder + json.dumps)
+with the typed response models serialized by pydantic-core and rendered by orjson.
+
+    python -m benchmarks.bench_serialization [--lessons 10000] [--repeat 5]
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+
+import orjson
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+
+from app.schemas.responses import ApprovedLessonsResponse
+
+
+def make_lessons(n: int):
+    start = datetime(2024, 1, 1, 9)
+    return [
+        {
+            "_id": ObjectId(),
+            "date": start + timedelta(hours=i),
+            "teacher_name": f"teacher{i % 40}",
+            "student_name": f"student{i % 900}",
+            "hours": 1.5,
+            "subject": "math",
+            "education_level": "ثانوي",
+            "approved": True,
+        }
+        for i in range(n)
+    ]
+
+
+def old_path(lessons):
+    payload = {
+        "message": "Approved lessons retrieved successfully",
+        "approved_lessons": [{**lesson, "_id": str(lesson["_id"])} for lesson in lessons],
+    }
+    return json.dumps(jsonable_encoder(payload)).encode("utf-8")
+
+
+def new_path(lessons):
+    payload = {"message": "Approved lessons retrieved successfully", "approved_lessons": lessons}
+    model = ApprovedLessonsResponse.model_validate(payload)
+    return orjson.dumps(model.model_dump(mode="json", by_alias=True, exclude_unset=True))
+
+
+def best_of(fn, lessons, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(lessons)
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lessons", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    lessons = make_lessons(args.lessons)
+    assert json.loads(old_path(lessons)) == json.loads(new_path(lessons))
+
+    old_ms = best_of(old_path, lessons, args.repeat)
+    new_ms = best_of(new_path, lessons, args.repeat)
+    print(f"{args.lessons} lessons")
+    print(f"  jsonable_encoder + json : {old_ms:8.1f} ms")
+    print(f"  pydantic-core + orjson  : {new_ms:8.1f} ms  ({old_ms / new_ms:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
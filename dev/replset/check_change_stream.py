@@ -0,0 +1,47 @@
+"""
+End-to-end check of the live event pipeline against the local replica set:
+starts the change-stream watcher, subscribes as a teacher and as an admin,
+writes a lesson and a booking, and asserts who receives what.
+"""
+import asyncio
+import os
+from datetime import datetime
+
+os.environ.setdefault("MONGO_DATABASE", "classmanager_replset_check")
+
+from app.core.database import mongo_db  # noqa: E402
+from app.core.events import ChangeStreamWatcher, event_bus  # noqa: E402
+
+
+async def main():
+    db = mongo_db.db
+    watcher = ChangeStreamWatcher(mongo_db.client, event_bus)
+    watcher.start()
+
+    teacher = event_bus.subscribe({"username": "teacher_a", "role": "teacher"})
+    other_teacher = event_bus.subscribe({"username": "teacher_b", "role": "teacher"})
+    admin = event_bus.subscribe({"username": "admin", "role": "admin"})
+    await asyncio.sleep(2)  # let the stream open before writing
+
+    lesson_id = db["IndividualLessons"].insert_one({
+        "date": datetime.utcnow(), "teacher_name": "teacher_a", "student_name": "s",
+        "hours": 1, "subject": "math", "education_level": "ثانوي", "approved": False,
+    }).inserted_id
+    db["IndividualLessons"].update_one({"_id": lesson_id}, {"$set": {"approved": True}})
+    db["StudentBookings"].insert_one({"phone": "050", "students": ["s"], "bookingDate": "2024-01-01"})
+
+    teacher_events = [await asyncio.wait_for(teacher.queue.get(), 10) for _ in range(2)]
+    admin_events = [await asyncio.wait_for(admin.queue.get(), 10) for _ in range(3)]
+
+    assert [e["operation"] for e in teacher_events] == ["insert", "update"], teacher_events
+    assert teacher_events[1]["updated_fields"] == {"approved": True}
+    assert {e["collection"] for e in admin_events} == {"IndividualLessons", "StudentBookings"}
+    assert other_teacher.queue.empty()
+
+    watcher.stop()
+    mongo_db.client.drop_database(db.name)
+    print("✅ change stream fan-out OK")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+"""
+Route and model tests. They run on the in-memory repository backend unless REPOSITORY_BACKEND is set:
+
+    python -m pytest -q
+    REPOSITORY_BACKEND=mongo MONGO_CLUSTER_URL=mongodb://localhost:27017 python -m pytest -q
+
+On MongoDB every test starts from an empty TEST_MONGO_DATABASE (default "pytest_main"), which is dropped
+and re-indexed before each test, so never point it at real data. Tests marked `memory_only` patch
+repository instances, which the Mongo backend creates per access, and are skipped there.
+"""
+import os
+
+os.environ.setdefault("REPOSITORY_BACKEND", "memory")
+os.environ.update(LIVE_EVENTS_ENABLED="false", REPORT_JOB_WORKERS="0", IDEMPOTENCY_CONTENT_WINDOW_SECONDS="0",
+                  MONGO_DATABASE=os.environ.get("TEST_MONGO_DATABASE", "pytest_main"), BRANCH_DATABASES="")
+for name, value in (("MONGO_CLUSTER_URL", "mongodb://unreachable"), ("SECRET_KEY", "test-secret"),
+                    ("ALGO_HASH", "HS256"), ("JWT_RESET_SECRET_KEY", "test-reset")):
+    os.environ.setdefault(name, value)
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.security import create_access_token
+from app.core.user_cache import user_profile_cache
+from app.repositories import get_branch_store, reset_memory_stores, uses_mongo
+from app.routes.teacher import birthdays_cache
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "memory_only: needs the in-memory repository backend")
+
+
+def pytest_collection_modifyitems(config, items):
+    if uses_mongo():
+        skip = pytest.mark.skip(reason="patches in-memory repository instances")
+        for item in items:
+            if "memory_only" in item.keywords:
+                item.add_marker(skip)
+
+
+def reset_stores():
+    reset_memory_stores()
+    if uses_mongo():
+        from app.core.database import mongo_db
+        for branch, db in mongo_db.branch_databases():
+            mongo_db.client.drop_database(db.name)
+            mongo_db.ensure_indexes(db)
+
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    reset_stores()
+    user_profile_cache.clear()
+    birthdays_cache.clear()
+    yield
+    reset_memory_stores()
+    user_profile_cache.clear()
+    birthdays_cache.clear()
+
+
+@pytest.fixture
+def store():
+    return get_branch_store("main")
+
+
+@pytest.fixture
+def client():
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def make_user(store):
+    """ Create a user in the main branch and return a token for them. """
+    def make(username: str, role: str = "teacher", **fields) -> str:
+        store["Users"].insert_one({"username": username, "role": role, "verified": True,
+                                   "email": f"{username}@example.com", **fields})
+        return create_access_token({"username": username, "role": role})
+    return make
@@ -0,0 +1,26 @@
+from datetime import datetime
+
+import pytest
+
+from app.core.config import config
+
+
+@pytest.mark.memory_only
+@pytest.mark.parametrize("raw_reads", [False, True])
+def test_pending_listing_skips_the_archive(client, make_user, store, monkeypatch, raw_reads):
+    monkeypatch.setattr(config, "RAW_BSON_READS", raw_reads)
+    admin = make_user("boss", "admin")
+    store["IndividualLessons"].insert_one({"teacher_name": "tea", "student_name": "a", "date": datetime(2026, 9, 2),
+                                           "hours": 1, "education_level": "ثانوي", "subject": "math", "approved": False})
+    store["ArchiveState"].insert_one({"_id": "lessons", "archived_before": datetime(2026, 1, 1)})
+    archive_reads = []
+    archive = store["IndividualLessonsArchive"]
+    for method in ("find", "find_raw"):
+        read = getattr(archive, method)
+        monkeypatch.setattr(archive, method, lambda *args, read=read, **kwargs: archive_reads.append(1) or read(*args, **kwargs))
+
+    response = client.get(f"/admin/pending-individual-lessons?token={admin}")
+
+    assert response.status_code == 200
+    assert [lesson["student_name"] for lesson in response.json()["pending_lessons"]] == ["a"]
+    assert archive_reads == []
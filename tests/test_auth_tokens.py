@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+
+from app.models.auth_token import EXPIRED_TOKEN_RETENTION, USED_TOKEN_RETENTION, AuthToken
+
+
+def test_expired_token_outlives_its_expiry(store):
+    tokens = store["AuthTokens"]
+    token = AuthToken.issue("user-1", "verify", timedelta(hours=1), tokens)
+    doc = tokens.find_one({})
+    assert doc["purge_at"] == doc["expires_at"] + EXPIRED_TOKEN_RETENTION
+
+    tokens.update_one({}, {"$set": {"expires_at": datetime.utcnow() - timedelta(minutes=1)}})
+    status, _ = AuthToken.consume(token, "verify", tokens)
+    assert status == "expired"
+
+
+def test_used_token_keeps_its_expiry(store):
+    tokens = store["AuthTokens"]
+    token = AuthToken.issue("user-1", "reset", timedelta(hours=1), tokens)
+    expires_at = tokens.find_one({})["expires_at"]
+
+    status, _ = AuthToken.consume(token, "reset", tokens)
+    assert status == "ok"
+    doc = tokens.find_one({})
+    assert doc["expires_at"] == expires_at
+    assert doc["purge_at"] >= doc["used_at"] + USED_TOKEN_RETENTION
+    assert AuthToken.consume(token, "reset", tokens)[0] == "used"
+    assert AuthToken.consume("bogus", "reset", tokens)[0] == "invalid"
+
+
+def test_expired_verification_link_message(client, store):
+    token = AuthToken.issue("user-1", "verify", timedelta(hours=-1), store["AuthTokens"])
+    response = client.get(f"/user/verify-email?token={token}")
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Verification link has expired")
@@ -0,0 +1,15 @@
+from app.routes.teacher import _local_now
+
+
+def test_role_change_clears_cached_birthdays(client, make_user, store):
+    admin = make_user("boss", "admin")
+    make_user("tea", birthday_md=_local_now().strftime("%m-%d"))
+
+    for path in ("/teacher/teachers-birthdays", "/teacher/teachers-birthdays/upcoming"):
+        assert [entry["name"] for entry in client.get(path).json()["birthdays"]] == ["tea"]
+
+    response = client.patch(f"/admin/users/tea/role?token={admin}&role=admin")
+    assert response.status_code == 200
+
+    for path in ("/teacher/teachers-birthdays", "/teacher/teachers-birthdays/upcoming"):
+        assert client.get(path).json()["birthdays"] == []
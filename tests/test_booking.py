@@ -0,0 +1,36 @@
+import pytest
+
+from app.core.config import config
+
+BOOKING = {"phone": "0599000000", "subject": "math", "ageLevel": "ثانوي", "lessonDate": "2026-10-20",
+           "lessonTime": "16:00", "hours": 1, "students": ["a"]}
+
+
+@pytest.fixture(autouse=True)
+def behind_proxy(monkeypatch):
+    monkeypatch.setattr(config, "TRUSTED_PROXY_HOPS", 1)
+    monkeypatch.setattr(config, "IDEMPOTENCY_CONTENT_WINDOW_SECONDS", 120)
+
+
+def book(client, ip: str, **headers):
+    response = client.post("/booking/", json=BOOKING, headers={"X-Forwarded-For": ip, **headers})
+    assert response.status_code == 200
+    return response
+
+
+def test_retry_from_the_same_client_is_replayed(client, store):
+    first = book(client, "10.0.0.1")
+    retry = book(client, "10.0.0.1")
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert store["StudentBookings"].count() == 1
+
+
+def test_clients_do_not_share_retries(client, store):
+    key = {"Idempotency-Key": "booking-key-1"}
+    first = book(client, "10.0.0.1", **key)
+    other = book(client, "10.0.0.2", **key)
+    assert other.json()["bookingId"] != first.json()["bookingId"]
+    assert "Idempotent-Replayed" not in other.headers
+    book(client, "10.0.0.3")
+    assert store["StudentBookings"].count() == 3
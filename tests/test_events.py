@@ -0,0 +1,24 @@
+import asyncio
+
+from bson import ObjectId
+
+from app.core.config import config
+from app.core.events import Subscription, change_to_event
+
+
+def subscription(user: dict) -> Subscription:
+    return Subscription(user, "main", asyncio.new_event_loop())
+
+
+def test_tombstone_becomes_a_delete_the_teacher_sees():
+    lesson_id = ObjectId()
+    event = change_to_event({
+        "operationType": "insert", "ns": {"db": config.BRANCH_DATABASES["main"], "coll": "Tombstones"}, "documentKey": {"_id": ObjectId()},
+        "fullDocument": {"collection": "GroupLessons", "doc_id": lesson_id, "teacher_name": "tea"},
+    })
+
+    assert event == {"branch": "main", "collection": "GroupLessons", "operation": "delete", "id": str(lesson_id),
+                     "teacher_name": "tea"}
+    assert subscription({"username": "tea", "role": "teacher"}).wants(event)
+    assert subscription({"username": "boss", "role": "admin"}).wants(event)
+    assert not subscription({"username": "other", "role": "teacher"}).wants(event)
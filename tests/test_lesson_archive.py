@@ -0,0 +1,91 @@
+from datetime import datetime
+
+import pytest
+
+from app.models.lesson_archive import LessonArchive
+from app.models.sync import Sync
+
+NOW = datetime(2026, 10, 15)
+
+
+def seed(store) -> list:
+    store["IndividualLessons"].insert_many([
+        {"teacher_name": "tea", "student_name": name, "date": datetime(2025, 1, day), "hours": 1,
+         "education_level": "ثانوي", "subject": "math", "approved": True, "version": 2, "updated_at": Sync.now()}
+        for day, name in ((1, "a"), (2, "b"), (3, "c"))
+    ])
+    return store["IndividualLessons"].find(sort="date")
+
+
+def write_after_copy(store, monkeypatch, write):
+    """ Run `write` on the hot collection right after the archive run copies a batch. """
+    archive = store["IndividualLessonsArchive"]
+    insert_many = archive.insert_many
+
+    def copy_then_write(documents, ordered=True):
+        result = insert_many(documents, ordered=ordered)
+        monkeypatch.setattr(archive, "insert_many", insert_many)
+        write()
+        return result
+
+    monkeypatch.setattr(archive, "insert_many", copy_then_write)
+
+
+def test_moves_approved_lessons(store):
+    seed(store)
+    result = LessonArchive.run(store, now=NOW)
+    assert result["moved"] == {"IndividualLessons": 3, "GroupLessons": 0}
+    assert store["IndividualLessons"].count() == 0
+    assert store["IndividualLessonsArchive"].count() == 3
+
+
+@pytest.mark.memory_only
+def test_lesson_edited_between_copy_and_delete_is_archived_as_edited(store, monkeypatch):
+    a, _, _ = seed(store)
+    write_after_copy(store, monkeypatch, lambda: store["IndividualLessons"].update_one(
+        {"_id": a["_id"]}, Sync.touch({"$set": {"hours": 3}, "$inc": {"version": 1}})))
+
+    LessonArchive.run(store, now=NOW)
+
+    assert store["IndividualLessons"].count() == 0
+    archived = store["IndividualLessonsArchive"].find_one({"_id": a["_id"]})
+    assert (archived["hours"], archived["version"]) == (3, 3)
+
+
+@pytest.mark.memory_only
+def test_lesson_rejected_between_copy_and_delete_stays_hot(store, monkeypatch):
+    a, _, _ = seed(store)
+    write_after_copy(store, monkeypatch, lambda: store["IndividualLessons"].update_one(
+        {"_id": a["_id"]}, Sync.touch({"$set": {"approved": False}, "$inc": {"version": 1}})))
+
+    result = LessonArchive.run(store, now=NOW)
+
+    assert result["moved"]["IndividualLessons"] == 2
+    assert [lesson["_id"] for lesson in store["IndividualLessons"].find()] == [a["_id"]]
+    assert store["IndividualLessonsArchive"].find_one({"_id": a["_id"]}) is None
+
+
+@pytest.mark.memory_only
+def test_lesson_deleted_between_copy_and_delete_is_not_archived(store, monkeypatch):
+    a, _, _ = seed(store)
+
+    def delete():
+        store["IndividualLessons"].delete_one({"_id": a["_id"]})
+        Sync.tombstone(store, "IndividualLessons", a["_id"], "tea")
+
+    write_after_copy(store, monkeypatch, delete)
+    LessonArchive.run(store, now=NOW)
+
+    assert store["IndividualLessonsArchive"].find_one({"_id": a["_id"]}) is None
+    assert store["IndividualLessonsArchive"].count() == 2
+
+
+def test_stale_copy_of_an_interrupted_run_is_replaced(store):
+    a, _, _ = seed(store)
+    store["IndividualLessonsArchive"].insert_one({**a, "hours": 9, "version": 1})
+
+    LessonArchive.run(store, now=NOW)
+
+    archived = store["IndividualLessonsArchive"].find_one({"_id": a["_id"]})
+    assert (archived["hours"], archived["version"]) == (1, 2)
+    assert store["IndividualLessons"].count() == 0
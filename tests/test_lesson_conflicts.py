@@ -0,0 +1,71 @@
+from datetime import datetime
+
+from app.models.lesson_conflicts import LessonConflicts
+
+LESSON = {"teacher_name": "ignored", "student_name": "سامي", "date": "2026-10-01T10:00:00", "hours": 1.5,
+          "education_level": "ثانوي", "subject": "math"}
+
+
+def submit(client, token, **fields):
+    return client.post(f"/teacher/submit?token={token}", json={**LESSON, **fields})
+
+
+def test_duplicate_submit_is_rejected(client, make_user):
+    token = make_user("tea")
+    assert submit(client, token).status_code == 200
+    response = submit(client, token)
+    assert response.status_code == 409
+    assert len(response.json()["detail"]["duplicates"]) == 1
+
+
+def test_overlapping_submit_is_rejected(client, make_user):
+    token = make_user("tea")
+    assert submit(client, token).status_code == 200
+    response = submit(client, token, student_name="other", date="2026-10-01T11:00:00")
+    assert response.status_code == 409
+    assert len(response.json()["detail"]["overlaps"]) == 1
+    assert submit(client, token, student_name="other", date="2026-10-01T11:30:00").status_code == 200
+
+
+def test_edited_date_is_stored_as_datetime(client, make_user, store):
+    token = make_user("tea")
+    lesson_id = submit(client, token).json()["lesson_id"]
+    response = client.put(f"/teacher/update-lesson/{lesson_id}?token={token}",
+                          json={"date": "2026-10-03T15:00:00", "hours": "2"})
+    assert response.status_code == 200
+
+    stored = store["IndividualLessons"].find_one({})
+    assert stored["date"] == datetime(2026, 10, 3, 15)
+    assert stored["hours"] == 2.0
+
+
+def test_edited_lesson_is_found_as_overlap(client, make_user):
+    token = make_user("tea")
+    lesson_id = submit(client, token).json()["lesson_id"]
+    client.put(f"/teacher/update-lesson/{lesson_id}?token={token}", json={"date": "2026-10-03T15:00:00"})
+
+    response = submit(client, token, student_name="other", date="2026-10-03T16:00:00")
+    assert response.status_code == 409
+    assert response.json()["detail"]["overlaps"][0]["id"] == lesson_id
+
+
+def test_edited_lesson_keeps_the_submit_hash(client, make_user):
+    token = make_user("tea")
+    lesson_id = submit(client, token).json()["lesson_id"]
+    client.put(f"/teacher/update-lesson/{lesson_id}?token={token}", json={"date": "2026-10-03T15:00:00"})
+
+    assert submit(client, token, date="2026-10-03T15:00:00").status_code == 409
+
+
+def test_invalid_edit_is_rejected(client, make_user, store):
+    token = make_user("tea")
+    lesson_id = submit(client, token).json()["lesson_id"]
+    response = client.put(f"/teacher/update-lesson/{lesson_id}?token={token}", json={"date": "not a date"})
+    assert response.status_code == 422
+    assert store["IndividualLessons"].find_one({})["date"] == datetime(2026, 10, 1, 10)
+
+
+def test_offset_dates_are_compared_in_utc():
+    lesson = {"date": "2026-10-01T13:00:00+03:00", "hours": 1}
+    assert LessonConflicts.start(lesson) == datetime(2026, 10, 1, 10)
+    assert LessonConflicts.interval(lesson) == (datetime(2026, 10, 1, 10), datetime(2026, 10, 1, 11))
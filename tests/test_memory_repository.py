@@ -0,0 +1,129 @@
+from datetime import datetime
+
+import pytest
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from app.models.payroll import Payroll
+from app.repositories import InMemoryStore, Repository, Store
+from app.repositories.base import UniqueKey
+
+LESSON = {"teacher_name": "ignored", "student_name": "a", "date": "2026-10-01T10:00:00", "hours": 1,
+          "education_level": "ثانوي", "subject": "math"}
+
+
+@pytest.fixture
+def keyed():
+    store = InMemoryStore("test", {"Things": (UniqueKey(("code",)),
+                                              UniqueKey(("tag",), {"tag": {"$exists": True}}),
+                                              UniqueKey(("aliases",)))})
+    return store["Things"]
+
+
+def test_unique_insert(keyed):
+    keyed.insert_one({"code": 1, "aliases": ["x"]})
+    with pytest.raises(DuplicateKeyError) as error:
+        keyed.insert_one({"code": 1, "aliases": ["y"]})
+    assert error.value.code == 11000
+    assert error.value.details["keyPattern"] == {"code": 1}
+    assert keyed.count() == 1
+
+
+def test_missing_field_indexes_as_null(keyed):
+    keyed.insert_one({"aliases": ["x"]})
+    with pytest.raises(DuplicateKeyError):
+        keyed.insert_one({"aliases": ["y"]})
+
+
+def test_partial_key_skips_documents_outside_the_filter(keyed):
+    keyed.insert_one({"code": 1, "aliases": ["a"]})
+    keyed.insert_one({"code": 2, "aliases": ["b"]})
+    keyed.insert_one({"code": 3, "tag": "t", "aliases": ["c"]})
+    with pytest.raises(DuplicateKeyError):
+        keyed.insert_one({"code": 4, "tag": "t", "aliases": ["d"]})
+
+
+def test_array_field_is_unique_per_element(keyed):
+    keyed.insert_one({"code": 1, "aliases": ["a", "b"]})
+    keyed.insert_one({"code": 2, "aliases": ["c"]})
+    with pytest.raises(DuplicateKeyError):
+        keyed.insert_one({"code": 3, "aliases": ["d", "b"]})
+    with pytest.raises(DuplicateKeyError):
+        keyed.update_one({"code": 2}, {"$addToSet": {"aliases": "a"}})
+    assert keyed.find_one({"code": 2})["aliases"] == ["c"]
+
+
+def test_update_and_upsert_check_keys(keyed):
+    keyed.insert_one({"code": 1, "aliases": ["a"]})
+    keyed.insert_one({"code": 2, "aliases": ["b"]})
+    with pytest.raises(DuplicateKeyError):
+        keyed.update_one({"code": 2}, {"$set": {"code": 1}})
+    with pytest.raises(DuplicateKeyError):
+        keyed.update_one({"code": 9}, {"$set": {"aliases": ["a"]}}, upsert=True)
+    keyed.update_one({"code": 2}, {"$set": {"code": 3}})
+    keyed.insert_one({"code": 2, "aliases": ["c"]})  # the old value is free again
+    assert sorted(thing["code"] for thing in keyed.find()) == [1, 2, 3]
+
+
+def test_delete_frees_keys(keyed):
+    keyed.insert_one({"code": 1, "aliases": ["a"]})
+    keyed.delete_one({"code": 1})
+    keyed.insert_one({"code": 1, "aliases": ["a"]})
+    keyed.delete_many({})
+    keyed.insert_one({"code": 1, "aliases": ["a"]})
+
+
+def test_insert_many_reports_duplicates(keyed):
+    with pytest.raises(BulkWriteError) as error:
+        keyed.insert_many([{"code": 1, "aliases": ["a"]}, {"code": 1, "aliases": ["b"]},
+                           {"code": 2, "aliases": ["c"]}], ordered=False)
+    assert [e["index"] for e in error.value.details["writeErrors"]] == [1]
+    assert keyed.count() == 2
+
+
+def test_submit_race_is_closed_by_content_hash(client, make_user, store, monkeypatch):
+    token = make_user("tea")
+    # Both requests pass the conflict check, as concurrent submits would
+    monkeypatch.setattr("app.routes.teacher.reject_conflicts", lambda *args, **kwargs: None)
+    assert client.post(f"/teacher/submit?token={token}", json=LESSON).status_code == 200
+    response = client.post(f"/teacher/submit?token={token}", json=LESSON)
+    assert response.status_code == 409
+    assert response.json()["detail"]["message"] == "This lesson was already submitted"
+    assert store["IndividualLessons"].count() == 1
+
+
+def test_edit_race_is_closed_by_content_hash(client, make_user, store, monkeypatch):
+    token = make_user("tea")
+    client.post(f"/teacher/submit?token={token}", json=LESSON)
+    other = client.post(f"/teacher/submit?token={token}", json={**LESSON, "date": "2026-10-02T10:00:00"})
+    monkeypatch.setattr("app.routes.teacher.reject_conflicts", lambda *args, **kwargs: None)
+    response = client.put(f"/teacher/update-lesson/{other.json()['lesson_id']}?token={token}",
+                          json={"date": "2026-10-01T10:00:00"})
+    assert response.status_code == 409
+    assert response.json()["detail"] == "This lesson was already submitted"
+    edited = store["IndividualLessons"].find_one({"date": datetime(2026, 10, 2, 10)})
+    assert edited is not None and edited["version"] == 1
+
+
+def test_concurrent_close_keeps_one_payslip(store):
+    store["IndividualLessons"].insert_one({"teacher_name": "tea", "date": datetime(2026, 9, 2, 10), "hours": 2,
+                                           "approved": True})
+    # Another worker's close already wrote the payslip, but has not marked the month closed yet
+    store["Payslips"].insert_one({"month": "2026-09", "teacher_name": "tea", "total_hours": 2, "lines": []})
+    result = Payroll.close_month(store, "2026-09")
+    assert result["closed"] is True
+    assert store["Payslips"].count({"month": "2026-09"}) == 1
+
+
+def test_pay_rates_are_unique_per_key(store):
+    Payroll.set_rate(store, 100, teacher_name="tea")
+    Payroll.set_rate(store, 120, teacher_name="tea")
+    assert [rate["rate"] for rate in Payroll.get_rates(store)] == [120]
+    with pytest.raises(DuplicateKeyError):
+        store["PayRates"].insert_one({"teacher_name": "tea", "lesson_type": "*", "education_level": "*",
+                                      "subject": "*", "rate": 1})
+
+
+def test_repository_interface_is_abstract():
+    for interface in (Repository, Store):
+        with pytest.raises(TypeError):
+            interface()
@@ -0,0 +1,72 @@
+from datetime import datetime
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+from app.models.payroll import Payroll
+
+
+def seed_lessons(store):
+    store["IndividualLessons"].insert_many([
+        {"teacher_name": "tea", "student_name": "a", "date": datetime(2026, 9, 2, 10), "hours": 2,
+         "education_level": "ثانوي", "subject": "math", "approved": True},
+        {"teacher_name": "tea", "student_name": "b", "date": datetime(2026, 9, 3, 10), "hours": 1.5,
+         "education_level": "ثانوي", "subject": "math", "approved": True},
+        {"teacher_name": "tea", "student_name": "c", "date": datetime(2026, 9, 4, 10), "hours": 1,
+         "education_level": "ثانوي", "subject": "math", "approved": False},
+        {"teacher_name": "tea", "student_name": "d", "date": datetime(2026, 10, 1, 10), "hours": 1,
+         "education_level": "ثانوي", "subject": "math", "approved": True},
+    ])
+    store["GroupLessons"].insert_one({"teacher_name": "tea", "student_names": ["a", "b"], "date": datetime(2026, 9, 5, 10),
+                                      "hours": 1, "education_level": "ثانوي", "subject": "math", "approved": True})
+
+
+def test_month_payroll_on_memory_backend(client, make_user, store):
+    admin = make_user("boss", "admin")
+    seed_lessons(store)
+    client.put(f"/payroll/rates?token={admin}", json={"rate": 100, "lesson_type": "individual"})
+
+    response = client.get(f"/payroll/2026-09?token={admin}")
+    assert response.status_code == 200
+    [payslip] = response.json()["payslips"]
+    assert payslip["teacher_name"] == "tea"
+    assert payslip["total_hours"] == 4.5
+    assert payslip["total_amount"] == 350
+    assert payslip["unrated_hours"] == 1
+    assert [(line["lesson_type"], line["lessons"]) for line in payslip["lines"]] == [("group", 1), ("individual", 2)]
+
+
+def test_archived_lessons_are_counted_once(client, make_user, store):
+    admin = make_user("boss", "admin")
+    seed_lessons(store)
+    lesson = store["IndividualLessons"].find_one({"student_name": "a"})
+    store["IndividualLessonsArchive"].insert_one(dict(lesson))
+    store["ArchiveState"].insert_one({"_id": "lessons", "archived_before": datetime(2026, 10, 1)})
+
+    payslip = client.get(f"/payroll/2026-09?token={admin}").json()["payslips"][0]
+    assert payslip["total_hours"] == 4.5
+
+
+def test_teacher_payslip_and_statement(client, make_user, store):
+    teacher = make_user("tea")
+    seed_lessons(store)
+
+    assert client.get(f"/payroll/me?month=2026-09&token={teacher}").json()["payslip"]["total_hours"] == 4.5
+    response = client.get(f"/reports/teacher-statement?month=2026-09&token={teacher}")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/pdf"
+
+
+def test_recomputing_keeps_one_draft_per_teacher(store):
+    seed_lessons(store)
+    Payroll.compute_month(store, "2026-09")
+    store["IndividualLessons"].update_many({"student_name": {"$in": ["a", "b"]}}, {"$set": {"teacher_name": "new"}})
+    store["PayrollState"].update_one({"_id": "2026-09"}, {"$set": {"dirty": ["tea", "new"]}})
+    Payroll.compute_month(store, "2026-09")
+    store["PayrollState"].update_one({"_id": "2026-09"}, {"$set": {"computed": False}})
+    Payroll.compute_month(store, "2026-09")
+
+    drafts = store["PayrollDrafts"].find({"month": "2026-09"}, sort="teacher_name")
+    assert [(draft["teacher_name"], draft["total_hours"]) for draft in drafts] == [("new", 3.5), ("tea", 1)]
+    with pytest.raises(DuplicateKeyError):
+        store["PayrollDrafts"].insert_one({"month": "2026-09", "teacher_name": "tea"})
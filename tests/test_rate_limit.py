@@ -0,0 +1,80 @@
+import pytest
+
+from app.core import rate_limit
+from app.core.rate_limit import InMemoryRateLimitBackend, RateLimitBackend
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock.monotonic)
+    return clock
+
+
+def test_backend_must_implement_every_method():
+    class Partial(RateLimitBackend):
+        def take(self, key, capacity, refill_per_second):
+            return True, 0
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_prune_keeps_buckets_still_refilling(clock):
+    backend = InMemoryRateLimitBackend(max_keys=2)
+    for _ in range(3):
+        backend.take("ip:drained", capacity=3, refill_per_second=1)
+    backend.take("ip:refilled", capacity=3, refill_per_second=1)
+
+    clock.now += 1.5  # "refilled" is full again, "drained" still has 1.5 tokens missing
+    backend.take("ip:new", capacity=3, refill_per_second=1)
+
+    assert set(backend._state) == {"ip:drained", "ip:new"}
+    assert backend.take("ip:drained", capacity=3, refill_per_second=1)[0]
+    assert not backend.take("ip:drained", capacity=3, refill_per_second=1)[0]
+
+
+def test_prune_keeps_failures_and_lockouts(clock):
+    backend = InMemoryRateLimitBackend(max_keys=1)
+    backend.record_failure("user:tea", free_failures=0, base_seconds=60, max_seconds=60)
+    for key in ("ip:a", "ip:b", "ip:c"):
+        backend.take(key, capacity=1, refill_per_second=1)
+
+    assert "user:tea" in backend._state
+    assert backend.locked_for("user:tea") == 60
+
+
+def test_failure_first_key_starts_with_a_full_bucket(clock):
+    backend = InMemoryRateLimitBackend()
+    backend.record_failure("user:tea", free_failures=3, base_seconds=1, max_seconds=1)
+    assert [backend.take("user:tea", capacity=2, refill_per_second=0.1)[0] for _ in range(3)] == [True, True, False]
+
+
+def test_failures_are_forgotten_after_the_idle_ttl(clock):
+    backend = InMemoryRateLimitBackend()
+    for _ in range(5):
+        backend.record_failure("ip:shared", free_failures=3, base_seconds=60, max_seconds=900)
+    assert backend.locked_for("ip:shared") == 120
+
+    clock.now += 1800  # lockout over, failures still counted
+    assert backend.record_failure("ip:shared", free_failures=3, base_seconds=60, max_seconds=900) == 6
+
+    clock.now += 3601
+    assert backend.locked_for("ip:shared") == 0
+    assert backend.record_failure("ip:shared", free_failures=3, base_seconds=60, max_seconds=900) == 1
+
+
+def test_forgotten_keys_are_pruned(clock):
+    backend = InMemoryRateLimitBackend(max_keys=1)
+    backend.record_failure("ip:old", free_failures=0, base_seconds=1, max_seconds=1)
+    clock.now += 3601
+    backend.take("ip:new", capacity=1, refill_per_second=1)
+    assert set(backend._state) == {"ip:new"}
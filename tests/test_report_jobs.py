@@ -0,0 +1,79 @@
+import time
+
+import pytest
+
+from app.core import report_jobs
+from app.core.config import config
+from app.core.report_jobs import JobOutput, JobType, JobWorkers
+from app.models.report_jobs import JOBS, ReportJobs
+
+
+@pytest.fixture
+def short_lease(monkeypatch):
+    monkeypatch.setattr(config, "REPORT_JOB_LEASE_SECONDS", 0.3)
+
+
+def register(monkeypatch, run):
+    monkeypatch.setitem(report_jobs.JOB_TYPES, "slow", JobType(lambda params: params, run))
+
+
+def test_lease_is_renewed_while_a_slow_job_runs(store, monkeypatch, short_lease):
+    taken_over = []
+
+    def run(store, params, progress):
+        time.sleep(1)  # over three leases without a progress update
+        taken_over.append(ReportJobs.claim(store, "other-worker"))
+        return JobOutput(result={"ok": True})
+
+    register(monkeypatch, run)
+    ReportJobs.enqueue(store, "slow", {}, "boss")
+    JobWorkers.run(store, ReportJobs.claim(store, "worker"), "worker")
+
+    assert taken_over == [None]
+    job = store[JOBS].find_one({})
+    assert (job["status"], job["result"], job["attempts"]) == ("done", {"ok": True}, 1)
+
+
+def test_completion_after_a_takeover_is_not_counted(store, monkeypatch, short_lease):
+    def run(store, params, progress):
+        store[JOBS].update_one({}, {"$set": {"worker": "other-worker"}})
+        return JobOutput(result={"stale": True})
+
+    register(monkeypatch, run)
+    ReportJobs.enqueue(store, "slow", {}, "boss")
+    counted = []
+    monkeypatch.setattr(report_jobs.metrics, "incr", lambda name, **labels: counted.append(labels))
+    JobWorkers.run(store, ReportJobs.claim(store, "worker"), "worker")
+
+    job = store[JOBS].find_one({})
+    assert (job["status"], job["worker"]) == ("running", "other-worker")
+    assert "result" not in job
+    assert counted == []
+
+
+def finish_export(client, admin, store, month: str) -> dict:
+    response = client.post(f"/reports/jobs?token={admin}", json={"type": "lessons_export", "params": {"from": month}})
+    assert response.status_code == 202
+    job = ReportJobs.claim(store, "worker")
+    if job is not None:
+        JobWorkers.run(store, job, "worker")
+    return response.json()
+
+
+def test_finished_job_of_an_open_month_runs_again(client, make_user, store):
+    admin = make_user("boss", "admin")
+    finish_export(client, admin, store, "2026-09")
+
+    again = finish_export(client, admin, store, "2026-09")
+    assert not again["deduplicated"]
+    assert store[JOBS].find_one({})["attempts"] == 1  # re-queued with a fresh attempt count
+
+
+def test_finished_job_of_a_closed_month_is_reused(client, make_user, store):
+    admin = make_user("boss", "admin")
+    store["PayrollState"].insert_one({"_id": "2026-09", "closed": True})
+    finish_export(client, admin, store, "2026-09")
+
+    again = finish_export(client, admin, store, "2026-09")
+    assert again["deduplicated"]
+    assert again["job"]["status"] == "done"
@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from app.core.auth import hash_password
+from app.models.auth_token import AuthToken
+
+
+def signin(client, password):
+    response = client.post("/user/signin", json={"username": "tea", "password": password})
+    assert response.status_code == 200
+    return response.json()["access_token"]
+
+
+def test_password_reset_signs_out_earlier_sessions(client, store):
+    store["Users"].insert_one({"username": "tea", "role": "teacher", "verified": True, "email": "tea@example.com",
+                               "password": hash_password("old-password")})
+    stolen = signin(client, "old-password")
+    assert client.get(f"/teacher/pending-lessons?token={stolen}").status_code == 200
+
+    user_id = store["Users"].find_one({"username": "tea"})["_id"]
+    reset_token = AuthToken.issue(user_id, "reset", timedelta(minutes=15), store["AuthTokens"])
+    response = client.post("/user/reset-password", json={"token": reset_token, "new_password": "new-password"})
+    assert response.status_code == 200
+
+    response = client.get(f"/teacher/pending-lessons?token={stolen}")
+    assert response.status_code == 401
+    fresh = signin(client, "new-password")
+    assert client.get(f"/teacher/pending-lessons?token={fresh}").status_code == 200
+
+
+def test_tokens_from_before_versioning_stay_valid(client, make_user):
+    token = make_user("tea")  # no token_version claim, user without token_version
+    assert client.get(f"/teacher/pending-lessons?token={token}").status_code == 200
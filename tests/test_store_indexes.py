@@ -0,0 +1,82 @@
+import threading
+
+import pytest
+
+from app.core import store_indexes
+from app.core.store_indexes import StoreIndexes
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class Index(list):
+    def __init__(self, version: int, built_at: float):
+        super().__init__([version])
+        self.built_at = built_at
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(store_indexes.time, "monotonic", clock.monotonic)
+    return clock
+
+
+def counting_build(clock, gate=None):
+    builds = []
+
+    def build(store):
+        builds.append(store.name)
+        if gate is not None:
+            gate.wait(5)
+        return Index(len(builds), clock.now)
+    return build, builds
+
+
+def test_serves_stale_index_while_rebuilding_in_background(clock, store):
+    gate = threading.Event()
+    build, _ = counting_build(clock)
+    indexes = StoreIndexes(build, max_age=10, name="test_index", hard_max_age=100)
+    assert indexes.get(store) == [1]
+
+    indexes.build, _ = counting_build(clock, gate)
+    clock.now += 50
+    assert indexes.get(store) == [1]  # soft limit: old index served, rebuild started
+    gate.set()
+
+
+def test_rebuilds_before_serving_past_the_hard_limit(clock, store):
+    build, builds = counting_build(clock)
+    indexes = StoreIndexes(build, max_age=10, name="test_index", hard_max_age=100)
+    indexes.get(store)
+
+    clock.now += 500
+    assert indexes.get(store) == [2]
+    assert len(builds) == 2
+
+
+def test_waits_for_the_rebuild_in_flight_past_the_hard_limit(clock, store):
+    gate = threading.Event()
+    build, builds = counting_build(clock, gate)
+    gate.set()
+    indexes = StoreIndexes(build, max_age=10, name="test_index", hard_max_age=100)
+    indexes.get(store)
+
+    gate.clear()
+    clock.now += 50
+    indexes.get(store)  # background rebuild, held on the gate
+    clock.now += 100
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(indexes.get(store)))
+    waiter.start()
+    waiter.join(0.2)
+    assert waiter.is_alive()
+    gate.set()
+    waiter.join(5)
+    assert results == [[2]]
+    assert len(builds) == 2  # the waiter did not build again
@@ -0,0 +1,93 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from app.models.student import Student
+
+
+def add_student(store, name, *aliases):
+    return store["Students"].insert_one({"name": name, "keys": [name, *aliases], "created_at": datetime.utcnow()})
+
+
+def test_merge_moves_every_reference(client, make_user, store):
+    admin = make_user("boss", "admin")
+    target, source, other = add_student(store, "sami"), add_student(store, "samy"), add_student(store, "omar")
+    lessons = store["GroupLessons"]
+    only_source = lessons.insert_one({"student_names": ["samy", "omar"], "student_ids": [other, source]})
+    both = lessons.insert_one({"student_names": ["sami", "samy"], "student_ids": [target, source]})
+    store["StudentPayments"].insert_one({"name": "samy", "student_ids": [source]})
+
+    response = client.post(f"/students/{target}/merge/{source}?token={admin}")
+    assert response.status_code == 200
+
+    assert lessons.find_one({"_id": only_source})["student_ids"] == [other, target]
+    assert lessons.find_one({"_id": both})["student_ids"] == [target]
+    assert store["StudentPayments"].find_one({})["student_ids"] == [target]
+    assert store["Students"].find_one({"_id": target})["keys"] == ["sami", "samy"]
+
+
+def test_backfill_route_runs_on_repositories(client, make_user, store):
+    admin = make_user("boss", "admin")
+    sami = add_student(store, "sami")
+    store["IndividualLessons"].insert_many([{"student_name": "Sami"}, {"student_name": "sami "},
+                                            {"student_name": "New Student"}])
+    store["GroupLessons"].insert_one({"student_names": ["sami", "new student"]})
+    store["StudentPayments"].insert_one({"name": "sami", "student_ids": [sami]})
+
+    response = client.post(f"/students/backfill?batch_size=2&token={admin}")
+    assert response.status_code == 200
+    assert response.json()["updated"] == {"IndividualLessons": 3, "GroupLessons": 1,
+                                          "StudentBookings": 0, "StudentPayments": 0}
+    new_id = store["Students"].find_one({"keys": "new student"})["_id"]
+    assert [lesson["student_ids"] for lesson in store["IndividualLessons"].find(sort="_id")] == [[sami], [sami], [new_id]]
+    assert store["GroupLessons"].find_one({})["student_ids"] == [sami, new_id]
+
+
+def test_alias_taken_concurrently(store, monkeypatch):
+    sami, omar = add_student(store, "sami"), add_student(store, "omar")
+    students = store["Students"]
+    update = students.find_one_and_update
+
+    def racing_update(*args, **kwargs):
+        # Another request gives the alias to "omar" after our ownership check
+        students.update_one({"_id": omar}, {"$addToSet": {"keys": "sam"}})
+        return update(*args, **kwargs)
+
+    monkeypatch.setattr(students, "find_one_and_update", racing_update)
+    result = Student.add_alias(sami, "sam", students)
+    assert result == {"error": "Alias belongs to another student", "studentId": str(omar)}
+
+
+@pytest.mark.memory_only
+def test_merge_folds_in_a_student_recreated_for_a_moved_key(store, monkeypatch):
+    target, source = add_student(store, "sami"), add_student(store, "samy")
+    students = store["Students"]
+    find_one_and_delete = students.find_one_and_delete
+
+    def delete_then_resubmit(filter, *args, **kwargs):
+        deleted = find_one_and_delete(filter, *args, **kwargs)
+        monkeypatch.setattr(students, "find_one_and_delete", find_one_and_delete)
+        Student.resolve_ids(["Samy"], students)  # a submit between the delete and the key move
+        return deleted
+
+    monkeypatch.setattr(students, "find_one_and_delete", delete_then_resubmit)
+    result = Student.merge(source, target, store)
+
+    assert result["studentId"] == str(target)
+    assert [student["keys"] for student in students.find()] == [["sami", "samy"]]
+    assert Student.resolve_ids(["samy"], students, create=False) == [target]
+
+
+def test_merge_into_a_missing_student_keeps_the_source(store):
+    source = add_student(store, "samy")
+    assert Student.merge(source, ObjectId(), store) == {"error": "Student not found"}
+    assert store["Students"].find_one({"_id": source})["keys"] == ["samy"]
+
+
+def test_merge_stamps_rewritten_lessons(store):
+    target, source = add_student(store, "sami"), add_student(store, "samy")
+    lesson = store["IndividualLessons"].insert_one({"student_name": "samy", "student_ids": [source],
+                                                   "updated_at": datetime(2026, 1, 1)})
+    Student.merge(source, target, store)
+    assert store["IndividualLessons"].find_one({"_id": lesson})["updated_at"] > datetime(2026, 1, 1)
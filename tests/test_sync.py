@@ -0,0 +1,64 @@
+from datetime import datetime
+
+from bson import ObjectId
+
+from app.models.sync import Sync
+
+
+def lesson(student_name: str, **fields) -> dict:
+    return {"teacher_name": "tea", "student_name": student_name, "date": datetime(2026, 9, 2, 10), "hours": 1,
+            "education_level": "ثانوي", "subject": "math", "approved": True, **fields}
+
+
+def sync_all(client, token: str, since=None, limit: int = 2) -> list:
+    pages = []
+    while True:
+        params = {"token": token, "limit": limit, **({"since": since} if since else {})}
+        response = client.get("/sync", params=params)
+        assert response.status_code == 200
+        pages.append(response.json())
+        since = pages[-1]["token"]
+        if not pages[-1]["has_more"]:
+            return pages
+
+
+def test_full_sync_is_paged(client, make_user, store):
+    token = make_user("tea")
+    legacy = [lesson(f"old{i}") for i in range(3)]  # written before sync: no updated_at
+    store["IndividualLessons"].insert_many(legacy)
+    store["GroupLessons"].insert_one(lesson("group", updated_at=Sync.now()))
+    archived = lesson("archived", date=datetime(2025, 1, 1), _id=ObjectId())
+    store["IndividualLessonsArchive"].insert_one(archived)
+    store["IndividualLessons"].insert_one(dict(archived))  # caught mid-archiving: sent once
+    store["ArchiveState"].insert_one({"_id": "lessons", "archived_before": datetime(2026, 1, 1)})
+    store["IndividualLessons"].insert_one(lesson("other", teacher_name="someone-else"))
+
+    pages = sync_all(client, token)
+
+    assert [page["full"] for page in pages] == [True, False, False]
+    assert [len(page["lessons"]) for page in pages] == [2, 2, 1]
+    names = [synced["student_name"] for page in pages for synced in page["lessons"]]
+    assert sorted(names) == ["archived", "group", "old0", "old1", "old2"]
+
+
+def test_full_sync_continues_incrementally(client, make_user, store):
+    token = make_user("tea")
+    store["IndividualLessons"].insert_many([lesson("a"), lesson("b"), lesson("c")])
+    since = sync_all(client, token)[-1]["token"]
+
+    lesson_b = store["IndividualLessons"].find_one({"student_name": "b"})
+    store["IndividualLessons"].update_one({"_id": lesson_b["_id"]}, Sync.touch({"$set": {"hours": 2}}))
+    lesson_c = store["IndividualLessons"].find_one_and_delete({"student_name": "c"})
+    Sync.tombstone(store, "IndividualLessons", lesson_c["_id"], "tea")
+
+    pages = sync_all(client, token, since)
+    assert not any(page["full"] for page in pages)
+    assert [(synced["student_name"], synced["hours"]) for page in pages for synced in page["lessons"]] == [("b", 2)]
+    assert [deleted["_id"] for page in pages for deleted in page["deleted"]] == [str(lesson_c["_id"])]
+
+
+def test_malformed_token_is_rejected(client, make_user):
+    token = make_user("tea")
+    forged = Sync.encode_token((datetime.utcnow(), None)) + "eA"
+    response = client.get("/sync", params={"token": token, "since": forged})
+    assert response.status_code == 400
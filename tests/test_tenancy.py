@@ -0,0 +1,42 @@
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.core.config import config
+from app.core.security import create_access_token
+from app.core.tenancy import get_branch
+
+
+@pytest.fixture
+def branches(monkeypatch):
+    monkeypatch.setitem(config.BRANCH_DATABASES, "north", "test_north")
+
+
+def request(query: str = "", host: str = "api.example.com") -> Request:
+    return Request({"type": "http", "method": "GET", "path": "/", "query_string": query.encode(),
+                    "headers": [(b"host", host.encode())]})
+
+
+def test_token_claim_decides(branches):
+    token = create_access_token({"username": "tea", "role": "teacher", "branch": "north"})
+    assert get_branch(request(f"token={token}&branch=main")) == "north"
+
+
+def test_legacy_token_stays_in_default_branch(branches):
+    token = create_access_token({"username": "tea", "role": "teacher"})
+    assert get_branch(request(f"token={token}&branch=north")) == config.DEFAULT_BRANCH
+    assert get_branch(request(f"token={token}", host="north.example.com")) == config.DEFAULT_BRANCH
+
+
+def test_unknown_token_branch_is_rejected(branches):
+    token = create_access_token({"username": "tea", "role": "teacher", "branch": "gone"})
+    with pytest.raises(HTTPException) as error:
+        get_branch(request(f"token={token}"))
+    assert error.value.status_code == 401
+
+
+def test_unauthenticated_requests_use_query_then_host(branches):
+    assert get_branch(request("branch=north")) == "north"
+    assert get_branch(request(host="north.example.com")) == "north"
+    assert get_branch(request("token=emailed-reset-token&branch=north")) == "north"
+    assert get_branch(request()) == config.DEFAULT_BRANCH